@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 import codecs
 import distutils.spawn
+import multiprocessing
 import os.path
 import platform
 import re
@@ -49,6 +50,13 @@ from libs.videoFile import *
 from libs.imagesList import *
 from libs.folderImagesSource import *
 from libs.videoImagesSource import *
+from libs.frameCache import *
+from libs.tilePyramid import *
+from libs.asyncSaver import *
+from libs.objectTracker import *
+from libs.preLabeler import *
+from libs.boxPropagator import *
+from libs.boxInterpolator import *
 
 __appname__ = 'LabelVideo'
 
@@ -101,6 +109,25 @@ class MainWindow(QMainWindow, WindowMixin):
 
         self._last_open_dir = None
         self._current_image = NamedImage("")
+        # reduced image whose full resolution is being decoded or shown
+        self._full_resolution_image = None
+        self._thread_pool = QThreadPool()
+        # links the detections of consecutive frames of the current source
+        self.tracker = ObjectTracker()
+        # image path -> DetectedShapes of the boxes propagated to it from a previous frame
+        self._propagated = {}
+        self._detected_shapes = []
+        # frame images and annotations are written in background
+        self._saver = AsyncSaver()
+        self._saver.signals.pendingChanged.connect(self._on_pending_writes_changed)
+        self._saver.signals.written.connect(self._on_write_done)
+        self._saver.signals.failed.connect(self._on_write_failed)
+        # (annotation path, edit count) of the labels being saved, they are clean once written
+        self._saving_labels = None
+        self._edit_count = 0
+        self._extracting_frames = False
+        self._cancel_extracting = False
+        FrameCache.getInstance().budget = settings.get(SETTING_FRAME_CACHE_BUDGET, DEFAULT_FRAME_CACHE_BUDGET)
 
         # Whether we need to save or not.
         self.dirty = False
@@ -188,7 +215,9 @@ class MainWindow(QMainWindow, WindowMixin):
 
         # create auto-recognition properties widget
         self.recognitionDock = Recognition(getStr('recognitionProperties'), self.settings.get(SETTING_AUTO_DETECTION), self)
+        self.recognitionDock.SetSaver(self._saver)
         self.recognitionDock.objects_detected.connect(self.onObjectsDetected)
+        self.recognitionDock.status_changed.connect(self.status)
 
         self.zoomWidget = ZoomWidget()
         self.colorDialog = ColorDialog(parent=self)
@@ -228,6 +257,9 @@ class MainWindow(QMainWindow, WindowMixin):
         openVideoFile = action('Load video', self.loadVideoFile,
                       'Ctrl+Shift+V', 'open', 'Load video file for to label frames')
 
+        extractFrames = action('Extract video frames', self.extractVideoFrames,
+                      None, 'save', 'Save all sampled frames of the video as JPEG files')
+
         opendir = action(getStr('openDir'), self.openDirDialog,
                          'Ctrl+u', 'open', getStr('openDir'))
 
@@ -346,6 +378,9 @@ class MainWindow(QMainWindow, WindowMixin):
                                               enquireType = False, allLabels = False), 'Ctrl+G', 'create',
                                       'Create label of the garbage_bag type', enabled=True)
 
+        accept_track = action('Accept track', self.acceptTrack, 'Ctrl+K', 'create',
+                              'Create labels of the detected object on all frames of its track', enabled=True)
+
         create_label_of_type = action('Convert to label of type...',
                                       partial(self._create_shape_from_detected_shape, label = None,
                                               enquireType = True, allLabels = False), 'Ctrl+T', 'create',
@@ -358,13 +393,18 @@ class MainWindow(QMainWindow, WindowMixin):
 
         # Lavel list context menu.
         labelMenu = QMenu()
-        addActions(labelMenu, (edit, delete))
+        propagate = action('Propagate boxes forward', self.propagateBoxes, 'Ctrl+Shift+P', 'next',
+                           'Estimate the boxes on the next frames by optical flow', enabled=True)
+        interpolate = action('Interpolate from previous keyframe', self.interpolateKeyframes, 'Ctrl+Shift+I', 'copy',
+                             'Annotate the frames since the previous annotated frame with interpolated boxes',
+                             enabled=True)
+        addActions(labelMenu, (edit, delete, propagate, interpolate))
         self.labelList.setContextMenuPolicy(Qt.CustomContextMenu)
         self.labelList.customContextMenuRequested.connect(self.popLabelListMenu)
 
         detectedLabelMenu = QMenu()
         addActions(detectedLabelMenu, (create_same_label, create_garbage_label, create_label_of_type,
-                                       create_all_same_labels, create_all_labels_but_current))
+                                       create_all_same_labels, create_all_labels_but_current, accept_track))
         self.detectedLabelList.setContextMenuPolicy(Qt.CustomContextMenu)
         self.detectedLabelList.customContextMenuRequested.connect(self.popDetectedLabelListMenu)
 
@@ -416,15 +456,33 @@ class MainWindow(QMainWindow, WindowMixin):
         self.autoRestore.setShortcut("Ctrl+Shift+R")
         self.autoRestore.setCheckable(True)
         self.autoRestore.setChecked(settings.get(SETTING_RESTORE_ON_START, True))
+        # Pick video frames by content change instead of every 30th one
+        self.adaptiveSampling = QAction('Adaptive frame sampling', self)
+        self.adaptiveSampling.setCheckable(True)
+        self.adaptiveSampling.setChecked(settings.get(SETTING_ADAPTIVE_SAMPLING, False))
+        self.adaptiveSampling.triggered.connect(self.reopenSourceVideo)
+        # Keep the sampled video frames in a memory mapped file in the cache folder
+        self.frameStore = QAction('Cache video frames on disk', self)
+        self.frameStore.setCheckable(True)
+        self.frameStore.setChecked(settings.get(SETTING_FRAME_STORE, False))
+        self.frameStore.triggered.connect(self.reopenSourceVideo)
+
+        # interpolated boxes follow a spline through the keyframe before the previous one
+        self.splineInterpolation = QAction('Spline box interpolation', self)
+        self.splineInterpolation.setCheckable(True)
+        self.splineInterpolation.setChecked(settings.get(SETTING_SPLINE_INTERPOLATION, False))
 
         addActions(self.menus.file,
-                   (openLabelMap, openVideoFile, opendir, changeSavedir, self.autoRestore, self.menus.recentFiles, save, save_format, saveAs, close, resetAll, quit))
+                   (openLabelMap, openVideoFile, extractFrames, opendir, changeSavedir, self.autoRestore, self.menus.recentFiles, save, save_format, saveAs, close, resetAll, quit))
 
         addActions(self.menus.help, (help, showInfo))
         addActions(self.menus.view, (
             self.autoSaving,
             self.singleClassMode,
             self.displayLabelOption,
+            self.adaptiveSampling,
+            self.frameStore,
+            self.splineInterpolation,
             labels, advancedMode, None,
             hideAll, showAll, None,
             zoomIn, zoomOut, zoomOrg, None,
@@ -526,6 +584,8 @@ class MainWindow(QMainWindow, WindowMixin):
         # Display cursor coordinates at the right of status bar
         self.labelCoordinates = QLabel('')
         self.statusBar().addPermanentWidget(self.labelCoordinates)
+        self.labelPendingWrites = QLabel('')
+        self.statusBar().addPermanentWidget(self.labelPendingWrites)
 
         if self.autoRestore.isChecked():
             if self._storage_type == STORAGE_TYPE_VIDEO and self._video_file_path and os.path.isfile(self._video_file_path):
@@ -602,6 +662,7 @@ class MainWindow(QMainWindow, WindowMixin):
 
     def setDirty(self):
         self.dirty = True
+        self._edit_count += 1
         self.actions.save.setEnabled(True)
 
     def setClean(self):
@@ -629,6 +690,7 @@ class MainWindow(QMainWindow, WindowMixin):
         self.itemsToDetectedShapes.clear()
         self.detectedShapesToItems.clear()
         self.detectedLabelList.clear()
+        self._detected_shapes = []
         self._file_path = None
         self.labelFile = None
         self.canvas.resetState()
@@ -672,10 +734,27 @@ class MainWindow(QMainWindow, WindowMixin):
 
     ## Callbacks ##
     def onObjectsDetected(self, detection_result):
+        images_source = self.imagesListDock.GetSource()
+        if images_source is not None:
+            position = images_source.GetIndex(detection_result[0])
+            name = self.imagesListDock.NameAt(position)
+            # results of a previous source may still arrive
+            if name is not None and images_source.GetImagePath(name) == detection_result[0]:
+                self.tracker.Update(position, name, detection_result[1])
+
         if detection_result[0] == self._file_path:
-            self.canvas.loadDetectedShapes(detection_result[1])
-            for detectedShape in detection_result[1]:
-                self.addDetectedLabel(detectedShape)
+            self._detected_shapes = list(detection_result[1])
+            self.showDetectedShapes()
+
+    def showDetectedShapes(self):
+        """Detected objects and the boxes propagated to the current image, offered to be converted to labels."""
+        self.itemsToDetectedShapes.clear()
+        self.detectedShapesToItems.clear()
+        self.detectedLabelList.clear()
+        dshapes = self._detected_shapes + self._propagated.get(self._file_path, [])
+        self.canvas.loadDetectedShapes(dshapes)
+        for detectedShape in dshapes:
+            self.addDetectedLabel(detectedShape)
 
     def onImageChanged(self, image):
         self.resetState()
@@ -687,7 +766,7 @@ class MainWindow(QMainWindow, WindowMixin):
         self.status("Loaded %s" % os.path.basename(image.path))
         self._file_path = image.path
         try:
-            self.canvas.loadPixmap(QPixmap.fromImage(self._current_image.qtimage))
+            self.canvas.loadPixmap(self.imagePixmap(self._current_image), self._current_image.size)
 
             self.setClean()
             self.canvas.setEnabled(True)
@@ -698,6 +777,9 @@ class MainWindow(QMainWindow, WindowMixin):
 
             # start object detection
             self.recognitionDock.ProcessImage(image)
+            # the upcoming images are detected meanwhile
+            self.recognitionDock.ProcessUpcoming(self.imagesListDock.GetSource(),
+                                                 self.imagesListDock.UpcomingNames(self.recognitionDock.LookaheadDepth()))
 
             # Label xml file and show bound box according to its filename
             # if self.usingPascalVocFormat is True:
@@ -709,6 +791,9 @@ class MainWindow(QMainWindow, WindowMixin):
                 if os.path.isfile(xmlPath):
                     self.loadPascalXMLByFilename(xmlPath)
 
+            if self._file_path in self._propagated:
+                self.showDetectedShapes()
+
             self.setWindowTitle(__appname__ + ' ' + self._file_path)
 
             # Default : select last item if there is at least one item
@@ -849,6 +934,8 @@ class MainWindow(QMainWindow, WindowMixin):
 
     def addDetectedLabel(self, detectedShape):
         dlbl = str.format('{0} -- {1}%', detectedShape.label, int(detectedShape.score * 100))
+        if detectedShape.track_id is not None:
+            dlbl += str.format(' [track {0}]', self.tracker.TrackId(detectedShape.track_id))
         item = HashableQListWidgetItem(dlbl)
         item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
         item.setCheckState(Qt.Checked)
@@ -874,6 +961,139 @@ class MainWindow(QMainWindow, WindowMixin):
         self.detectedLabelList.addItem(item)
         self.canvas.repaint()
 
+    def acceptTrack(self):
+        item = self.currentDetectedItem()
+        if not item or self.itemsToDetectedShapes[item].track_id is None:
+            return
+
+        program_state = ProgramState.getInstance()
+        images_source = self.imagesListDock.GetSource()
+        if not program_state.defaultSaveDir or images_source is None:
+            self.status('Accepting a track needs a save folder')
+            return
+
+        # the current frame is labelled on the canvas, the other frames of the track in their files
+        self._create_shape_from_detected_shape(label=None, enquireType=False, allLabels=False)
+        current = images_source.GetIndex(self._file_path)
+        entries = [entry for entry in self.tracker.Track(self.itemsToDetectedShapes[item].track_id)
+                   if entry[0] != current]
+        if not entries:
+            return
+
+        worker = Worker(self._accept_track_func, images_source, entries, ustr(program_state.defaultSaveDir))
+        worker.signals.result.connect(self._on_track_accepted)
+        self._thread_pool.start(worker)
+
+    def _accept_track_func(self, images_source, entries, save_dir):
+        labelled = 0
+        verified = 0
+        for position, name, label, extent in entries:
+            # frames the user verified are left as they are
+            xml_path = annotationPath(save_dir, images_source.GetSavePath(name))
+            if os.path.exists(xml_path) and PascalVocReader(xml_path).verified:
+                verified += 1
+                continue
+
+            res, image = images_source.GetImage(name)
+            if not res:
+                continue
+
+            imagepath = image.Save()
+            width, height = image.size
+            xmin, ymin, xmax, ymax = extent
+            shape = dict(label=label, points=[(xmin, ymin), (xmax, ymin), (xmax, ymax), (xmin, ymax)], difficult=False)
+            if addAnnotations(annotationPath(save_dir, imagepath), imagepath, [height, width, 3], [shape]):
+                labelled += 1
+
+        return labelled, verified
+
+    def _on_track_accepted(self, result):
+        labelled, verified = result
+        self.status('Track labelled on %d more frames, %d verified frames left alone' % (labelled, verified))
+
+    def propagateBoxes(self):
+        images_source = self.imagesListDock.GetSource()
+        names = self.imagesListDock.UpcomingNames(DEFAULT_PROPAGATION_FRAMES)
+        shapes = [(shape.label, shape.getExtent()) for shape in self.canvas.shapes]
+        if images_source is None or not names or not shapes:
+            return
+
+        propagator = BoxPropagator(images_source, names, self._current_image, shapes)
+        worker = ProgressingWorker(propagator.Run)
+        worker.signals.result.connect(partial(self._on_boxes_propagated, images_source))
+        worker.signals.progress.connect(self._on_extracting_progress)
+        self._thread_pool.start(worker)
+
+    def _on_boxes_propagated(self, images_source, results):
+        if images_source is not self.imagesListDock.GetSource():
+            return
+
+        for name, boxes in results:
+            path = images_source.GetImagePath(name)
+            self._propagated[path] = [DetectedShape(label, 0, score, extent) for label, extent, score in boxes]
+            if path == self._file_path:
+                self.showDetectedShapes()
+
+        self.status('Boxes propagated to %d frames' % len(results))
+
+    def interpolateKeyframes(self):
+        images_source = self.imagesListDock.GetSource()
+        save_dir = ProgramState.getInstance().defaultSaveDir
+        if images_source is None or not save_dir or self._file_path is None:
+            self.status('Interpolating boxes needs a save folder')
+            return
+
+        save_dir = ustr(save_dir)
+        current = images_source.GetIndex(self._file_path)
+        keyframes = [(self._frame_time(current), [(shape.label, shape.getExtent()) for shape in self.canvas.shapes])]
+        rows = [current]
+        # the previous frames annotated by the user, one more for the spline
+        for row in range(current - 1, -1, -1):
+            xml_path = annotationPath(save_dir, images_source.GetSavePath(self.imagesListDock.NameAt(row)))
+            if os.path.exists(xml_path) and isKeyframe(xml_path):
+                keyframes.insert(0, (self._frame_time(row), keyframeShapes(xml_path)))
+                rows.insert(0, row)
+                if len(keyframes) == (3 if self.splineInterpolation.isChecked() else 2):
+                    break
+
+        if len(keyframes) < 2:
+            self.status('No frame saved or verified before the current one')
+            return
+
+        keyframe_names = ', '.join(self.imagesListDock.NameAt(row) for row in rows[:-1])
+        self.status('Interpolating boxes from keyframe %s' % keyframe_names)
+
+        names = [self.imagesListDock.NameAt(row) for row in range(rows[-2] + 1, current)]
+        frames = [(self._frame_time(row), images_source.GetSavePath(name))
+                  for row, name in zip(range(rows[-2] + 1, current), names)]
+        width, height = self._current_image.size
+        interpolator = KeyframeInterpolator(keyframes, frames, save_dir, [height, width, 3],
+                                            spline=self.splineInterpolation.isChecked())
+        worker = ProgressingWorker(self._interpolate_keyframes_func, images_source, interpolator, names)
+        worker.signals.result.connect(partial(self._on_keyframes_interpolated, keyframe_names=keyframe_names))
+        worker.signals.progress.connect(self._on_extracting_progress)
+        self._thread_pool.start(worker)
+
+    def _frame_time(self, row):
+        """Frame number of a video frame, the position in the list for other images."""
+        name = self.imagesListDock.NameAt(row)
+        return int(name) if name.isdigit() else row
+
+    def _interpolate_keyframes_func(self, images_source, interpolator, names, progress_callback):
+        written = interpolator.Run(progress_callback)
+        if written == 0:
+            return written
+
+        # the annotated video frames need their images
+        missing = [name for name in names if not os.path.exists(images_source.GetSavePath(name))]
+        if missing and hasattr(images_source, 'CreateFrameExtractor'):
+            images_source.CreateFrameExtractor(missing).Run(progress_callback)
+
+        return written
+
+    def _on_keyframes_interpolated(self, written, keyframe_names):
+        self.status('Interpolated boxes from keyframe %s written for %d frames' % (keyframe_names, written))
+
     def checkExtents(self, ex1, ex2):
         if not self.pointInside(ex1[0], ex1[1], ex2): return False
         if not self.pointInside(ex1[2], ex1[1], ex2): return False
@@ -952,26 +1172,48 @@ class MainWindow(QMainWindow, WindowMixin):
                         difficult = s.difficult)
 
         shapes = [format_shape(shape) for shape in self.canvas.shapes]
+        # the file is written in background, it gets a snapshot of the current state
+        labelFile = LabelFile()
+        labelFile.verified = self.labelFile.verified
+        lineColor, fillColor = self.lineColor.getRgb(), self.fillColor.getRgb()
+        width, height = self._current_image.size
+        imageShape = [height, width, 3]
         # Can add differrent annotation formats here
-        try:
-            if self.usingPascalVocFormat is True:
-                if annotationFilePath[-4:].lower() != ".xml":
-                    annotationFilePath += XML_EXT
-                self.labelFile.savePascalVocFormat(annotationFilePath, shapes, imageFilePath,
-                                                   self.lineColor.getRgb(), self.fillColor.getRgb())
-            elif self.usingYoloFormat is True:
-                if annotationFilePath[-4:].lower() != ".txt":
-                    annotationFilePath += TXT_EXT
-                self.labelFile.saveYoloFormat(annotationFilePath, shapes, imageFilePath, self.labelMap.getLabels(),
-                                              self.lineColor.getRgb(), self.fillColor.getRgb())
-            else:
-                self.labelFile.save(annotationFilePath, shapes, imageFilePath,
-                                    self.lineColor.getRgb(), self.fillColor.getRgb())
-            print('Image:{0} -> Annotation:{1}'.format(self._file_path, annotationFilePath))
-            return True
-        except LabelFileError as e:
-            self.errorMessage(u'Error saving label data', u'<b>%s</b>' % e)
-            return False
+        if self.usingPascalVocFormat is True:
+            if annotationFilePath[-4:].lower() != ".xml":
+                annotationFilePath += XML_EXT
+            write = lambda path: labelFile.savePascalVocFormat(path, shapes, imageFilePath, lineColor, fillColor,
+                                                               imageShape=imageShape)
+        elif self.usingYoloFormat is True:
+            if annotationFilePath[-4:].lower() != ".txt":
+                annotationFilePath += TXT_EXT
+            classList = self.labelMap.getLabels()
+            write = lambda path: labelFile.saveYoloFormat(path, shapes, imageFilePath, classList, lineColor, fillColor,
+                                                          imageShape=imageShape)
+        else:
+            write = lambda path: labelFile.save(path, shapes, imageFilePath, lineColor, fillColor)
+
+        self._saver.Submit(annotationFilePath, lambda path: atomicWrite(path, write))
+        print('Image:{0} -> Annotation:{1}'.format(self._file_path, annotationFilePath))
+        return annotationFilePath
+
+    def _on_pending_writes_changed(self, pending):
+        self.labelPendingWrites.setText('Saving %d file(s)' % pending if pending else '')
+
+    def _on_write_done(self, path):
+        if self._saving_labels is not None and self._saving_labels[0] == path:
+            # no edits since the labels were submitted
+            if self._saving_labels[1] == self._edit_count:
+                self.setClean()
+                self.statusBar().showMessage('Saved to  %s' % path)
+
+            self._saving_labels = None
+
+    def _on_write_failed(self, path, message):
+        if self._saving_labels is not None and self._saving_labels[0] == path:
+            self._saving_labels = None
+
+        self.errorMessage(u'Error saving label data', u'<b>%s</b><br/>%s' % (message, path))
 
     def copySelectedShape(self):
         self.addLabel(self.canvas.copySelectedShape())
@@ -1190,14 +1432,85 @@ class MainWindow(QMainWindow, WindowMixin):
         if self.canvas and not self._current_image.isNull() and self.zoomMode != self.MANUAL_ZOOM:
             self.adjustScale()
 
+        images_source = self.imagesListDock.GetSource()
+        if isinstance(images_source, FolderImagesSource):
+            images_source.displaySize = self.displaySize()
+
         super(MainWindow, self).resizeEvent(event)
 
+    def displaySize(self):
+        """Size of the image area in device pixels, images larger than it may be decoded reduced."""
+        ratio = self.devicePixelRatioF()
+        return max(1, int(self.centralWidget().width() * ratio)), max(1, int(self.centralWidget().height() * ratio))
+
     def paintCanvas(self):
         assert not self._current_image.isNull(), "cannot paint null image"
         self.canvas.scale = 0.01 * self.zoomWidget.value()
+        self.loadFullResolutionIfMagnified()
         self.canvas.adjustSize()
         self.canvas.update()
 
+    def loadFullResolutionIfMagnified(self):
+        image = self._current_image
+        if not image.isReduced() or not self.canvas.pixmap or self._full_resolution_image is image:
+            return
+
+        # zoomed in beyond the decoded pixels, the cached image stays reduced
+        if self.canvas.scale * image.size[0] * self.devicePixelRatioF() > self.canvas.pixmap.width():
+            self._full_resolution_image = image
+            worker = Worker(self._decode_full_resolution_func, image,
+                            is_cancelled=lambda: self._current_image is not image)
+            worker.signals.result.connect(partial(self._on_full_resolution_decoded, image))
+            self._thread_pool.start(worker)
+
+    def _decode_full_resolution_func(self, image, is_cancelled):
+        pixels = image.FullResolutionPixels()
+        height, width = pixels.shape[:2]
+        qtimage = QImage(pixels.data, width, height, pixels.strides[0], QImage.Format_RGB888)
+        if width * height < TILED_IMAGE_MIN_PIXELS:
+            # the pixmap is created on the GUI thread
+            return qtimage.copy(), None
+
+        pyramid = TilePyramid(qtimage, pixels)
+        if not pyramid.Build(is_cancelled, image.qtimage):
+            return None, None
+
+        return None, pyramid
+
+    def _on_full_resolution_decoded(self, image, result):
+        qtimage, pyramid = result
+        if self._current_image is not image:
+            return
+
+        if pyramid is not None:
+            self.canvas.setPyramid(pyramid)
+        elif qtimage is not None:
+            self.canvas.replacePixmap(QPixmap.fromImage(qtimage))
+
+    def imagePixmap(self, image):
+        """
+        Pixmap of the image; for a very large image a quick preview, the tile pyramid
+        painted instead of it is built in background.
+        """
+        self._full_resolution_image = None
+        qtimage = image.qtimage
+        width, height = image.pixelSize
+        if width * height < TILED_IMAGE_MIN_PIXELS:
+            return QPixmap.fromImage(qtimage)
+
+        # the pyramid keeps the pixels even if the image is evicted from the cache
+        pyramid = TilePyramid(qtimage, image.npimage)
+        worker = Worker(pyramid.Build, is_cancelled=lambda: self._current_image is not image)
+        worker.signals.result.connect(partial(self._on_pyramid_built, image, pyramid))
+        self._thread_pool.start(worker)
+
+        return QPixmap.fromImage(qtimage.scaled(QSize(*self.displaySize()), Qt.KeepAspectRatio,
+                                                Qt.FastTransformation))
+
+    def _on_pyramid_built(self, image, pyramid, built):
+        if built and self._current_image is image:
+            self.canvas.setPyramid(pyramid)
+
     def adjustScale(self, initial=False):
         value = self.scalers[self.FIT_WINDOW if initial else self.zoomMode]()
         self.zoomWidget.setValue(int(100 * value))
@@ -1209,15 +1522,15 @@ class MainWindow(QMainWindow, WindowMixin):
         h1 = self.centralWidget().height() - e
         a1 = w1 / h1
         # Calculate a new scale value based on the pixmap's aspect ratio.
-        w2 = self.canvas.pixmap.width() - 0.0
-        h2 = self.canvas.pixmap.height() - 0.0
+        w2 = self.canvas.imageSize.width() - 0.0
+        h2 = self.canvas.imageSize.height() - 0.0
         a2 = w2 / h2
         return w1 / w2 if a2 >= a1 else h1 / h2
 
     def scaleFitWidth(self):
         # The epsilon does not seem to work too well here.
         w = self.centralWidget().width() - 2.0
-        return w / self.canvas.pixmap.width()
+        return w / self.canvas.imageSize.width()
 
     def closeEvent(self, event):
         if not self.mayContinue():
@@ -1255,9 +1568,19 @@ class MainWindow(QMainWindow, WindowMixin):
         settings[SETTING_SINGLE_CLASS] = self.singleClassMode.isChecked()
         settings[SETTING_PAINT_LABEL] = self.displayLabelOption.isChecked()
         settings[SETTING_RESTORE_ON_START] = self.autoRestore.isChecked()
+        settings[SETTING_ADAPTIVE_SAMPLING] = self.adaptiveSampling.isChecked()
+        settings[SETTING_FRAME_STORE] = self.frameStore.isChecked()
+        settings[SETTING_SPLINE_INTERPOLATION] = self.splineInterpolation.isChecked()
         settings[SETTING_AUTO_DETECTION] = self.recognitionDock.Settings()
+        self.recognitionDock.SaveCache()
+        settings[SETTING_FRAME_CACHE_BUDGET] = FrameCache.getInstance().budget
         settings.save()
 
+        # do not lose the queued writes
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        self._saver.Flush()
+        QApplication.restoreOverrideCursor()
+
     def loadRecent(self, filename):
         if self.mayContinue():
             self._load_file(filename)
@@ -1300,9 +1623,14 @@ class MainWindow(QMainWindow, WindowMixin):
         if not self.mayContinue() or not dirpath:
             return
 
+        self._release_source_video()
         self._storage_type = STORAGE_TYPE_FOLDER
         self._last_open_dir = dirpath
-        images_source = FolderImagesSource(dirpath)
+        images_source = FolderImagesSource(dirpath, display_size=self.displaySize())
+        self.recognitionDock.SetStorage(dirpath)
+        self.recognitionDock.SetImagesSource(images_source)
+        self.tracker.Reset()
+        self._propagated = {}
         self.imagesListDock.SetSource(images_source)
         self.imagesListDock.SetImage(filename)
 
@@ -1310,12 +1638,28 @@ class MainWindow(QMainWindow, WindowMixin):
         if not self.mayContinue() or not videopath:
             return
 
+        self._release_source_video()
         self._storage_type = STORAGE_TYPE_VIDEO
         self._video_file_path = videopath
-        images_source = VideoImagesSource(videopath)
+        frame_sampler = FrameSampler() if self.adaptiveSampling.isChecked() else None
+        images_source = VideoImagesSource(videopath, frame_sampler=frame_sampler,
+                                          use_frame_store=self.frameStore.isChecked())
+        self.recognitionDock.SetStorage(videopath)
+        self.recognitionDock.SetImagesSource(images_source)
+        self.tracker.Reset()
+        self._propagated = {}
         self.imagesListDock.SetSource(images_source)
         self.imagesListDock.SetImage(filename)
 
+    def _release_source_video(self):
+        # the captures of the previous video are closed, its frames are read by the new source only
+        if self._storage_type == STORAGE_TYPE_VIDEO and self._video_file_path:
+            VideoService.getInstance().Release(self._video_file_path)
+
+    def reopenSourceVideo(self):
+        if self._storage_type == STORAGE_TYPE_VIDEO and self._video_file_path:
+            self.setSourceVideo(self._video_file_path, self._file_path)
+
     def verifyImg(self, _value=False):
         # Proceding next image without dialog if having any label
         if self._file_path is not None:
@@ -1394,8 +1738,37 @@ class MainWindow(QMainWindow, WindowMixin):
             ProgramState.getInstance().videoFilePath = filename
             self.setSourceVideo(filename, "")
 
+    def extractVideoFrames(self):
+        if self._extracting_frames:
+            self._cancel_extracting = True
+            return
+
+        images_source = self.imagesListDock.GetSource()
+        if not isinstance(images_source, VideoImagesSource):
+            return
+
+        self._extracting_frames = True
+        self._cancel_extracting = False
+        extractor = images_source.CreateFrameExtractor()
+        worker = ProgressingWorker(extractor.Run, is_cancelled=lambda: self._cancel_extracting)
+        worker.signals.result.connect(self._on_extracting_result)
+        worker.signals.progress.connect(self._on_extracting_progress)
+        worker.signals.finished.connect(self._on_extracting_finished)
+
+        self._thread_pool.start(worker)
+
+    def _on_extracting_result(self, written):
+        self.status('Extracted %d frames' % written)
+
+    def _on_extracting_progress(self, step, status):
+        self.status('%s %d%%' % (status, step))
+
+    def _on_extracting_finished(self):
+        self._extracting_frames = False
+        self._cancel_extracting = False
+
     def saveFile(self):
-        imagepath = self._current_image.Save()
+        imagepath = self._current_image.Save(self._saver)
 
         program_state = ProgramState.getInstance()
         if program_state.defaultSaveDir is not None and len(ustr(program_state.defaultSaveDir)):
@@ -1434,9 +1807,11 @@ class MainWindow(QMainWindow, WindowMixin):
         return ''
 
     def saveLabelsFile(self, labelsFilePath, imageFilePath):
-        if labelsFilePath and self.saveLabels(labelsFilePath, imageFilePath):
-            self.setClean()
-            self.statusBar().showMessage('Saved to  %s' % labelsFilePath)
+        annotationFilePath = self.saveLabels(labelsFilePath, imageFilePath) if labelsFilePath else None
+        if annotationFilePath:
+            # the labels stay dirty until the file is written
+            self._saving_labels = (annotationFilePath, self._edit_count)
+            self.statusBar().showMessage('Saving to  %s' % annotationFilePath)
             self.statusBar().show()
 
     def closeFile(self, _value=False):
@@ -1455,7 +1830,9 @@ class MainWindow(QMainWindow, WindowMixin):
         proc.startDetached(os.path.abspath(__file__))
 
     def mayContinue(self):
-        return not (self.dirty and not self.discardChangesDialog())
+        # labels being saved do not ask, a failed write is reported when it happens
+        saving = self._saving_labels is not None and self._saving_labels[1] == self._edit_count
+        return not (self.dirty and not saving and not self.discardChangesDialog())
 
     def discardChangesDialog(self):
         yes, no = QMessageBox.Yes, QMessageBox.No
@@ -1572,4 +1949,6 @@ def main():
 
 
 if __name__ == '__main__':
+    # the worker processes of a frozen build start this executable again
+    multiprocessing.freeze_support()
     sys.exit(main())
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measures detector throughput on CPU: one run per image (detect) against
+batched runs (detectBatch) of several sizes. The model may be a frozen graph
+(TensorFlow), an ONNX/Caffe model (OpenCV DNN) or "fake".
+
+Usage: python benchmarks/bench_detection_batch.py MODEL [images [width height]]
+"""
+import os
+import sys
+import time
+
+# the comparison is meant for CPU inference
+os.environ['CUDA_VISIBLE_DEVICES'] = '-1'
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from libs.namedImage import NamedImage
+from libs.detectorBackend import createDetector
+
+BATCH_SIZES = (2, 4, 8)
+
+
+def make_images(count, width, height):
+    rng = np.random.RandomState(0)
+    images = []
+    for i in range(count):
+        image = NamedImage('%08d' % i)
+        # FromArray takes BGR pixels, the order does not matter for random content
+        image.FromArray(rng.randint(0, 256, (height, width, 3), dtype=np.uint8), 'bench_%d' % i, 'bench_%d.jpg' % i)
+        images.append(image)
+
+    return images
+
+
+def main(argv):
+    if len(argv) < 2:
+        print(__doc__)
+        return
+
+    count = int(argv[2]) if len(argv) > 2 else 32
+    width = int(argv[3]) if len(argv) > 3 else 800
+    height = int(argv[4]) if len(argv) > 4 else 450
+
+    detector = createDetector(argv[1])
+    images = make_images(count, width, height)
+
+    # the first runs include graph optimisation and memory allocation
+    detector.detect(images[0])
+    detector.detectBatch(images[:max(BATCH_SIZES)])
+
+    start = time.perf_counter()
+    for image in images:
+        detector.detect(image)
+    single_seconds = time.perf_counter() - start
+
+    print(str.format('{0} images {1}x{2}', count, width, height))
+    print(str.format('{0:>10}: {1:8.2f} images/s', 'single', count / single_seconds))
+    best_size, best_seconds = 1, single_seconds
+    for batch_size in BATCH_SIZES:
+        start = time.perf_counter()
+        for first in range(0, count, batch_size):
+            detector.detectBatch(images[first:first + batch_size])
+        seconds = time.perf_counter() - start
+
+        print(str.format('{0:>10}: {1:8.2f} images/s ({2:.2f}x)', 'batch %d' % batch_size, count / seconds,
+                         single_seconds / seconds))
+        # gains within the noise of the measurement do not count
+        if seconds < best_seconds * 0.9:
+            best_size, best_seconds = batch_size, seconds
+
+    print(str.format('best batch size: {0}', best_size))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
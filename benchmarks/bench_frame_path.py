@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compares the former decoded frame -> QPixmap path with the NamedImage one.
+
+Usage: python benchmarks/bench_frame_path.py [width height [repeats]]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import cv2
+
+from PIL import Image
+from PIL.ImageQt import ImageQt
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+from PyQt5.QtGui import QPixmap
+from PyQt5.QtWidgets import QApplication
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from libs.namedImage import NamedImage
+
+PROCESSING_SIZES = (800, 450)
+
+
+def former_path(frame):
+    # cv2.resize -> cv2.cvtColor -> PIL.Image.fromarray -> ImageQt -> QPixmap
+    resized = cv2.resize(frame, PROCESSING_SIZES)
+    image = Image.fromarray(cv2.cvtColor(resized, cv2.COLOR_BGR2RGB), 'RGB')
+    return QPixmap.fromImage(ImageQt(image))
+
+
+def named_image_path(frame):
+    # cv2.resize -> in-place channel swap -> QImage over the same buffer -> QPixmap
+    image = NamedImage('bench')
+    image.FromArray(cv2.resize(frame, PROCESSING_SIZES), 'bench', 'bench.jpg')
+    return QPixmap.fromImage(image.qtimage)
+
+
+def measure(fn, frame, repeats):
+    fn(frame)
+
+    tracemalloc.start()
+    fn(frame)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn(frame)
+
+    return (time.perf_counter() - start) / repeats, peak
+
+
+def main(argv):
+    width = int(argv[1]) if len(argv) > 1 else 1920
+    height = int(argv[2]) if len(argv) > 2 else 1080
+    repeats = int(argv[3]) if len(argv) > 3 else 200
+
+    app = QApplication(argv)
+    frame = np.random.randint(0, 256, (height, width, 3), dtype=np.uint8)
+    frame_bytes = PROCESSING_SIZES[0] * PROCESSING_SIZES[1] * 3
+
+    print(str.format('{0}x{1} frame resized to {2}x{3}, {4} repeats', width, height,
+                     PROCESSING_SIZES[0], PROCESSING_SIZES[1], repeats))
+    for name, fn in (('former', former_path), ('NamedImage', named_image_path)):
+        seconds, peak = measure(fn, frame, repeats)
+        print(str.format('{0:>12}: {1:8.3f} ms/frame, peak python heap {2:6.2f} frame copies',
+                         name, seconds * 1000, peak / frame_bytes))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compares the former Image.getdata() based NamedImage.npimage conversion with the
+buffer-protocol one on large JPEG and PNG files.
+
+Usage: python benchmarks/bench_npimage.py [width height [repeats]]
+"""
+import os
+import sys
+import time
+import tempfile
+
+import numpy as np
+
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from libs.namedImage import NamedImage
+
+
+def former_npimage(path):
+    image = Image.open(path)
+    (im_width, im_height) = image.size
+    return np.array(image.getdata()).reshape((im_height, im_width, 3)).astype(np.uint8)
+
+
+def named_image_npimage(path):
+    image = NamedImage(os.path.basename(path))
+    image.FromFile(path)
+    return image.npimage
+
+
+def measure(fn, path, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        res = fn(path)
+
+    return (time.perf_counter() - start) / repeats, res
+
+
+def main(argv):
+    width = int(argv[1]) if len(argv) > 1 else 4000
+    height = int(argv[2]) if len(argv) > 2 else 3000
+    repeats = int(argv[3]) if len(argv) > 3 else 3
+
+    # smooth content keeps the encoded files close to real photos in size
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, np.newaxis]
+    pixels = np.dstack([(x + y) / 2, np.broadcast_to(x, (height, width)), np.broadcast_to(y, (height, width))])
+    image = Image.fromarray(pixels.astype(np.uint8), 'RGB')
+
+    with tempfile.TemporaryDirectory() as folder:
+        for ext in ('jpg', 'png'):
+            path = os.path.join(folder, 'bench.' + ext)
+            image.save(path)
+
+            print(str.format('{0}x{1} {2}, {3} repeats', width, height, ext.upper(), repeats))
+            former_seconds, former = measure(former_npimage, path, repeats)
+            seconds, res = measure(named_image_npimage, path, repeats)
+            assert np.array_equal(former, res)
+
+            print(str.format('{0:>12}: {1:8.1f} ms', 'former', former_seconds * 1000))
+            print(str.format('{0:>12}: {1:8.1f} ms ({2:.1f}x)', 'NamedImage', seconds * 1000,
+                             former_seconds / seconds))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
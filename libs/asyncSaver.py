@@ -0,0 +1,94 @@
+import os
+import threading
+import traceback
+from collections import OrderedDict
+
+from PyQt5.QtCore import *
+
+
+class AsyncSaverSignals(QObject):
+    # number of writes not done yet
+    pendingChanged = pyqtSignal(int)
+    # target path, written successfully
+    written = pyqtSignal(str)
+    # target path, error message
+    failed = pyqtSignal(str, str)
+
+
+def atomicWrite(path: str, write_fn):
+    """
+    Call write_fn with a temporary path next to path and rename the result to path,
+    so that readers never see a partially written file.
+    """
+    folder = os.path.dirname(path)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder, exist_ok=True)
+
+    tmp_path = path + '.tmp'
+    try:
+        write_fn(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class AsyncSaver:
+    """
+    Write-behind queue of file writes done on one background thread.
+
+    Writes are keyed by their target path: a write submitted while an older one
+    for the same path is still queued replaces it, only the latest content is written.
+    """
+
+    def __init__(self):
+        self.signals = AsyncSaverSignals()
+        self._jobs = OrderedDict()
+        self._writing = None
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='AsyncSaver', daemon=True)
+        self._thread.start()
+
+    @property
+    def pendingCount(self) -> int:
+        with self._condition:
+            return len(self._jobs) + (1 if self._writing is not None else 0)
+
+    def Submit(self, path: str, write_fn):
+        """Queue write_fn(path) replacing a queued write of the same path."""
+        with self._condition:
+            self._jobs.pop(path, None)
+            self._jobs[path] = write_fn
+            pending = len(self._jobs) + (1 if self._writing is not None else 0)
+            self._condition.notify_all()
+
+        self.signals.pendingChanged.emit(pending)
+
+    def Flush(self, timeout=None) -> bool:
+        """Wait until all queued writes are done, False on timeout."""
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._jobs and self._writing is None, timeout)
+
+    # private methods
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._jobs:
+                    self._condition.wait()
+
+                path, write_fn = self._jobs.popitem(last=False)
+                self._writing = path
+
+            try:
+                write_fn(path)
+                self.signals.written.emit(path)
+            except Exception as e:
+                traceback.print_exc()
+                self.signals.failed.emit(path, str(e))
+
+            with self._condition:
+                self._writing = None
+                pending = len(self._jobs)
+                self._condition.notify_all()
+
+            self.signals.pendingChanged.emit(pending)
@@ -0,0 +1,185 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+from PIL import Image
+
+try:
+    from scipy.interpolate import CubicSpline
+except ImportError:
+    CubicSpline = None
+
+from libs.objectTracker import assignPairs, sameLabels
+from libs.pascal_voc_io import PascalVocReader
+from libs.labelFile import LabelFile
+from libs.preLabeler import addAnnotations, annotationPath, PRELABEL_DATABASE_SRC
+
+DEFAULT_WRITE_THREADS = 8
+# source of the annotations written by the interpolation, they are no keyframes
+INTERPOLATION_DATABASE_SRC = 'LabelVideoInterpolation'
+# boxes of keyframes moved farther than this many box diagonals per MAX_SHIFT_FRAMES show
+# different objects, when the label is found several times
+DEFAULT_MAX_SHIFT = 1.0
+MAX_SHIFT_FRAMES = 30
+# score of box pairs of different labels or moved too far, they are never matched
+_UNMATCHABLE = -1e12
+
+
+def keyframeShapes(xml_path: str) -> list:
+    """(label, extent) of the boxes of a Pascal VOC file."""
+    return [(label, LabelFile.convertPoints2BndBox(points))
+            for label, points, line_color, fill_color, difficult in PascalVocReader(xml_path).getShapes()]
+
+
+def isKeyframe(xml_path: str) -> bool:
+    """The annotation was verified or saved by the user, not written by the pre-labelling or the interpolation."""
+    reader = PascalVocReader(xml_path)
+    return reader.verified or reader.databaseSrc not in (PRELABEL_DATABASE_SRC, INTERPOLATION_DATABASE_SRC)
+
+
+def matchKeyframeShapes(shapes_a: list, shapes_b: list, time_gap=0, max_shift=DEFAULT_MAX_SHIFT) -> list:
+    """
+    Pairs (i, j) of the shapes of two keyframes time_gap frames apart showing the same object.
+    A label found once on both keyframes pairs its boxes wherever they are; boxes of labels
+    found several times are paired by nearest centers, moved by no more than max_shift box
+    diagonals per MAX_SHIFT_FRAMES.
+    """
+    if not shapes_a or not shapes_b:
+        return []
+
+    labels_a = [label for label, extent in shapes_a]
+    labels_b = [label for label, extent in shapes_b]
+    boxes_a = np.array([extent for label, extent in shapes_a], dtype=np.float64).reshape(-1, 2, 2)
+    boxes_b = np.array([extent for label, extent in shapes_b], dtype=np.float64).reshape(-1, 2, 2)
+    diagonals = np.maximum(np.linalg.norm(boxes_a[:, 1] - boxes_a[:, 0], axis=1)[:, None],
+                           np.linalg.norm(boxes_b[:, 1] - boxes_b[:, 0], axis=1)[None, :])
+    shifts = np.linalg.norm(boxes_a.mean(axis=1)[:, None, :] - boxes_b.mean(axis=1)[None, :, :], axis=2)
+    scores = -shifts / np.maximum(diagonals, 1.0)
+
+    unique = np.array([labels_a.count(label) == 1 for label in labels_a])[:, None] & \
+             np.array([labels_b.count(label) == 1 for label in labels_b])[None, :]
+    limit = max_shift * max(1.0, abs(time_gap) / MAX_SHIFT_FRAMES)
+    scores[(scores < -limit) & ~unique] = _UNMATCHABLE
+    scores[~sameLabels(labels_a, labels_b)] = _UNMATCHABLE
+    return assignPairs(scores, _UNMATCHABLE / 2)
+
+
+def interpolateBoxes(key_times, key_boxes, times, spline=False) -> np.ndarray:
+    """
+    Boxes (len(times), M, 4) at times from key_boxes (K, M, 4) at the increasing key_times,
+    piecewise linear or a cubic spline through the keyframes when scipy is installed.
+    """
+    key_times = np.asarray(key_times, dtype=np.float64)
+    key_boxes = np.asarray(key_boxes, dtype=np.float64)
+    times = np.asarray(times, dtype=np.float64)
+    if spline and CubicSpline is not None and len(key_times) >= 3:
+        return CubicSpline(key_times, key_boxes, axis=0)(times)
+
+    segment = np.clip(np.searchsorted(key_times, times, side='right') - 1, 0, len(key_times) - 2)
+    t = ((times - key_times[segment]) / (key_times[segment + 1] - key_times[segment]))[:, None, None]
+    return key_boxes[segment] + t * (key_boxes[segment + 1] - key_boxes[segment])
+
+
+def _image_shape(path: str, default_shape: list) -> list:
+    if os.path.exists(path):
+        # only the header is read
+        with Image.open(path) as image:
+            width, height = image.size
+            return [height, width, 3]
+
+    return default_shape
+
+
+class KeyframeInterpolator:
+    """
+    Annotates the frames between two keyframes with the boxes of the objects found on both,
+    moved linearly or along a spline through an earlier keyframe. Frames already verified
+    are left alone, boxes are added to the other annotations.
+    """
+
+    def __init__(self, keyframes: list, frames: list, save_dir: str, default_shape: list, spline=False,
+                 threads=DEFAULT_WRITE_THREADS):
+        """
+        keyframes are (time, [(label, extent)]) by increasing time, the frames between the
+        last two get the boxes; frames are their (time, image path). Images missing on
+        disk (video frames not saved yet) are taken as default_shape.
+        """
+        self._keyframes = keyframes
+        self._frames = frames
+        self._save_dir = save_dir
+        self._default_shape = default_shape
+        self._spline = spline
+        self._threads = threads
+
+    def Interpolate(self) -> list:
+        """(image path, [(label, extent)]) of the frames."""
+        if len(self._keyframes) < 2 or not self._frames:
+            return []
+
+        (time_a, shapes_a), (time_b, shapes_b) = self._keyframes[-2:]
+        pairs = matchKeyframeShapes(shapes_a, shapes_b, time_b - time_a)
+
+        # objects also on the earlier keyframe follow a spline, the others a line
+        earlier = {}
+        if self._spline and len(self._keyframes) >= 3:
+            time_0, shapes_0 = self._keyframes[-3]
+            earlier = {j: i for i, j in matchKeyframeShapes(shapes_0, shapes_a, time_a - time_0)}
+
+        times = np.array([time for time, path in self._frames], dtype=np.float64)
+        labels = []
+        boxes = []
+        curved = [(i, j) for i, j in pairs if i in earlier]
+        if curved:
+            key_boxes = [[self._keyframes[-3][1][earlier[i]][1] for i, j in curved],
+                         [shapes_a[i][1] for i, j in curved],
+                         [shapes_b[j][1] for i, j in curved]]
+            boxes.append(interpolateBoxes([self._keyframes[-3][0], time_a, time_b], key_boxes, times, spline=True))
+            labels += [shapes_b[j][0] for i, j in curved]
+
+        straight = [(i, j) for i, j in pairs if i not in earlier]
+        if straight:
+            key_boxes = [[shapes_a[i][1] for i, j in straight], [shapes_b[j][1] for i, j in straight]]
+            boxes.append(interpolateBoxes([time_a, time_b], key_boxes, times))
+            labels += [shapes_b[j][0] for i, j in straight]
+
+        if not labels:
+            return []
+
+        boxes = np.rint(np.concatenate(boxes, axis=1)).astype(int)
+        return [(path, [(label, tuple(int(v) for v in box)) for label, box in zip(labels, frame_boxes)])
+                for (time, path), frame_boxes in zip(self._frames, boxes)]
+
+    def Run(self, progress_callback=None, is_cancelled=None) -> int:
+        """Write the annotations of the frames in parallel, returns the number of annotated frames."""
+        results = self.Interpolate()
+        if not results:
+            return 0
+
+        written = 0
+        with ThreadPoolExecutor(max_workers=self._threads) as executor:
+            futures = [executor.submit(self._write, path, shapes) for path, shapes in results]
+            for done, future in enumerate(as_completed(futures)):
+                if future.result():
+                    written += 1
+
+                if progress_callback:
+                    progress_callback.emit(int(100 * (done + 1) / len(futures)), 'Interpolating boxes')
+
+                if is_cancelled and is_cancelled():
+                    for pending in futures:
+                        pending.cancel()
+                    break
+
+        return written
+
+    # private methods
+    def _write(self, image_path, shapes) -> bool:
+        xml_path = annotationPath(self._save_dir, image_path)
+        if os.path.exists(xml_path) and PascalVocReader(xml_path).verified:
+            return False
+
+        shapes = [dict(label=label, points=[(x1, y1), (x2, y1), (x2, y2), (x1, y2)], difficult=False)
+                  for label, (x1, y1, x2, y2) in shapes]
+        return addAnnotations(xml_path, image_path, _image_shape(image_path, self._default_shape), shapes,
+                              database_src=INTERPOLATION_DATABASE_SRC) > 0
@@ -0,0 +1,138 @@
+import numpy as np
+
+import cv2
+
+DEFAULT_PROPAGATION_FRAMES = 5
+MAX_FEATURES_PER_BOX = 40
+# a box whose object keeps fewer features than this is lost
+MIN_TRACKED_FEATURES = 3
+# pixels a feature tracked forward and back again may end away from where it started
+MAX_FORWARD_BACKWARD_ERROR = 1.0
+LK_PARAMS = dict(winSize=(21, 21), maxLevel=3,
+                 criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 30, 0.01))
+
+
+def grayPixels(image):
+    """Gray pixels of a NamedImage and the factor from annotation to pixel coordinates."""
+    width, height = image.size
+    pixel_width, pixel_height = image.pixelSize
+    return cv2.cvtColor(image.npimage, cv2.COLOR_RGB2GRAY), pixel_width / width
+
+
+def boxFeatures(gray, boxes):
+    """Corners to track inside the boxes and the index of the box of each corner."""
+    points = []
+    owners = []
+    for k, box in enumerate(boxes):
+        x1, y1, x2, y2 = np.clip(np.round(box), 0, [gray.shape[1], gray.shape[0]] * 2).astype(int)
+        if x2 - x1 < 2 or y2 - y1 < 2:
+            continue
+
+        corners = cv2.goodFeaturesToTrack(gray[y1:y2, x1:x2], MAX_FEATURES_PER_BOX, 0.01, 3)
+        if corners is None:
+            continue
+
+        points.append(corners.reshape(-1, 2) + (x1, y1))
+        owners.append(np.full(len(points[-1]), k))
+
+    if not points:
+        return np.zeros((0, 1, 2), np.float32), np.zeros(0, int)
+
+    return np.concatenate(points).astype(np.float32).reshape(-1, 1, 2), np.concatenate(owners)
+
+
+def moveBoxes(boxes, old_points, new_points, owners):
+    """
+    Boxes moved by the median displacement of their features and scaled by the median
+    change of the feature distances to their centroid, with the count of features of each box.
+    """
+    moved = np.array(boxes, dtype=np.float64)
+    counts = np.bincount(owners, minlength=len(boxes))
+    for k in np.flatnonzero(counts):
+        old = old_points[owners == k]
+        new = new_points[owners == k]
+        dx, dy = np.median(new - old, axis=0)
+
+        scale = 1.0
+        if len(old) >= 2:
+            old_spread = np.linalg.norm(old - old.mean(axis=0), axis=1)
+            new_spread = np.linalg.norm(new - new.mean(axis=0), axis=1)
+            valid = old_spread > 1
+            if valid.any():
+                scale = float(np.median(new_spread[valid] / old_spread[valid]))
+
+        x1, y1, x2, y2 = moved[k]
+        cx, cy = (x1 + x2) / 2 + dx, (y1 + y2) / 2 + dy
+        half_width, half_height = (x2 - x1) * scale / 2, (y2 - y1) * scale / 2
+        moved[k] = (cx - half_width, cy - half_height, cx + half_width, cy + half_height)
+
+    return moved, counts
+
+
+class BoxPropagator:
+    """
+    Estimates the boxes of the current image on the following images of a source with
+    sparse optical flow: features inside each box are tracked with pyramidal Lucas-Kanade,
+    the features failing the forward-backward check are dropped.
+    """
+
+    def __init__(self, images_source, names: list, image, shapes: list):
+        """shapes are (label, (xmin, ymin, xmax, ymax)) of image, names the images to propagate them to."""
+        self._images_source = images_source
+        self._names = list(names)
+        self._image = image
+        self._labels = [label for label, extent in shapes]
+        self._boxes = np.array([extent for label, extent in shapes], dtype=np.float64).reshape(-1, 4)
+
+    def Run(self, progress_callback=None, is_cancelled=None) -> list:
+        """(name, [(label, extent, score)]) of the following images, score is the part of the features still tracked."""
+        results = []
+        gray, factor = grayPixels(self._image)
+        boxes = self._boxes * factor
+        labels = list(self._labels)
+        initial = None
+        for step, name in enumerate(self._names):
+            if not labels or (is_cancelled and is_cancelled()):
+                break
+
+            res, image = self._images_source.GetImage(name)
+            if not res:
+                break
+
+            next_gray, next_factor = grayPixels(image)
+            points, owners = boxFeatures(gray, boxes)
+            if initial is None:
+                initial = np.bincount(owners, minlength=len(boxes))
+
+            tracked = np.zeros(len(owners), dtype=bool)
+            new_points = points
+            if len(points):
+                new_points, status, error = cv2.calcOpticalFlowPyrLK(gray, next_gray, points, None, **LK_PARAMS)
+                back_points, back_status, error = cv2.calcOpticalFlowPyrLK(next_gray, gray, new_points, None,
+                                                                          **LK_PARAMS)
+                distance = np.linalg.norm((back_points - points).reshape(-1, 2), axis=1)
+                tracked = (status.ravel() == 1) & (back_status.ravel() == 1) & \
+                          (distance < MAX_FORWARD_BACKWARD_ERROR)
+
+            moved, counts = moveBoxes(boxes, points.reshape(-1, 2)[tracked], new_points.reshape(-1, 2)[tracked],
+                                      owners[tracked])
+            # boxes whose object is lost are not followed further
+            keep = counts >= MIN_TRACKED_FEATURES
+            boxes = moved[keep] * (next_factor / factor)
+            labels = [label for label, kept in zip(labels, keep) if kept]
+            scores = np.minimum(1.0, counts[keep] / np.maximum(initial[keep], 1))
+            initial = initial[keep]
+
+            width, height = image.size
+            frame = []
+            for label, box, score in zip(labels, boxes / next_factor, scores):
+                x1, y1, x2, y2 = np.clip(np.round(box), 0, [width - 1, height - 1] * 2).astype(int)
+                if x2 > x1 and y2 > y1:
+                    frame.append((label, (int(x1), int(y1), int(x2), int(y2)), float(score)))
+
+            results.append((name, frame))
+            gray, factor = next_gray, next_factor
+            if progress_callback:
+                progress_callback.emit(int(100 * (step + 1) / len(self._names)), 'Propagating boxes')
+
+        return results
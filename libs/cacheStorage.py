@@ -0,0 +1,89 @@
+import os
+import hashlib
+import pickle
+import threading
+
+CACHE_FOLDER_NAME = '.labelVideoCache'
+FINGERPRINT_HEAD_SIZE = 1 << 20
+
+# abspath -> fingerprint, the head of a file is hashed once while its size and mtime stay the same
+_fingerprints = {}
+_fingerprints_lock = threading.Lock()
+
+
+def cacheFolder() -> str:
+    """
+    Folder keeping the per-file caches (video indexes, analysis results, etc.)
+    """
+    folder = os.path.join(os.path.expanduser("~"), CACHE_FOLDER_NAME)
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+
+    return folder
+
+
+def fileFingerprint(path: str) -> tuple:
+    """
+    Identify the content of a file by its size, modification time and
+    the hash of its head, so that a cache entry is dropped when the file changes.
+    """
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    with _fingerprints_lock:
+        fingerprint = _fingerprints.get(key)
+    if fingerprint is not None and fingerprint[:2] == (stat.st_size, int(stat.st_mtime)):
+        return fingerprint
+
+    md5 = hashlib.md5()
+    with open(path, 'rb') as f:
+        md5.update(f.read(FINGERPRINT_HEAD_SIZE))
+
+    fingerprint = (stat.st_size, int(stat.st_mtime), md5.hexdigest())
+    with _fingerprints_lock:
+        _fingerprints[key] = fingerprint
+
+    return fingerprint
+
+
+def cacheFilePath(path: str, suffix: str) -> str:
+    key = hashlib.md5(os.path.abspath(path).encode('utf-8')).hexdigest()[:12]
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cacheFolder(), str.format('{0}_{1}{2}', name, key, suffix))
+
+
+def loadCached(path: str, suffix: str, fingerprint=None):
+    """
+    Return data stored by saveCached for the file or None if there is no data
+    or it was stored for a different fingerprint.
+    """
+    cache_path = cacheFilePath(path, suffix)
+    try:
+        if os.path.exists(cache_path):
+            with open(cache_path, 'rb') as f:
+                cached = pickle.load(f)
+
+            if fingerprint is None or cached.get('fingerprint') == fingerprint:
+                return cached.get('data')
+    except Exception as e:
+        print(e)
+
+    return None
+
+
+def dumpCached(cache_path: str, data, fingerprint=None):
+    """Write data in the format loadCached reads, e.g. to the temporary file of atomicWrite."""
+    with open(cache_path, 'wb') as f:
+        pickle.dump({'fingerprint': fingerprint, 'data': data}, f, pickle.HIGHEST_PROTOCOL)
+
+
+def saveCached(path: str, suffix: str, data, fingerprint=None) -> bool:
+    cache_path = cacheFilePath(path, suffix)
+    tmp_path = cache_path + '.tmp'
+    try:
+        dumpCached(tmp_path, data, fingerprint)
+        os.replace(tmp_path, cache_path)
+    except Exception as e:
+        print(e)
+        return False
+
+    return True
@@ -51,6 +51,10 @@ class Canvas(QWidget):
         self.offsets = QPointF(), QPointF()
         self.scale = 1.0
         self.pixmap = QPixmap()
+        # size of the image in the coordinates of the shapes, the pixmap may be smaller
+        self.imageSize = QSize()
+        # when set, the image is painted from its tiles instead of the pixmap
+        self.pyramid = None
         self.visible = {}
         self._hideBackround = False
         self.hideBackround = False
@@ -341,11 +345,11 @@ class Canvas(QWidget):
         Moves a point x,y to within the boundaries of the canvas.
         :return: (x,y,snapped) where snapped is True if x or y were changed, False if not.
         """
-        if x < 0 or x > self.pixmap.width() or y < 0 or y > self.pixmap.height():
+        if x < 0 or x > self.imageSize.width() or y < 0 or y > self.imageSize.height():
             x = max(x, 0)
             y = max(y, 0)
-            x = min(x, self.pixmap.width())
-            y = min(y, self.pixmap.height())
+            x = min(x, self.imageSize.width())
+            y = min(y, self.imageSize.height())
             return x, y, True
 
         return x, y, False
@@ -391,8 +395,8 @@ class Canvas(QWidget):
             pos -= QPointF(min(0, o1.x()), min(0, o1.y()))
         o2 = pos + self.offsets[1]
         if self.outOfPixmap(o2):
-            pos += QPointF(min(0, self.pixmap.width() - o2.x()),
-                           min(0, self.pixmap.height() - o2.y()))
+            pos += QPointF(min(0, self.imageSize.width() - o2.x()),
+                           min(0, self.imageSize.height() - o2.y()))
         # The next line tracks the new position of the cursor
         # relative to the shape, but also results in making it
         # a bit "shaky" when nearing the border and allows it to
@@ -462,7 +466,13 @@ class Canvas(QWidget):
         p.scale(self.scale, self.scale)
         p.translate(self.offsetToCenter())
 
-        p.drawPixmap(0, 0, self.pixmap)
+        if self.pyramid is not None:
+            exposed = QRectF(self.transformPos(QPointF(event.rect().topLeft())),
+                             self.transformPos(QPointF(event.rect().bottomRight())))
+            self.pyramid.Paint(p, exposed, self.imageSize, self.scale * self.devicePixelRatioF())
+        else:
+            # a reduced resolution pixmap is stretched over the image, shapes stay in image coordinates
+            p.drawPixmap(QRect(QPoint(0, 0), self.imageSize), self.pixmap)
 
         for dshape in self.detectedShapes[::-1]:
             dshape.paint(p)
@@ -492,8 +502,8 @@ class Canvas(QWidget):
 
         if self.drawing() and not self.prevPoint.isNull() and not self.outOfPixmap(self.prevPoint):
             p.setPen(QColor(0, 0, 0))
-            p.drawLine(self.prevPoint.x(), 0, self.prevPoint.x(), self.pixmap.height())
-            p.drawLine(0, self.prevPoint.y(), self.pixmap.width(), self.prevPoint.y())
+            p.drawLine(self.prevPoint.x(), 0, self.prevPoint.x(), self.imageSize.height())
+            p.drawLine(0, self.prevPoint.y(), self.imageSize.width(), self.prevPoint.y())
 
         self.setAutoFillBackground(True)
         if self.verified:
@@ -514,14 +524,14 @@ class Canvas(QWidget):
     def offsetToCenter(self):
         s = self.scale
         area = super(Canvas, self).size()
-        w, h = self.pixmap.width() * s, self.pixmap.height() * s
+        w, h = self.imageSize.width() * s, self.imageSize.height() * s
         aw, ah = area.width(), area.height()
         x = (aw - w) / (2 * s) if aw > w else 0
         y = (ah - h) / (2 * s) if ah > h else 0
         return QPointF(x, y)
 
     def outOfPixmap(self, p):
-        w, h = self.pixmap.width(), self.pixmap.height()
+        w, h = self.imageSize.width(), self.imageSize.height()
         return not (0 <= p.x() <= w and 0 <= p.y() <= h)
 
     def finalise(self):
@@ -550,7 +560,7 @@ class Canvas(QWidget):
         # Cycle through each image edge in clockwise fashion,
         # and find the one intersecting the current line segment.
         # http://paulbourke.net/geometry/lineline2d/
-        size = self.pixmap.size()
+        size = self.imageSize
         points = [(0, 0),
                   (size.width(), 0),
                   (size.width(), size.height()),
@@ -605,7 +615,7 @@ class Canvas(QWidget):
 
     def minimumSizeHint(self):
         if self.pixmap:
-            return self.scale * self.pixmap.size()
+            return self.scale * self.imageSize
         return super(Canvas, self).minimumSizeHint()
 
     def wheelEvent(self, ev):
@@ -698,12 +708,24 @@ class Canvas(QWidget):
         self.drawingPolygon.emit(False)
         self.update()
 
-    def loadPixmap(self, pixmap):
+    def loadPixmap(self, pixmap, image_size=None):
         self.pixmap = pixmap
+        self.imageSize = QSize(*image_size) if image_size else pixmap.size()
+        self.pyramid = None
         self.shapes = []
         self.detectedShapes = []
         self.repaint()
 
+    def replacePixmap(self, pixmap):
+        """Show the image in another resolution, the shapes are kept."""
+        self.pixmap = pixmap
+        self.pyramid = None
+        self.update()
+
+    def setPyramid(self, pyramid):
+        self.pyramid = pyramid
+        self.update()
+
     def loadShapes(self, shapes):
         self.shapes = list(shapes)
         self.current = None
@@ -745,6 +767,8 @@ class Canvas(QWidget):
     def resetState(self):
         self.restoreCursor()
         self.pixmap = None
+        self.pyramid = None
+        self.imageSize = QSize()
         self.update()
 
     def setDrawingShapeToSquare(self, status):
@@ -0,0 +1,80 @@
+from PyQt5.QtGui import *
+from PyQt5.QtCore import *
+from PyQt5.QtWidgets import *
+
+
+class ClassThresholds(QDialog):
+    """Table of the labels and the minimal score of the objects pre-labelling writes for each."""
+    __dialogWidth = 300
+
+    def __init__(self, parent, labels, thresholds, default_threshold):
+        super(ClassThresholds, self).__init__(parent)
+
+        self._table = QTableWidget(0, 2, self)
+        self._table.setHorizontalHeaderLabels(["Label", "Min score"])
+        self._table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self._table.verticalHeader().setVisible(False)
+        self._table.setSelectionMode(QAbstractItemView.NoSelection)
+
+        # labels of the model first, then the ones having a threshold from another model
+        self._spinboxes = {}
+        for label in list(labels) + sorted(set(thresholds) - set(labels)):
+            if label in self._spinboxes:
+                continue
+
+            row = self._table.rowCount()
+            self._table.insertRow(row)
+            item = QTableWidgetItem(label)
+            item.setFlags(Qt.ItemIsEnabled)
+            self._table.setItem(row, 0, item)
+
+            spinbox = QDoubleSpinBox(self._table)
+            spinbox.setRange(0.0, 1.0)
+            spinbox.setSingleStep(0.05)
+            # the lowest value keeps the threshold of all classes
+            spinbox.setSpecialValueText('Default (%.2f)' % default_threshold)
+            spinbox.setValue(thresholds.get(label, 0.0))
+            self._table.setCellWidget(row, 1, spinbox)
+            self._spinboxes[label] = spinbox
+
+        ok_button = QPushButton("OK")
+        ok_button.clicked.connect(self._on_ok)
+        cancel_button = QPushButton("Cancel")
+        cancel_button.clicked.connect(self._on_cancel)
+        buttons_layout = QHBoxLayout()
+        buttons_layout.setContentsMargins(0, 0, 0, 0)
+        buttons_layout.addStretch()
+        buttons_layout.addWidget(ok_button)
+        buttons_layout.addWidget(cancel_button)
+        buttons_widget = QWidget()
+        buttons_widget.setLayout(buttons_layout)
+
+        layout = QVBoxLayout()
+        layout.setContentsMargins(10, 10, 10, 10)
+        layout.addWidget(self._table)
+        layout.addWidget(buttons_widget)
+
+        self.setLayout(layout)
+        self.setMinimumWidth(ClassThresholds.__dialogWidth)
+        self.setWindowTitle("Pre-labelling thresholds")
+
+        self.retval = False
+        self.result = dict(thresholds)
+
+    def _on_ok(self):
+        ClassThresholds.__dialogWidth = self.width()
+        self.result = {label: spinbox.value() for label, spinbox in self._spinboxes.items() if spinbox.value() > 0}
+        self.retval = True
+        self.accept()
+
+    def _on_cancel(self):
+        ClassThresholds.__dialogWidth = self.width()
+        self.retval = False
+        self.accept()
+
+    def getResult(self):
+        return self.result
+
+    def exec_(self):
+        super(ClassThresholds, self).exec_()
+        return self.retval
@@ -18,6 +18,10 @@ SETTING_AUTO_SAVE = 'autosave'
 SETTING_SINGLE_CLASS = 'singleclass'
 SETTING_AUTO_DETECTION = 'autoDetection'
 SETTING_IMAGES_LIST='imagesList'
+SETTING_FRAME_CACHE_BUDGET = 'frameCacheBudget'
+SETTING_ADAPTIVE_SAMPLING = 'adaptiveSampling'
+SETTING_FRAME_STORE = 'frameStore'
+SETTING_SPLINE_INTERPOLATION = 'splineInterpolation'
 FORMAT_PASCALVOC='PascalVOC'
 FORMAT_YOLO='YOLO'
 SETTING_DRAW_SQUARE = 'draw/square'
@@ -0,0 +1,25 @@
+"""Helpers without Qt dependencies, usable by the headless tools."""
+from math import sqrt
+import re
+
+
+def distance(p):
+    return sqrt(p.x() * p.x() + p.y() * p.y())
+
+
+def natural_sort(list, key=lambda s:s):
+    """
+    Sort the list into natural alphanumeric order.
+    """
+    def get_alphanum_key_func(key):
+        convert = lambda text: int(text) if text.isdigit() else text
+        return lambda s: [convert(c) for c in re.split('([0-9]+)', key(s))]
+    sort_key = get_alphanum_key_func(key)
+    list.sort(key=sort_key)
+
+
+def natural_key(text):
+    """
+    Key sorting strings into natural alphanumeric order, as natural_sort does.
+    """
+    return tuple(int(c) if c.isdigit() else c for c in re.split('([0-9]+)', text))
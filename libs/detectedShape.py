@@ -1,7 +1,7 @@
 from PyQt5.QtGui import *
 from PyQt5.QtCore import *
 
-from libs.utils import distance
+from libs.coreUtils import distance
 import sys
 
 DEFAULT_LINE_COLOR = QColor(200, 200, 0, 255)
@@ -26,6 +26,8 @@ class DetectedShape(object):
         self.visible = True
         self.fclass = fclass
         self.garbaged = False
+        # object of the same track_id in other frames, set by ObjectTracker
+        self.track_id = None
 
     def paint(self, painter):
         if self.extent and self.visible:
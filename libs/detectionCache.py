@@ -0,0 +1,98 @@
+import os
+import threading
+from collections import OrderedDict
+
+from libs.cacheStorage import *
+from libs.asyncSaver import atomicWrite
+from libs.detectedShape import DetectedShape
+
+DETECTION_CACHE_SUFFIX = '.detections.pkl'
+DETECTION_CACHE_VERSION = 1
+# images with cached detections per storage, the least recently used ones are dropped
+DEFAULT_MAX_CACHED_IMAGES = 50000
+# the cache file is written after this many new results, and when the storage or model changes
+SAVE_EVERY_PUTS = 50
+
+
+class DetectionCache:
+    """
+    Detection results of one video or folder for one model, kept in one file in the cache folder.
+
+    Results are keyed by the image: its path and modification time for image files,
+    the frame name for video frames (the video itself is checked by its fingerprint).
+    The cache is dropped when the model file or the score threshold changes.
+    The file is written by saver (AsyncSaver) when one is given.
+    """
+
+    def __init__(self, storage_name: str, model_path: str, score_threshold: float,
+                 max_images=DEFAULT_MAX_CACHED_IMAGES, saver=None):
+        self._storage_name = storage_name
+        self._max_images = max_images
+        self._saver = saver
+        self._entries = OrderedDict()
+        self._unsaved = 0
+        self._lock = threading.Lock()
+
+        self._fingerprint = (DETECTION_CACHE_VERSION, fileFingerprint(model_path), score_threshold,
+                             fileFingerprint(storage_name) if os.path.isfile(storage_name) else None)
+        entries = loadCached(storage_name, DETECTION_CACHE_SUFFIX, self._fingerprint)
+        if entries is not None:
+            self._entries = entries
+
+    @property
+    def storageName(self) -> str:
+        return self._storage_name
+
+    def Get(self, image):
+        """DetectedShape list of the image or None when it was not detected yet."""
+        key = self._image_key(image)
+        with self._lock:
+            records = self._entries.get(key)
+            if records is None:
+                return None
+
+            self._entries.move_to_end(key)
+
+        return [DetectedShape(label, fclass, score, extent) for label, fclass, score, extent in records]
+
+    def Put(self, image, dshapes):
+        records = [(dshape.label, int(dshape.fclass), float(dshape.score), tuple(int(v) for v in dshape.extent))
+                   for dshape in dshapes]
+        key = self._image_key(image)
+        with self._lock:
+            self._entries[key] = records
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_images:
+                self._entries.popitem(last=False)
+
+            self._unsaved += 1
+            save = self._unsaved >= SAVE_EVERY_PUTS
+
+        if save:
+            self.Save()
+
+    def Save(self) -> bool:
+        with self._lock:
+            if self._unsaved == 0:
+                return True
+
+            entries = OrderedDict(self._entries)
+            self._unsaved = 0
+
+        if self._saver is not None:
+            # pickled on the saver thread, a newer snapshot replaces one still queued
+            fingerprint = self._fingerprint
+            self._saver.Submit(cacheFilePath(self._storage_name, DETECTION_CACHE_SUFFIX),
+                               lambda path: atomicWrite(path, lambda tmp_path: dumpCached(tmp_path, entries,
+                                                                                          fingerprint)))
+            return True
+
+        return saveCached(self._storage_name, DETECTION_CACHE_SUFFIX, entries, self._fingerprint)
+
+    # private methods
+    def _image_key(self, image):
+        path = image.path
+        if os.path.isfile(path):
+            return path, os.path.getmtime(path)
+
+        return path
@@ -0,0 +1,170 @@
+import heapq
+import itertools
+import threading
+import time
+
+# weight of the latest measurement in the averages
+AVERAGE_WEIGHT = 0.2
+MAX_LOOKAHEAD_DEPTH = 16
+
+
+class SourceImage:
+    """
+    Image of an images source requested by name, it is decoded only when its detection starts.
+    """
+
+    def __init__(self, images_source, name):
+        self._images_source = images_source
+        self._name = name
+        self.path = images_source.GetImagePath(name)
+
+    def Load(self):
+        res, image = self._images_source.GetImage(self._name)
+        return image if res else None
+
+
+class DetectionScheduler:
+    """
+    Pending detection requests: at most one interactive request, the image the user
+    looks at, and background requests ordered by priority (lower runs first).
+
+    A new interactive request supersedes the pending one, which is dropped without
+    being run. The interactive request always runs before the background ones and alone,
+    background requests are batched.
+    """
+
+    def __init__(self):
+        self._interactive = None
+        # heap of (priority, sequence, submit time, image)
+        self._background = []
+        # image path -> heap entry of the pending background requests
+        self._background_paths = {}
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+        self._dispatched = 0
+        self._dropped = 0
+        # average seconds of detection per image and between interactive requests
+        self._latency = 0.0
+        self._dwell = 0.0
+        self._last_interactive = None
+        self._last_wait = 0.0
+        self._average_wait = 0.0
+        self._max_wait = 0.0
+
+    @property
+    def depth(self) -> int:
+        with self._lock:
+            return (1 if self._interactive is not None else 0) + len(self._background_paths)
+
+    @property
+    def hasInteractive(self) -> bool:
+        with self._lock:
+            return self._interactive is not None
+
+    def SubmitInteractive(self, image):
+        with self._lock:
+            if self._interactive is not None:
+                self._dropped += 1
+
+            now = time.time()
+            if self._last_interactive is not None:
+                self._dwell = self._average(self._dwell, now - self._last_interactive)
+            self._last_interactive = now
+            self._interactive = (now, image)
+            # the image is being waited for, no need to do it again in background
+            self._remove_background(image.path)
+
+    def SubmitBackground(self, image, priority=0):
+        with self._lock:
+            if self._interactive is not None and self._interactive[1].path == image.path:
+                return
+
+            entry = self._background_paths.get(image.path)
+            if entry is not None:
+                if entry[0] <= priority:
+                    return
+
+                self._remove_background(image.path)
+
+            entry = [priority, next(self._sequence), time.time(), image]
+            self._background_paths[image.path] = entry
+            heapq.heappush(self._background, entry)
+
+    def RecordLatency(self, seconds_per_image: float):
+        with self._lock:
+            self._latency = self._average(self._latency, seconds_per_image)
+
+    def LookaheadDepth(self, max_depth=MAX_LOOKAHEAD_DEPTH) -> int:
+        """Number of upcoming images worth detecting: as many as fit in the time spent on one image."""
+        with self._lock:
+            if self._latency <= 0 or self._dwell <= 0:
+                return 1
+
+            return max(1, min(max_depth, int(self._dwell / self._latency)))
+
+    def ClearBackground(self):
+        with self._lock:
+            self._dropped += len(self._background_paths)
+            self._background = []
+            self._background_paths = {}
+
+    def OldestWait(self) -> float:
+        """Seconds the oldest pending request waits, 0 when nothing is pending."""
+        with self._lock:
+            times = [entry[2] for entry in self._background_paths.values()]
+            if self._interactive is not None:
+                times.append(self._interactive[0])
+
+            return time.time() - min(times) if times else 0.0
+
+    def NextBatch(self, batch_size: int) -> list:
+        """Take the images to detect next: the interactive one or up to batch_size background ones."""
+        with self._lock:
+            if self._interactive is not None:
+                submitted, image = self._interactive
+                self._interactive = None
+                self._record_wait(submitted)
+                return [image]
+
+            batch = []
+            while self._background and len(batch) < batch_size:
+                entry = heapq.heappop(self._background)
+                priority, sequence, submitted, image = entry
+                if image is None:
+                    # removed meanwhile
+                    continue
+
+                del self._background_paths[image.path]
+                self._record_wait(submitted)
+                batch.append(image)
+
+            return batch
+
+    def Metrics(self) -> dict:
+        with self._lock:
+            return {'depth': (1 if self._interactive is not None else 0) + len(self._background_paths),
+                    'dispatched': self._dispatched,
+                    'dropped': self._dropped,
+                    'last_wait': self._last_wait,
+                    'average_wait': self._average_wait,
+                    'max_wait': self._max_wait,
+                    'latency': self._latency,
+                    'dwell': self._dwell}
+
+    # private methods
+    def _remove_background(self, path):
+        entry = self._background_paths.pop(path, None)
+        if entry is not None:
+            # the heap entry is skipped when popped
+            entry[3] = None
+
+    def _record_wait(self, submitted):
+        wait = time.time() - submitted
+        self._dispatched += 1
+        self._last_wait = wait
+        self._average_wait = self._average(self._average_wait, wait)
+        self._max_wait = max(self._max_wait, wait)
+
+    def _average(self, average, value):
+        return value if average == 0 else (1 - AVERAGE_WEIGHT) * average + AVERAGE_WEIGHT * value
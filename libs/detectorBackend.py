@@ -0,0 +1,208 @@
+import numpy as np
+import os
+import sys
+import glob
+import threading
+import time
+import zlib
+
+import cv2
+
+from libs.detectedShape import *
+from libs.programState import *
+from libs.labelMap import *
+
+DETECTION_SCORE_THRESHOLD = 0.1
+
+BACKEND_TENSORFLOW = 'tensorflow'
+BACKEND_OPENCV = 'opencv'
+BACKEND_FAKE = 'fake'
+# model name selecting the fake detector
+FAKE_MODEL_NAME = 'fake'
+
+OPENCV_MODEL_EXTENSIONS = ('.onnx', '.caffemodel', '.t7', '.net')
+# folder of the TensorFlow object detection API (models/research) when it is not installed as a package
+OBJECT_DETECTION_PATH_ENV = 'OBJECT_DETECTION_API_PATH'
+LEGACY_OBJECT_DETECTION_PATH = 'c:/venv/models/research'
+# size of the frames the detectors are warmed up with, the processing size of 16:9 videos
+WARM_UP_SIZE = (800, 450)
+
+
+def findLabelMap(model_path: str, exclude=()):
+    """Label map next to the model, the one of the program otherwise."""
+    for map_file in sorted(glob.glob(os.path.join(os.path.dirname(model_path), '*.pbtxt'))):
+        if map_file not in exclude:
+            return map_file
+
+    return ProgramState.getInstance().labelMapPath
+
+
+def addObjectDetectionPath():
+    """Make the object detection API importable from the folder set in OBJECT_DETECTION_PATH_ENV."""
+    path = os.environ.get(OBJECT_DETECTION_PATH_ENV)
+    if not path and os.path.isdir(LEGACY_OBJECT_DETECTION_PATH):
+        path = LEGACY_OBJECT_DETECTION_PATH
+
+    if path and path not in sys.path:
+        sys.path.append(path)
+
+
+def createDetector(model_path: str, backend=None):
+    """
+    Loaded detector of the model: TensorFlow for frozen graphs, OpenCV DNN for ONNX/Caffe/Torch
+    models and TensorFlow graphs having a text graph (model.pbtxt) next to them, the fake one
+    for FAKE_MODEL_NAME. backend forces one of BACKEND_*.
+    """
+    if backend is None:
+        name, ext = os.path.splitext(model_path)
+        if model_path == FAKE_MODEL_NAME:
+            backend = BACKEND_FAKE
+        elif ext.lower() in OPENCV_MODEL_EXTENSIONS or os.path.exists(name + '.pbtxt'):
+            backend = BACKEND_OPENCV
+        else:
+            backend = BACKEND_TENSORFLOW
+
+    if backend == BACKEND_FAKE:
+        detector = FakeDetector()
+    elif backend == BACKEND_OPENCV:
+        detector = OpenCVDetector(model_path)
+    else:
+        # TensorFlow is imported only when a TensorFlow model is used
+        from libs.objectDetector import ObjectDetector
+        detector = ObjectDetector(model_path)
+
+    detector.load()
+    return detector
+
+
+class DetectorBackend:
+    """
+    Object detector of a model. load() prepares the model, warmUp() runs it once so that
+    the first detection is not slowed by allocations, detect()/detectBatch() return the
+    DetectedShapes of images (NamedImage) in the coordinates of their annotations.
+    """
+
+    def __init__(self, label_map_path=None, read_label_map=parseLabelMap):
+        self._label_map = LabelMap(label_map_path, read_label_map)
+
+    def load(self):
+        pass
+
+    def warmUp(self, width=WARM_UP_SIZE[0], height=WARM_UP_SIZE[1]):
+        from libs.namedImage import NamedImage
+        image = NamedImage('warm_up')
+        image.FromArray(np.zeros((height, width, 3), dtype=np.uint8), 'warm_up', None, is_bgr=False)
+        self.detectBatch([image])
+
+    def getLabelMap(self):
+        return self._label_map
+
+    def detect(self, namedimage: object) -> list:
+        return self.detectBatch([namedimage])[0]
+
+    def detectBatch(self, namedimages: list) -> list:
+        raise NotImplementedError
+
+    # private methods
+    def _label(self, d_class):
+        try:
+            return self._label_map.getLabel(d_class)
+        except (KeyError, TypeError):
+            return str(d_class)
+
+    def _detected_shapes(self, boxes, classes, scores, num_detections, width, height) -> list:
+        """Shapes of the detections by decreasing score, boxes are (ymin, xmin, ymax, xmax) relative to the image."""
+        dshapes = []
+        for i in range(num_detections):
+            if scores[i] <= DETECTION_SCORE_THRESHOLD:
+                break
+
+            d_class = classes[i]
+            (ymin, xmin, ymax, xmax) = boxes[i]
+            d_extent = (int(xmin * width), int(ymin * height), int(xmax * width), int(ymax * height))
+            dshapes.append(DetectedShape(self._label(d_class), d_class, scores[i], d_extent))
+
+        return dshapes
+
+
+class OpenCVDetector(DetectorBackend):
+    """
+    Detector running a model with the OpenCV DNN module on the CPU, no TensorFlow is needed.
+    The model must end in a DetectionOutput layer (SSD-like models: rows of batch id, class,
+    score, xmin, ymin, xmax, ymax relative to the image), TensorFlow graphs need their
+    text graph as model.pbtxt.
+    """
+
+    def __init__(self, model_path: str, config_path=None, input_size=(300, 300), scale=1.0, mean=(0, 0, 0),
+                 swap_rb=False):
+        name, ext = os.path.splitext(model_path)
+        if config_path is None:
+            for config_ext in ('.pbtxt', '.prototxt'):
+                if os.path.exists(name + config_ext):
+                    config_path = name + config_ext
+                    break
+
+        super(OpenCVDetector, self).__init__(findLabelMap(model_path, exclude=(config_path,)))
+        self._model_path = model_path
+        self._config_path = config_path
+        self._input_size = tuple(input_size)
+        self._scale = scale
+        self._mean = mean
+        # images are RGB, models trained on BGR images (Caffe) need the channels swapped
+        self._swap_rb = swap_rb
+        self._net = None
+        # a Net keeps its input and outputs, the pre-labelling and the interactive detection share it
+        self._lock = threading.Lock()
+
+    def load(self):
+        self._net = cv2.dnn.readNet(self._model_path, self._config_path or '')
+        self._net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self._net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+
+    def detectBatch(self, namedimages: list) -> list:
+        blob = cv2.dnn.blobFromImages([namedimage.npimage for namedimage in namedimages], self._scale,
+                                      self._input_size, self._mean, self._swap_rb, crop=False)
+        with self._lock:
+            self._net.setInput(blob)
+            detections = self._net.forward().reshape(-1, 7)
+        # best detections first, as the TensorFlow models return them
+        detections = detections[np.argsort(-detections[:, 2], kind='stable')]
+
+        res = []
+        for i, namedimage in enumerate(namedimages):
+            width, height = namedimage.size
+            rows = detections[detections[:, 0] == i]
+            boxes = rows[:, [4, 3, 6, 5]]
+            res.append(self._detected_shapes(boxes, rows[:, 1].astype(np.int64), rows[:, 2], len(rows), width, height))
+
+        return res
+
+
+class FakeDetector(DetectorBackend):
+    """
+    Deterministic detector for tests and benchmarks without model files: the boxes of an
+    image depend only on its path. seconds_per_image simulates the inference time.
+    """
+
+    def __init__(self, objects_per_image=3, seconds_per_image=0.0, label_map_path=None):
+        super(FakeDetector, self).__init__(label_map_path or ProgramState.getInstance().labelMapPath)
+        self._objects_per_image = objects_per_image
+        self._seconds_per_image = seconds_per_image
+
+    def detectBatch(self, namedimages: list) -> list:
+        if self._seconds_per_image > 0:
+            time.sleep(self._seconds_per_image * len(namedimages))
+
+        classes = self._label_map.getClasses() or [1]
+        res = []
+        for namedimage in namedimages:
+            width, height = namedimage.size
+            rng = np.random.RandomState(zlib.crc32(namedimage.path.encode('utf-8')))
+            corners = rng.uniform(0.0, 0.8, (self._objects_per_image, 2))
+            sizes = rng.uniform(0.05, 0.2, (self._objects_per_image, 2))
+            boxes = np.concatenate([corners, corners + sizes], axis=1)[:, [1, 0, 3, 2]]
+            scores = np.sort(rng.uniform(0.3, 1.0, self._objects_per_image))[::-1]
+            d_classes = np.array(classes)[rng.randint(0, len(classes), self._objects_per_image)]
+            res.append(self._detected_shapes(boxes, d_classes, scores, self._objects_per_image, width, height))
+
+        return res
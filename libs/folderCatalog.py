@@ -0,0 +1,184 @@
+import os
+import threading
+import time
+
+from libs.cacheStorage import *
+from libs.coreUtils import natural_key
+
+FOLDER_MANIFEST_SUFFIX = '.manifest.pkl'
+FOLDER_MANIFEST_VERSION = 1
+
+# found names are published at most this often (seconds) while scanning
+SCAN_PUBLISH_INTERVAL = 0.5
+
+
+class FolderCatalog:
+    """
+    Image files of a folder tree, sorted in natural order.
+
+    The manifest keeps for every directory its mtime, subdirectories and image files
+    (size, mtime, sort key). It is stored in the cache folder, so reopening a folder
+    lists the known names at once and a scan only reads the directories whose mtime changed.
+    """
+
+    def __init__(self, folder: str, extensions):
+        self._folder = folder
+        self._extensions = tuple(sorted(extensions))
+        # relative directory -> {'mtime', 'dirs', 'files': {name: (size, mtime, sort key)}}
+        self._dirs = {}
+        self._names = None
+        self._new_names = False
+        self._lock = threading.Lock()
+
+    def Load(self) -> bool:
+        data = loadCached(self._folder, FOLDER_MANIFEST_SUFFIX, (FOLDER_MANIFEST_VERSION, self._extensions))
+        if data is None:
+            return False
+
+        self._publish(data)
+        return True
+
+    def Save(self) -> bool:
+        with self._lock:
+            dirs = self._dirs
+
+        return saveCached(self._folder, FOLDER_MANIFEST_SUFFIX, dirs, (FOLDER_MANIFEST_VERSION, self._extensions))
+
+    def Names(self) -> list:
+        """Relative paths of the image files, the list is replaced, never changed, by a scan."""
+        with self._lock:
+            if self._names is None:
+                entries = []
+                for reldir, entry in self._dirs.items():
+                    for name, (size, mtime, key) in entry['files'].items():
+                        entries.append((key, os.path.join(reldir, name) if reldir else name))
+
+                entries.sort(key=lambda e: e[0])
+                self._names = [name for key, name in entries]
+
+            self._new_names = False
+            return self._names
+
+    def HasNewNames(self) -> bool:
+        with self._lock:
+            return self._new_names
+
+    def Directories(self) -> list:
+        with self._lock:
+            return [os.path.join(self._folder, reldir) if reldir else self._folder for reldir in self._dirs]
+
+    def NamesChanged(self, path: str) -> bool:
+        """The image files or subdirectories of the directory differ from the ones in the catalog."""
+        reldir = os.path.relpath(path, self._folder)
+        reldir = '' if reldir == os.curdir else reldir
+        with self._lock:
+            entry = self._dirs.get(reldir)
+
+        if entry is None:
+            return True
+
+        dirs = set()
+        files = set()
+        try:
+            with os.scandir(path) as it:
+                for item in it:
+                    if item.is_dir(follow_symlinks=False):
+                        dirs.add(os.path.join(reldir, item.name) if reldir else item.name)
+                    elif item.name.lower().endswith(self._extensions):
+                        files.add(item.name)
+        except OSError:
+            return True
+
+        return dirs != set(entry['dirs']) or files != set(entry['files'].keys())
+
+    def Scan(self, progress_callback=None, is_cancelled=None) -> bool:
+        """
+        Bring the catalog up to date with the folder, returns True when the names changed.
+        Names found so far are published while scanning.
+        """
+        with self._lock:
+            known = self._dirs
+
+        scanned = {}
+        pending = ['']
+        # names changed / manifest has to be saved
+        changed = False
+        dirty = False
+        last_publish = time.time()
+        while pending:
+            if is_cancelled and is_cancelled():
+                return False
+
+            reldir = pending.pop()
+            path = os.path.join(self._folder, reldir) if reldir else self._folder
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                changed = True
+                continue
+
+            entry = known.get(reldir)
+            if entry is None or entry['mtime'] != mtime:
+                scanned_entry = self._scan_directory(path, reldir, mtime, entry)
+                # e.g. an annotation file written next to the images changes only the mtime
+                changed = changed or entry is None or scanned_entry['dirs'] != entry['dirs'] or \
+                          scanned_entry['files'].keys() != entry['files'].keys()
+                dirty = True
+                entry = scanned_entry
+
+            scanned[reldir] = entry
+            pending.extend(entry['dirs'])
+
+            if changed and time.time() - last_publish >= SCAN_PUBLISH_INTERVAL:
+                # directories not reached yet keep their known content meanwhile
+                partial = dict(known)
+                partial.update(scanned)
+                self._publish(partial)
+                last_publish = time.time()
+                if progress_callback:
+                    done = len(scanned)
+                    progress_callback.emit(int(100 * done / (done + len(pending))), 'Scanning folder')
+
+        changed = changed or len(scanned) != len(known)
+        if changed:
+            self._publish(scanned)
+        elif dirty:
+            with self._lock:
+                self._dirs = scanned
+
+        if changed or dirty:
+            self.Save()
+
+        return changed
+
+    # private methods
+    def _publish(self, dirs):
+        with self._lock:
+            self._dirs = dirs
+            self._names = None
+            self._new_names = True
+
+    def _scan_directory(self, path, reldir, mtime, known_entry):
+        known_files = known_entry['files'] if known_entry else {}
+        dirs = []
+        files = {}
+        try:
+            with os.scandir(path) as it:
+                for item in it:
+                    try:
+                        if item.is_dir(follow_symlinks=False):
+                            dirs.append(os.path.join(reldir, item.name) if reldir else item.name)
+                        elif item.name.lower().endswith(self._extensions):
+                            stat = item.stat()
+                            known_file = known_files.get(item.name)
+                            if known_file is not None and known_file[:2] == (stat.st_size, stat.st_mtime):
+                                files[item.name] = known_file
+                            else:
+                                relname = os.path.join(reldir, item.name) if reldir else item.name
+                                files[item.name] = (stat.st_size, stat.st_mtime, natural_key(relname.lower()))
+                    except OSError:
+                        continue
+        except OSError as e:
+            print(e)
+
+        return {'mtime': mtime, 'dirs': dirs, 'files': files}
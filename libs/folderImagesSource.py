@@ -11,12 +11,46 @@ import pickle
 from libs.ustr import ustr
 from libs.utils import *
 from libs.namedImage import *
+from libs.frameCache import *
+from libs.folderCatalog import *
+
+# changes of the watched directories are collected this long (msec) before they are checked
+WATCH_DEBOUNCE_MSEC = 500
+
 
 class FolderImagesSource():
 
-    def __init__(self, foldername):
+    def __init__(self, foldername, display_size=None):
         self._folder_name = foldername
+        # JPEG files larger than this are decoded at a reduced resolution
+        self._display_size = display_size
         self._names_list = []
+        self._names_index = {}
+
+        extensions = ['.%s' % fmt.data().decode("ascii").lower() for fmt in
+                      QImageReader.supportedImageFormats()]
+        self._catalog = FolderCatalog(foldername, extensions)
+        self._catalog_loaded = False
+        self._needs_scan = True
+        self._cancel_preparation = False
+
+        # directories of the folder are watched while a callback is set
+        self._watcher = None
+        self._changed_callback = None
+        # directories changed since the last check, saving images and annotations changes them too
+        self._changed_dirs = set()
+        self._change_timer = QTimer()
+        self._change_timer.setSingleShot(True)
+        self._change_timer.setInterval(WATCH_DEBOUNCE_MSEC)
+        self._change_timer.timeout.connect(self._check_changed_directories)
+
+    @property
+    def displaySize(self):
+        return self._display_size
+
+    @displaySize.setter
+    def displaySize(self, val):
+        self._display_size = val
 
     def GetStorageName(self):
         return self._folder_name
@@ -24,31 +58,115 @@ class FolderImagesSource():
     def GetNames(self):
         self._names_list = []
         if os.path.exists(self._folder_name) and os.path.isdir(self._folder_name):
-            extensions = ['.%s' % fmt.data().decode("ascii").lower() for fmt in
-                          QImageReader.supportedImageFormats()]
+            if not self._catalog_loaded:
+                # the names known from the previous run, the scan brings them up to date
+                self._catalog.Load()
+                self._catalog_loaded = True
 
-            for root, dirs, files in os.walk(self._folder_name):
-                for file in files:
-                    if file.lower().endswith(tuple(extensions)):
-                        self._names_list.append(file)
+            self._names_list = self._catalog.Names()
+            self._watch_directories()
+
+        self._names_index = {}
+        for pos, name in enumerate(self._names_list):
+            self._names_index.setdefault(name, pos)
 
-        natural_sort(self._names_list, key=lambda x: x.lower())
         return self._names_list
 
+    def HasNewNames(self) -> bool:
+        return self._catalog.HasNewNames()
+
+    def NeedsPreparation(self) -> bool:
+        return self._needs_scan and os.path.isdir(self._folder_name)
+
+    def Prepare(self, progress_callback=None) -> bool:
+        """Scan the folder on a worker thread, returns True when the names changed."""
+        # cleared first, a change of the folder during the scan asks for another one
+        self._needs_scan = False
+        self._cancel_preparation = False
+        names_changed = self._catalog.Scan(progress_callback, lambda: self._cancel_preparation)
+        if self._cancel_preparation:
+            # the catalog is incomplete, scan again when the source is prepared next time
+            self._needs_scan = True
+
+        return names_changed
+
+    def CancelPreparation(self):
+        self._cancel_preparation = True
+
+    def SetChangedCallback(self, callback):
+        """callback is called when the content of the folder changes, None stops watching."""
+        self._changed_callback = callback
+        if callback is None:
+            self._change_timer.stop()
+            self._changed_dirs = set()
+            if self._watcher is not None:
+                self._watcher.directoryChanged.disconnect(self._on_directory_changed)
+                self._watcher = None
+        elif self._watcher is None:
+            self._watcher = QFileSystemWatcher()
+            self._watcher.directoryChanged.connect(self._on_directory_changed)
+            self._watch_directories()
+
+    def GetImagePath(self, filename):
+        return ustr(os.path.abspath(os.path.join(self._folder_name, filename)))
+
+    def GetSavePath(self, filename):
+        return self.GetImagePath(filename)
+
     def GetImage(self, filename):
-        relative_path = os.path.join(self._folder_name, filename)
-        path = ustr(os.path.abspath(relative_path))
+        path = self.GetImagePath(filename)
         if os.path.exists(path) and os.path.isfile(path):
+            # the modification time invalidates cached images of files changed on disk
+            display_size = self._display_size
+            cache_key = (path, os.path.getmtime(path), display_size)
+            img = FrameCache.getInstance().Get(cache_key)
+            if img is not None:
+                return True, img
+
             img = NamedImage(filename)
-            res = img.FromFile(path)
+            res = img.FromFile(path, display_size)
+            if res:
+                FrameCache.getInstance().Put(cache_key, img)
+
             return res, img
 
         return False, None
 
     def GetIndex(self, filename):
-        basename = os.path.basename(filename)
-        res = 0
-        if basename in self._names_list:
-            res = self._names_list.index(basename)
+        name = filename
+        if os.path.isabs(filename):
+            name = os.path.relpath(filename, self._folder_name)
+
+        res = self._names_index.get(name)
+        if res is None:
+            res = self._names_index.get(os.path.basename(filename), 0)
 
         return res
+
+    # private methods
+    def _watch_directories(self):
+        if self._watcher is None:
+            return
+
+        watched = set(self._watcher.directories())
+        directories = set(self._catalog.Directories())
+        removed = list(watched - directories)
+        added = list(directories - watched)
+        if removed:
+            self._watcher.removePaths(removed)
+        if added:
+            self._watcher.addPaths(added)
+
+    def _on_directory_changed(self, path):
+        self._changed_dirs.add(path)
+        self._change_timer.start()
+
+    def _check_changed_directories(self):
+        changed_dirs, self._changed_dirs = self._changed_dirs, set()
+        # only added, removed or renamed images need a scan
+        if not any(self._catalog.NamesChanged(path) for path in changed_dirs):
+            return
+
+        self._needs_scan = True
+        if self._changed_callback:
+            self._changed_callback()
@@ -0,0 +1,107 @@
+import threading
+from collections import OrderedDict
+
+DEFAULT_FRAME_CACHE_BUDGET = 512 * 1024 * 1024
+
+
+class FrameCache:
+    """
+    Memory-budgeted LRU cache of decoded images shared by all images sources.
+
+    Images are keyed by (storage name, image name); the least recently used ones
+    are evicted when the total size of the cached images exceeds the budget.
+    """
+    __instance = None
+
+    @staticmethod
+    def getInstance():
+        """ Static access method. """
+        if FrameCache.__instance == None:
+            FrameCache()
+
+        return FrameCache.__instance
+
+    def __init__(self):
+        """ Virtually private constructor. """
+        if FrameCache.__instance != None:
+            raise Exception("This class is a singleton!")
+        else:
+            FrameCache.__instance = self
+
+        self._budget = DEFAULT_FRAME_CACHE_BUDGET
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def budget(self) -> int:
+        return self._budget
+
+    @budget.setter
+    def budget(self, val):
+        with self._lock:
+            self._budget = int(val)
+            self._evict()
+
+    @property
+    def totalBytes(self) -> int:
+        return self._total_bytes
+
+    @property
+    def hits(self) -> int:
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        return self._misses
+
+    def Get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+
+            self._hits += 1
+            self._entries.move_to_end(key)
+
+            # lazily created representations (e.g. the Qt image) grow the image after it was put
+            image, nbytes = entry
+            self._account(key, image)
+            self._evict()
+            return image
+
+    def Put(self, key, image):
+        with self._lock:
+            self._account(key, image)
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def Remove(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._total_bytes -= entry[1]
+
+    def Clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    # private methods
+    def _account(self, key, image):
+        nbytes = image.nbytes
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._total_bytes -= entry[1]
+
+        self._entries[key] = (image, nbytes)
+        self._total_bytes += nbytes
+
+    def _evict(self):
+        # the most recently used image is kept even if it alone exceeds the budget
+        while self._total_bytes > self._budget and len(self._entries) > 1:
+            key, (image, nbytes) = self._entries.popitem(last=False)
+            self._total_bytes -= nbytes
@@ -0,0 +1,123 @@
+import os
+import multiprocessing
+
+import cv2
+
+from libs.videoIndex import VideoIndex, seekCapture
+
+FRAME_NUM_DELIMITER = ' ## '
+JPEG_QUALITY = 98
+
+# segments per process, more segments than processes balance the load and refine the progress
+SEGMENTS_PER_PROCESS = 4
+
+
+def frameImageName(video_path: str, frame_name: str) -> str:
+    fpath, fname = os.path.split(video_path)
+    fname, fext = os.path.splitext(fname)
+    return str.format('{0}/{1}__{2}{3}{4}', fpath, fname, fext[1:], FRAME_NUM_DELIMITER, frame_name)
+
+
+def frameSavePath(video_path: str, frame_name: str) -> str:
+    fpath, fname = os.path.split(video_path)
+    fname, fext = os.path.splitext(fname)
+    return str.format('{0}/{1}__{2}/{1}__{3}.jpg', fpath, fname, fext[1:], frame_name)
+
+
+class FrameExtractor:
+    """
+    Writes the sampled frames of a video as resized JPEG files, the same files
+    NamedImage.Save writes for video frames.
+
+    The video is split into time segments decoded by a pool of processes, each
+    process with its own capture.
+    """
+
+    def __init__(self, video_path: str, frame_names: list, frame_sizes: tuple, processes=None):
+        self._video_path = video_path
+        self._frame_names = list(frame_names)
+        self._frame_sizes = tuple(frame_sizes)
+        self._processes = processes or os.cpu_count() or 1
+
+    def Run(self, progress_callback=None, is_cancelled=None) -> int:
+        """Returns the number of written frames."""
+        segments = [(self._video_path, names, self._frame_sizes)
+                    for names in splitSegments(self._frame_names, self._processes * SEGMENTS_PER_PROCESS)]
+        return runSegments(_extract_segment, segments, len(self._frame_names), self._processes,
+                           progress_callback, 'Extracting frames', is_cancelled)
+
+
+def splitSegments(frame_names: list, segment_count: int) -> list:
+    count = len(frame_names)
+    segment_count = min(count, segment_count)
+    return [frame_names[i * count // segment_count:(i + 1) * count // segment_count] for i in range(segment_count)]
+
+
+def runSegments(segment_fn, segments: list, frame_count: int, processes: int, progress_callback=None,
+                status='', is_cancelled=None) -> int:
+    """
+    Run segment_fn for every segment in a pool of processes. segment_fn returns
+    the (written, processed) frame counts of its segment, the sum of the written ones is returned.
+    """
+    if not segments:
+        return 0
+
+    written = 0
+    processed = 0
+    # spawn, a forked copy of the GUI process is not safe to run
+    pool = multiprocessing.get_context('spawn').Pool(min(processes, len(segments)))
+    try:
+        for segment_written, segment_processed in pool.imap_unordered(segment_fn, segments):
+            written += segment_written
+            processed += segment_processed
+            if progress_callback:
+                progress_callback.emit(int(100 * processed / frame_count), status)
+
+            if is_cancelled and is_cancelled():
+                pool.terminate()
+                break
+        else:
+            pool.close()
+    finally:
+        pool.join()
+
+    return written
+
+
+def decodeSegment(video_path: str, frame_names: list):
+    """
+    Yield (name, BGR frame) for the frames of a contiguous segment: one seek to its
+    first frame through the key frames of the video index, then the frames in between
+    are only grabbed.
+    """
+    video = cv2.VideoCapture(video_path)
+    if not video.isOpened():
+        return
+
+    grabbed_pos = seekCapture(video, VideoIndex.Load(video_path), int(frame_names[0]))
+    try:
+        for name in frame_names:
+            framenum = int(name)
+            while grabbed_pos < framenum and video.grab():
+                grabbed_pos += 1
+
+            if grabbed_pos != framenum:
+                break
+
+            res, frame = video.retrieve()
+            if res:
+                yield name, frame
+    finally:
+        video.release()
+
+
+def _extract_segment(args):
+    video_path, frame_names, frame_sizes = args
+    written = 0
+    for name, frame in decodeSegment(video_path, frame_names):
+        savepath = frameSavePath(video_path, name)
+        os.makedirs(os.path.dirname(savepath), exist_ok=True)
+        if cv2.imwrite(savepath, cv2.resize(frame, frame_sizes), [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY]):
+            written += 1
+
+    return written, len(frame_names)
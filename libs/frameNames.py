@@ -0,0 +1,53 @@
+from collections.abc import Sequence
+
+FRAME_NAME_FORMAT = '%08d'
+
+
+class FrameNames(Sequence):
+    """
+    Read-only sequence of the names of sampled video frames, computed on access
+    from the frame numbers. A range of frame numbers keeps no per-frame data.
+    """
+
+    def __init__(self, framenums=range(0)):
+        self._framenums = framenums
+        # frame number -> position, built on the first lookup in a non-range sequence
+        self._positions = None
+
+    @property
+    def framenums(self):
+        return self._framenums
+
+    def __len__(self) -> int:
+        return len(self._framenums)
+
+    def __getitem__(self, pos):
+        if isinstance(pos, slice):
+            return [FRAME_NAME_FORMAT % framenum for framenum in self._framenums[pos]]
+
+        return FRAME_NAME_FORMAT % self._framenums[pos]
+
+    def __contains__(self, name) -> bool:
+        return self.position(name) >= 0
+
+    def index(self, name, *args) -> int:
+        pos = self.position(name)
+        if pos < 0:
+            raise ValueError('%s is not in the frame names' % name)
+
+        return pos
+
+    def position(self, name) -> int:
+        """Position of the name, -1 if there is no such name."""
+        try:
+            framenum = int(name)
+        except (TypeError, ValueError):
+            return -1
+
+        if isinstance(self._framenums, range):
+            return self._framenums.index(framenum) if framenum in self._framenums else -1
+
+        if self._positions is None:
+            self._positions = {num: pos for pos, num in enumerate(self._framenums)}
+
+        return self._positions.get(framenum, -1)
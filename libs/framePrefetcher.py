@@ -0,0 +1,108 @@
+import threading
+from collections import OrderedDict
+
+from PyQt5.QtCore import *
+
+from libs.threading import *
+
+DEFAULT_PREFETCH_AHEAD = 4
+DEFAULT_PREFETCH_BEHIND = 2
+
+
+class FramePrefetcher:
+    """
+    Decodes the images around the current one on a worker thread and keeps them
+    in a bounded buffer, so that stepping to the next/previous image is served from memory.
+
+    Every Update() starts a new generation: a worker of an older generation stops
+    before decoding its next image and its results are not stored.
+    """
+
+    def __init__(self, ahead=DEFAULT_PREFETCH_AHEAD, behind=DEFAULT_PREFETCH_BEHIND):
+        self._ahead = ahead
+        self._behind = behind
+        self._images_source = None
+        self._names = []
+
+        self._buffer = OrderedDict()
+        self._in_progress = None
+        self._generation = 0
+        self._condition = threading.Condition()
+
+        self._thread_pool = QThreadPool()
+        self._thread_pool.setMaxThreadCount(1)
+
+    @property
+    def capacity(self) -> int:
+        return self._ahead + self._behind + 1
+
+    def SetSource(self, images_source, names):
+        self._thread_pool.clear()
+        with self._condition:
+            self._generation += 1
+            self._images_source = images_source
+            self._names = names
+            self._buffer.clear()
+
+    def Take(self, name):
+        """Return the buffered image or None, waits if the image is being decoded right now."""
+        with self._condition:
+            while self._in_progress == name:
+                self._condition.wait()
+
+            return self._buffer.get(name)
+
+    def Put(self, name, image):
+        with self._condition:
+            self._buffer[name] = image
+            self._buffer.move_to_end(name)
+            while len(self._buffer) > self.capacity:
+                self._buffer.popitem(last=False)
+
+    def Update(self, index: int):
+        """Drop the images far from index and schedule decoding of the missing neighbours."""
+        self._thread_pool.clear()
+        with self._condition:
+            self._generation += 1
+            wanted = self._wanted_names(index)
+            for name in list(self._buffer.keys()):
+                if name not in wanted:
+                    del self._buffer[name]
+
+            missing = [name for name in wanted if name not in self._buffer]
+            generation = self._generation
+            images_source = self._images_source
+
+        if missing and images_source is not None:
+            worker = Worker(self._prefetch_func, images_source, missing, generation)
+            self._thread_pool.start(worker)
+
+    # private methods
+    def _wanted_names(self, index: int) -> list:
+        count = len(self._names)
+        indexes = [index + i for i in range(1, self._ahead + 1)]
+        indexes += [index - i for i in range(1, self._behind + 1)]
+        return [self._names[idx] for idx in [index] + indexes if 0 <= idx < count]
+
+    def _prefetch_func(self, images_source, names, generation):
+        for name in names:
+            with self._condition:
+                if generation != self._generation:
+                    return
+                if name in self._buffer:
+                    continue
+
+                self._in_progress = name
+
+            res = False
+            try:
+                res, image = images_source.GetImage(name)
+                if res:
+                    image.Preload()
+            finally:
+                with self._condition:
+                    self._in_progress = None
+                    if res and generation == self._generation:
+                        self._buffer[name] = image
+
+                    self._condition.notify_all()
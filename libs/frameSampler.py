@@ -0,0 +1,137 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+import cv2
+
+from libs.cacheStorage import *
+from libs.videoIndex import VideoIndex, seekCapture
+
+MOTION_SIGNAL_SUFFIX = '.motion.pkl'
+
+ANALYSIS_FRAME_WIDTH = 64
+DEFAULT_CHANGE_THRESHOLD = 0.1
+DEFAULT_MIN_STRIDE = 10
+DEFAULT_MAX_STRIDE = 300
+# segments per thread, more segments than threads refine the progress
+SEGMENTS_PER_THREAD = 4
+
+
+class FrameSampler:
+    """
+    Picks the frames of a video worth labelling from a cheap content change signal:
+    mean absolute difference of consecutive downscaled grayscale frames.
+
+    A frame is picked when the change accumulated since the previously picked frame
+    exceeds the threshold, but never closer than min_stride and never further than
+    max_stride frames from it.
+    """
+
+    def __init__(self, threshold=DEFAULT_CHANGE_THRESHOLD, min_stride=DEFAULT_MIN_STRIDE,
+                 max_stride=DEFAULT_MAX_STRIDE):
+        self._threshold = threshold
+        self._min_stride = min_stride
+        self._max_stride = max_stride
+
+    def SelectFrames(self, signal) -> list:
+        frames = []
+        if len(signal) == 0:
+            return frames
+
+        frames.append(0)
+        accumulated = 0.0
+        last = 0
+        for framenum in range(1, len(signal)):
+            accumulated += signal[framenum]
+            stride = framenum - last
+            if (accumulated >= self._threshold and stride >= self._min_stride) or stride >= self._max_stride:
+                frames.append(framenum)
+                accumulated = 0.0
+                last = framenum
+
+        return frames
+
+    @staticmethod
+    def LoadSignal(video_path: str):
+        return loadCached(video_path, MOTION_SIGNAL_SUFFIX, (fileFingerprint(video_path), ANALYSIS_FRAME_WIDTH))
+
+    @staticmethod
+    def BuildSignal(video_path: str, frame_count: int, threads=None, progress_callback=None, is_cancelled=None):
+        """
+        Compute the change signal of all frames, the video is split into segments
+        decoded in parallel, each with its own capture.
+        """
+        if frame_count <= 0:
+            return None
+
+        threads = threads or os.cpu_count() or 1
+        segment_count = threads * SEGMENTS_PER_THREAD
+        bounds = np.linspace(0, frame_count, segment_count + 1).astype(np.int64)
+        segments = [(int(bounds[i]), int(bounds[i + 1])) for i in range(segment_count) if bounds[i] < bounds[i + 1]]
+
+        signal = np.zeros(frame_count, dtype=np.float32)
+        done = 0
+        completed = True
+        with ThreadPoolExecutor(max_workers=min(threads, len(segments))) as executor:
+            futures = {executor.submit(_segment_signal, video_path, start, stop, signal, is_cancelled): stop - start
+                       for start, stop in segments}
+            for future in as_completed(futures):
+                completed = future.result() and completed
+                done += futures[future]
+                if progress_callback:
+                    progress_callback.emit(int(100 * done / frame_count), 'Analysing frames')
+
+        if not completed:
+            return None
+
+        saveCached(video_path, MOTION_SIGNAL_SUFFIX, signal, (fileFingerprint(video_path), ANALYSIS_FRAME_WIDTH))
+        if progress_callback:
+            progress_callback.emit(100, 'Analysing frames')
+
+        return signal
+
+
+def _small_gray(frame):
+    height, width = frame.shape[:2]
+    sizes = (ANALYSIS_FRAME_WIDTH, max(1, int(height * ANALYSIS_FRAME_WIDTH / width)))
+    small = cv2.resize(frame, sizes, interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.int16)
+
+
+def _segment_signal(video_path, start, stop, signal, is_cancelled) -> bool:
+    # fills signal[start:stop], the frame before the segment is decoded to get the first difference
+    if is_cancelled and is_cancelled():
+        return False
+
+    video = cv2.VideoCapture(video_path)
+    if not video.isOpened():
+        return False
+
+    first = max(0, start - 1)
+    grabbed_pos = seekCapture(video, VideoIndex.Load(video_path), first)
+
+    previous = None
+    for framenum in range(first, stop):
+        # the frames between the key frame and the segment are only grabbed
+        while grabbed_pos < framenum and video.grab():
+            grabbed_pos += 1
+
+        if grabbed_pos != framenum:
+            break
+
+        res, frame = video.retrieve()
+        if not res:
+            break
+
+        current = _small_gray(frame)
+        if previous is not None and framenum >= start:
+            signal[framenum] = np.mean(np.abs(current - previous)) / 255.0
+
+        previous = current
+        if is_cancelled and is_cancelled():
+            video.release()
+            return False
+
+    video.release()
+    return True
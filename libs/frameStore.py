@@ -0,0 +1,170 @@
+import os
+
+import numpy as np
+
+import cv2
+
+from libs.cacheStorage import *
+from libs.frameExtractor import *
+
+FRAME_STORE_SUFFIX = '.frames.bin'
+FRAME_STORE_MAGIC = b'LVFRAMES'
+FRAME_STORE_VERSION = 1
+# frame data starts at a page boundary
+FRAME_STORE_ALIGNMENT = 4096
+
+HEADER_DTYPE = np.dtype([('magic', 'S8'), ('version', '<i8'), ('video_size', '<i8'), ('video_mtime', '<i8'),
+                         ('width', '<i8'), ('height', '<i8'), ('count', '<i8')])
+TABLE_DTYPE = np.dtype([('frame', '<i8'), ('offset', '<i8')])
+# table offset of the frames that could not be decoded
+FAILED_FRAME_OFFSET = -1
+
+
+class FrameStore:
+    """
+    Sampled frames of a video resized to the processing size, stored as RGB pixels
+    in one contiguous file and served by slicing a memory map.
+
+    Layout: header, table of (frame number, data offset) records, frame data. Frames
+    that could not be decoded have the offset FAILED_FRAME_OFFSET, they are read by
+    the decoder instead.
+    """
+
+    def __init__(self, store_path: str, header, table):
+        self._width = int(header['width'])
+        self._height = int(header['height'])
+        self._frame_bytes = self._width * self._height * 3
+        self._offsets = {int(rec['frame']): int(rec['offset']) for rec in table if rec['offset'] >= 0}
+        self._failed = {int(rec['frame']) for rec in table if rec['offset'] < 0}
+        # copy-on-write: a writable buffer for QImage, pages are still shared until written
+        self._data = np.memmap(store_path, dtype=np.uint8, mode='c')
+
+    def __contains__(self, framenum) -> bool:
+        return framenum in self._offsets
+
+    def Covers(self, framenums) -> bool:
+        """The frames are stored or known to fail decoding."""
+        return all(framenum in self._offsets or framenum in self._failed for framenum in framenums)
+
+    def Close(self):
+        """Drop the memory map, the frames returned by Get keep it open until they are released."""
+        self._offsets = {}
+        self._failed = set()
+        self._data = None
+
+    def Get(self, framenum: int):
+        """HxWx3 RGB view into the store, no data is copied."""
+        offset = self._offsets[framenum]
+        return self._data[offset:offset + self._frame_bytes].reshape((self._height, self._width, 3))
+
+    @staticmethod
+    def Open(video_path: str, frame_sizes: tuple):
+        store_path = cacheFilePath(video_path, FRAME_STORE_SUFFIX)
+        if not os.path.exists(store_path):
+            return None
+
+        try:
+            with open(store_path, 'rb') as f:
+                header = np.fromfile(f, dtype=HEADER_DTYPE, count=1)[0]
+                stat = os.stat(video_path)
+                if header['magic'] != FRAME_STORE_MAGIC or header['version'] != FRAME_STORE_VERSION or \
+                        header['video_size'] != stat.st_size or header['video_mtime'] != int(stat.st_mtime) or \
+                        (header['width'], header['height']) != tuple(frame_sizes):
+                    return None
+
+                table = np.fromfile(f, dtype=TABLE_DTYPE, count=int(header['count']))
+
+            return FrameStore(store_path, header, table)
+        except Exception as e:
+            print(e)
+
+        return None
+
+    @staticmethod
+    def Build(video_path: str, frame_names: list, frame_sizes: tuple, processes=None,
+              progress_callback=None, is_cancelled=None, replacing=None):
+        """
+        Decode and store the frames in a pool of processes. The store is written to
+        a temporary file and renamed when complete, so a partial store is never opened.
+        replacing is the open store of the video, it is closed before the file is replaced.
+        """
+        if not frame_names:
+            return None
+
+        store_path = cacheFilePath(video_path, FRAME_STORE_SUFFIX)
+        tmp_path = store_path + '.tmp'
+        width, height = frame_sizes
+        frame_bytes = width * height * 3
+        count = len(frame_names)
+
+        data_start = HEADER_DTYPE.itemsize + TABLE_DTYPE.itemsize * count
+        data_start = (data_start + FRAME_STORE_ALIGNMENT - 1) // FRAME_STORE_ALIGNMENT * FRAME_STORE_ALIGNMENT
+
+        stat = os.stat(video_path)
+        header = np.zeros(1, dtype=HEADER_DTYPE)
+        header[0] = (FRAME_STORE_MAGIC, FRAME_STORE_VERSION, stat.st_size, int(stat.st_mtime), width, height, count)
+        table = np.zeros(count, dtype=TABLE_DTYPE)
+        table['frame'] = [int(name) for name in frame_names]
+        table['offset'] = data_start + np.arange(count, dtype=np.int64) * frame_bytes
+
+        with open(tmp_path, 'wb') as f:
+            header.tofile(f)
+            table.tofile(f)
+            f.truncate(data_start + count * frame_bytes)
+
+        processes = processes or os.cpu_count() or 1
+        segments = []
+        start = 0
+        for names in splitSegments(list(frame_names), processes * SEGMENTS_PER_PROCESS):
+            segments.append((video_path, tmp_path, names, start, int(table['offset'][start]), tuple(frame_sizes)))
+            start += len(names)
+
+        written = runSegments(_store_segment, segments, count, processes, progress_callback,
+                              'Storing frames', is_cancelled)
+        if written == 0 or (is_cancelled and is_cancelled()):
+            os.remove(tmp_path)
+            return None
+
+        # the segments marked the frames they failed to decode
+        with open(tmp_path, 'rb') as f:
+            f.seek(HEADER_DTYPE.itemsize)
+            table = np.fromfile(f, dtype=TABLE_DTYPE, count=count)
+
+        if replacing is not None:
+            replacing.Close()
+
+        try:
+            os.replace(tmp_path, store_path)
+        except OSError as e:
+            # on Windows while frames of the old store are still in use, the next preparation retries
+            print(e)
+            os.remove(tmp_path)
+            return None
+
+        return FrameStore(store_path, header[0], table)
+
+
+def _store_segment(args):
+    video_path, store_path, frame_names, first_record, first_offset, frame_sizes = args
+    width, height = frame_sizes
+    data = np.memmap(store_path, dtype=np.uint8, mode='r+', offset=first_offset,
+                     shape=(len(frame_names), height, width, 3))
+
+    slots = {name: slot for slot, name in enumerate(frame_names)}
+    decoded = np.zeros(len(frame_names), dtype=bool)
+    for name, frame in decodeSegment(video_path, frame_names):
+        data[slots[name]] = cv2.cvtColor(cv2.resize(frame, frame_sizes), cv2.COLOR_BGR2RGB)
+        decoded[slots[name]] = True
+
+    data.flush()
+    del data
+
+    if not decoded.all():
+        table = np.memmap(store_path, dtype=TABLE_DTYPE, mode='r+',
+                          offset=HEADER_DTYPE.itemsize + first_record * TABLE_DTYPE.itemsize,
+                          shape=(len(frame_names),))
+        table['offset'][~decoded] = FAILED_FRAME_OFFSET
+        table.flush()
+        del table
+
+    return int(decoded.sum()), len(frame_names)
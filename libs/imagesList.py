@@ -4,19 +4,62 @@ from PyQt5.QtWidgets import *
 
 import time
 import pickle
+from functools import partial
 
 from libs.threading import *
 from libs.utils import  *
+from libs.framePrefetcher import *
+
+class ImagesListModel(QAbstractListModel):
+    """
+    Rows over a sequence of image names, a row is only turned into text when the view asks for it.
+    """
+
+    def __init__(self, parent=None):
+        super(ImagesListModel, self).__init__(parent)
+        self._names = []
+
+    def names(self):
+        return self._names
+
+    def setNames(self, names):
+        self.beginResetModel()
+        self._names = names
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._names)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < len(self._names):
+            return None
+
+        if role == Qt.DisplayRole or role == Qt.ToolTipRole:
+            return self._names[index.row()]
+
+        return None
 
 class ImagesList(QDockWidget):
 
     def __init__(self, title, settings, parent_window):
         super(ImagesList, self).__init__(title, parent_window)
+        self._title = title
         self._images_source = None
         self._current_index = 0
-
-        self._image_list_widget = QListWidget()
-        self._image_list_widget.itemDoubleClicked.connect(self._itemDoubleClicked)
+        self._thread_pool = QThreadPool()
+        self._prefetcher = FramePrefetcher()
+        # source being prepared, a change meanwhile prepares it once more when done
+        self._preparing_source = None
+        self._prepare_again = False
+        # image requested before the names were known
+        self._pending_image = None
+
+        self._image_list_model = ImagesListModel(self)
+        self._image_list_widget = QListView()
+        # all rows have the same height, the view does not measure every row
+        self._image_list_widget.setUniformItemSizes(True)
+        self._image_list_widget.setModel(self._image_list_model)
+        self._image_list_widget.doubleClicked.connect(self._itemDoubleClicked)
 
         file_list_layout = QVBoxLayout()
         file_list_layout.setContentsMargins(0, 0, 0, 0)
@@ -32,13 +75,19 @@ class ImagesList(QDockWidget):
 
     # Public methods
     def SetSource(self, images_source):
+        if self._images_source:
+            self._images_source.CancelPreparation()
+            self._images_source.SetChangedCallback(None)
+
         self._images_source = images_source
+        self._pending_image = None
+        self._prepare_again = False
+        self._fill_names()
+        self._images_source.SetChangedCallback(self._on_source_changed)
+        self._prepare_source()
 
-        self._image_list_widget.clear()
-        names_list = self._images_source.GetNames()
-        for imgname in names_list:
-            item = QListWidgetItem(imgname)
-            self._image_list_widget.addItem(item)
+    def GetSource(self):
+        return self._images_source
 
     def SaveCurrentImage(self) -> str:
         return self._images_source.SaveCurrentImage()
@@ -47,42 +96,125 @@ class ImagesList(QDockWidget):
         if not self._images_source:
             return
 
+        if self._image_list_model.rowCount() == 0:
+            # e.g. the folder is being scanned, the image is loaded when the names arrive
+            self._pending_image = imgname
+            return
+
         self._current_index = self._images_source.GetIndex(imgname)
-        item = self._image_list_widget.item(self._current_index)
-        item.setSelected(True)
-        self._image_list_widget.scrollToItem(item)
+        if self._selectRow(self._current_index):
+            self._loadItem(self._current_index)
+
+    def UpcomingNames(self, count: int) -> list:
+        """Names of up to count images following the current one."""
+        names = self._image_list_model.names()
+        return list(names[self._current_index + 1:self._current_index + 1 + count])
 
-        self._loadItem(item)
+    def NameAt(self, row: int):
+        names = self._image_list_model.names()
+        return names[row] if 0 <= row < len(names) else None
 
     def SetPrevImage(self):
         if self._current_index - 1 >= 0:
             self._current_index -= 1
-            item = self._image_list_widget.item(self._current_index)
-            item.setSelected(True)
-            self._image_list_widget.scrollToItem(item)
-
-            self._loadItem(item)
+            self._selectRow(self._current_index)
+            self._loadItem(self._current_index)
 
     def SetNextImage(self):
-        if self._current_index + 1 < self._image_list_widget.count():
+        if self._current_index + 1 < self._image_list_model.rowCount():
             self._current_index += 1
-            item = self._image_list_widget.item(self._current_index)
-            item.setSelected(True)
-            self._image_list_widget.scrollToItem(item)
-
-            self._loadItem(item)
+            self._selectRow(self._current_index)
+            self._loadItem(self._current_index)
 
     # signals
     image_changed = pyqtSignal(object)
 
     # private methods
-    def _itemDoubleClicked(self, item):
-        self._current_index = self._images_source.GetIndex(ustr(item.text()))
-        self._loadItem(item)
+    def _fill_names(self):
+        names = self._images_source.GetNames()
+        self._image_list_model.setNames(names)
+        self._prefetcher.SetSource(self._images_source, names)
+
+    def _selectRow(self, row: int) -> bool:
+        index = self._image_list_model.index(row)
+        if not index.isValid():
+            return False
+
+        self._image_list_widget.setCurrentIndex(index)
+        self._image_list_widget.scrollTo(index)
+        return True
+
+    def _refill_names(self):
+        names = self._image_list_model.names()
+        current_name = names[self._current_index] if 0 <= self._current_index < len(names) else ''
+        self._fill_names()
+        if self._pending_image is not None and self._image_list_model.rowCount() > 0:
+            imgname, self._pending_image = self._pending_image, None
+            self.SetImage(imgname)
+            return
+
+        self._current_index = self._images_source.GetIndex(current_name)
+        self._selectRow(self._current_index)
+
+    def _prepare_source(self):
+        if not self._images_source.NeedsPreparation():
+            return
+
+        if self._preparing_source is self._images_source:
+            self._prepare_again = True
+            return
+
+        # e.g. index the video or scan the folder in background, the source works without it meanwhile
+        self._preparing_source = self._images_source
+        worker = ProgressingWorker(self._prepare_source_func, self._images_source)
+        worker.signals.result.connect(self._on_preparing_result)
+        worker.signals.progress.connect(self._on_preparing_progress)
+        worker.signals.finished.connect(partial(self._on_preparing_finished, self._images_source))
+
+        self._thread_pool.start(worker)
+
+    def _prepare_source_func(self, images_source, progress_callback):
+        return images_source, images_source.Prepare(progress_callback)
+
+    def _on_preparing_result(self, result):
+        images_source, names_changed = result
+        if images_source is not self._images_source:
+            return
+
+        if names_changed or self._images_source.HasNewNames():
+            self._refill_names()
+
+    def _on_preparing_progress(self, step: int, status: str):
+        self.setWindowTitle(str.format('{0} ({1} {2}%)', self._title, status, step))
+        if self._images_source.HasNewNames():
+            self._refill_names()
+
+    def _on_preparing_finished(self, images_source):
+        if images_source is not self._preparing_source:
+            return
+
+        self._preparing_source = None
+        self.setWindowTitle(self._title)
+        if self._prepare_again and images_source is self._images_source:
+            self._prepare_again = False
+            self._prepare_source()
+
+    def _on_source_changed(self):
+        self._prepare_source()
+
+    def _itemDoubleClicked(self, index):
+        self._current_index = index.row()
+        self._loadItem(self._current_index)
+
+    def _loadItem(self, row: int):
+        name = ustr(self._image_list_model.names()[row])
+        image = self._prefetcher.Take(name)
+        res = image is not None
+        if not res:
+            res, image = self._images_source.GetImage(name)
 
-    def _loadItem(self, item):
-        name = ustr(item.text())
-        res, image = self._images_source.GetImage(name)
         if res:
+            self._prefetcher.Put(name, image)
             self.image_changed.emit(image)
 
+        self._prefetcher.Update(self._current_index)
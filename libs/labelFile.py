@@ -30,19 +30,21 @@ class LabelFile(object):
         self.verified = False
 
     def savePascalVocFormat(self, filename, shapes, imagePath,
-                            lineColor=None, fillColor=None, databaseSrc=None):
+                            lineColor=None, fillColor=None, databaseSrc=None, imageShape=None):
         imgFolderPath = os.path.dirname(imagePath)
         imgFolderName = os.path.split(imgFolderPath)[-1]
         imgFileName = os.path.basename(imagePath)
         #imgFileNameWithoutExt = os.path.splitext(imgFileName)[0]
         # Read from file path because self.imageData might be empty if saving to
         # Pascal format
-        image = QImage()
-        image.load(imagePath)
-        imageShape = [image.height(), image.width(),
-                      1 if image.isGrayscale() else 3]
-        writer = PascalVocWriter(imgFolderName, imgFileName,
-                                 imageShape, localImgPath=imagePath)
+        if imageShape is None:
+            image = QImage()
+            image.load(imagePath)
+            imageShape = [image.height(), image.width(),
+                          1 if image.isGrayscale() else 3]
+        writer = PascalVocWriter(imgFolderName, imgFileName, imageShape,
+                                 databaseSrc=databaseSrc if databaseSrc is not None else 'Unknown',
+                                 localImgPath=imagePath)
         writer.verified = self.verified
 
         for shape in shapes:
@@ -57,17 +59,18 @@ class LabelFile(object):
         return
 
     def saveYoloFormat(self, filename, shapes, imagePath, classList,
-                            lineColor=None, fillColor=None, databaseSrc=None):
+                            lineColor=None, fillColor=None, databaseSrc=None, imageShape=None):
         imgFolderPath = os.path.dirname(imagePath)
         imgFolderName = os.path.split(imgFolderPath)[-1]
         imgFileName = os.path.basename(imagePath)
         #imgFileNameWithoutExt = os.path.splitext(imgFileName)[0]
         # Read from file path because self.imageData might be empty if saving to
         # Pascal format
-        image = QImage()
-        image.load(imagePath)
-        imageShape = [image.height(), image.width(),
-                      1 if image.isGrayscale() else 3]
+        if imageShape is None:
+            image = QImage()
+            image.load(imagePath)
+            imageShape = [image.height(), image.width(),
+                          1 if image.isGrayscale() else 3]
         writer = YOLOWriter(imgFolderName, imgFileName,
                                  imageShape, localImgPath=imagePath)
         writer.verified = self.verified
@@ -1,25 +1,33 @@
-import sys
 import os
-import io
-import argparse
-import glob
-import math
+import re
 
-import random
-import pandas as pd
-import xml.etree.ElementTree as ET
-from PIL import Image
-from collections import namedtuple
+_LABEL_MAP_ITEM = re.compile(r'item\s*\{(.*?)\}', re.DOTALL)
+_LABEL_MAP_FIELD = re.compile(r'(\w+)\s*:\s*(?:"([^"]*)"|\'([^\']*)\'|(\S+))')
+
+
+def parseLabelMap(path_to_label_map):
+    """Category index {id: {'id': id, 'name': name}} of a label map .pbtxt, display names preferred."""
+    with open(path_to_label_map, encoding='utf-8') as f:
+        text = f.read()
+
+    category_index = {}
+    for item in _LABEL_MAP_ITEM.findall(text):
+        fields = {key: quoted_double or quoted_single or plain
+                  for key, quoted_double, quoted_single, plain in _LABEL_MAP_FIELD.findall(item)}
+        if 'id' in fields:
+            cls = int(fields['id'])
+            category_index[cls] = {'id': cls, 'name': fields.get('display_name', fields.get('name', str(cls)))}
+
+    return category_index
 
-sys.path.append("c:/venv/models/research")
-from object_detection.utils import label_map_util
 
 class LabelMap:
-    def __init__(self, path_to_label_map):
+    def __init__(self, path_to_label_map, read_label_map=parseLabelMap):
+        """read_label_map returns the category index of a label map file, TensorFlow is not needed by default."""
         self._category_index = None
         self._path_to_labels = path_to_label_map
-        if os.path.exists(self._path_to_labels):
-            self._category_index = label_map_util.create_category_index_from_labelmap(self._path_to_labels, use_display_name=True)
+        if self._path_to_labels and os.path.exists(self._path_to_labels):
+            self._category_index = read_label_map(self._path_to_labels)
 
     def getLabels(self):
         classes = []
@@ -29,6 +37,9 @@ class LabelMap:
 
         return classes
 
+    def getClasses(self):
+        return sorted(self._category_index.keys()) if self._category_index else []
+
     def getLabel(self, cls):
         return self._category_index[cls]['name']
 
@@ -2,13 +2,44 @@ import numpy as np
 import os
 import sys
 import datetime
+import hashlib
+import threading
 
 import cv2
 
 from PIL import Image
-from PIL.ImageQt import ImageQt
+
+from PyQt5.QtGui import QImage
 
 from libs.ustr import *
+from libs.asyncSaver import atomicWrite
+
+SIXTEEN_BIT_MODES = ('I;16', 'I;16L', 'I;16B', 'I')
+JPEG_SAVE_QUALITY = 98
+
+# save path -> hash of the pixels last written there
+_written_hashes = {}
+_written_hashes_lock = threading.Lock()
+
+
+def _rgb_array(image) -> np.ndarray:
+    """
+    Convert PIL image into HxWx3 uint8 RGB array through the buffer protocol.
+    """
+    if image.mode in SIXTEEN_BIT_MODES:
+        gray = np.clip(np.asarray(image), 0, 65535) >> 8
+        return np.repeat(gray.astype(np.uint8)[:, :, np.newaxis], 3, axis=2)
+
+    if image.mode == 'L':
+        gray = np.asarray(image)
+        return np.repeat(gray[:, :, np.newaxis], 3, axis=2)
+
+    if image.mode != 'RGB':
+        # palette, alpha, CMYK, bilevel etc.
+        image = image.convert('RGB')
+
+    return np.asarray(image)
+
 
 class NamedImage():
 
@@ -16,9 +47,16 @@ class NamedImage():
         self._image_name = image_name
         self._image = None
         self._qt_image = None
+        # the array self._qt_image wraps, kept while the Qt image exists even if the pixels are replaced
+        self._qt_pixels = None
+        # RGB pixels, when set the Qt and PIL images are created from them
         self._np_image = None
+        # the image is shared by the prefetching, detection and saving threads
+        self._lock = threading.RLock()
         self._path_name = ''
         self._save_path = None
+        # size of the image in the file when the pixels were decoded at a reduced resolution
+        self._full_size = None
 
     @property
     def name(self):
@@ -37,70 +75,160 @@ class NamedImage():
 
     @property
     def image(self):
-        return self._image
+        with self._lock:
+            if self._image is None and self._np_image is not None:
+                self._image = Image.fromarray(self._np_image, 'RGB')
+
+            return self._image
 
     @property
     def qtimage(self):
-        if self._qt_image is None:
-            self._qt_image = ImageQt(self._image)
+        with self._lock:
+            if self._qt_image is None:
+                # wrap the pixels without copying
+                pixels = self.npimage
+                height, width = pixels.shape[:2]
+                self._qt_image = QImage(pixels.data, width, height, pixels.strides[0], QImage.Format_RGB888)
+                self._qt_pixels = pixels
 
-        return self._qt_image
+            return self._qt_image
 
     @property
     def npimage(self):
-        if self._np_image is None:
-            (im_width, im_height) = self._image.size
-            self._np_image = np.array(self._image.getdata()).reshape((im_height, im_width, 3)).astype(np.uint8)
+        with self._lock:
+            if self._np_image is None and self._image is not None:
+                self._np_image = _rgb_array(self._image)
+
+                # the array is the only pixel buffer from now on, PIL image is created from it on demand
+                self._image = None
 
-        return self._np_image
+            return self._np_image
 
     @property
     def size(self):
+        """Size in the coordinates of the annotations, the size of the image in the file."""
+        if self._full_size is not None:
+            return self._full_size
+
+        return self.pixelSize
+
+    @property
+    def pixelSize(self):
+        if self._np_image is not None:
+            height, width = self._np_image.shape[:2]
+            return width, height
+
         if self._image is None:
             return 0, 0
 
         return self._image.size
 
+    @property
+    def nbytes(self) -> int:
+        # memory held by the pixel buffers created so far
+        # (the Qt image shares the buffer of the array)
+        res = 0
+        image = self._image
+        if image is not None:
+            width, height = image.size
+            res += width * height * len(image.getbands())
+        pixels = self._np_image
+        if pixels is not None:
+            res += pixels.nbytes
+
+        return res
+
     def isNull(self) -> bool:
-        if self._image is None:
+        if self._image is None and self._np_image is None:
             return True
 
         return False
 
-    def FromFile(self, path: str):
+    def Preload(self):
+        # decode pixels and prepare the Qt image in advance, e.g. on a prefetching thread
+        if not self.isNull():
+            _ = self.qtimage
+
+    def isReduced(self) -> bool:
+        return self._full_size is not None
+
+    def FromFile(self, path: str, max_size=None):
+        """
+        Open the image file. With max_size (width, height) a JPEG file is decoded at the smallest
+        DCT scale (1/2, 1/4, 1/8) still covering max_size; size stays the size in the file.
+        """
         try:
             self._path_name = path
+            self._full_size = None
             self._image = Image.open(path)
+            if max_size and self._image.format == 'JPEG':
+                width, height = self._image.size
+                scale = max(width / max_size[0], height / max_size[1])
+                if scale >= 2:
+                    self._image.draft('RGB', (int(width / scale), int(height / scale)))
+                    if self._image.size != (width, height):
+                        self._full_size = (width, height)
         except Exception as e:
             self._image = None
             return False
 
         return True
 
-    def FromArray(self, np_array: object, imgname: str, savepath: str):
+    def FromArray(self, np_array: object, imgname: str, savepath: str, is_bgr: bool = True):
+        """
+        Take ownership of a BGR array as returned by OpenCV, the channels are swapped in place.
+        RGB arrays (is_bgr=False) are used as they are.
+        """
         try:
             self._path_name = ustr(imgname)
             self._save_path = ustr(savepath)
-            self._image = Image.fromarray(cv2.cvtColor(np_array, cv2.COLOR_BGR2RGB), 'RGB')
-            self._np_image = np_array
+            self._np_image = np.ascontiguousarray(np_array)
+            if is_bgr:
+                cv2.cvtColor(self._np_image, cv2.COLOR_BGR2RGB, dst=self._np_image)
         except Exception as e:
-            self._image = None
+            self._np_image = None
             return False
 
         return True
 
-    def Save(self) -> str:
+    def Save(self, saver=None) -> str:
+        """
+        Write the image to its save path, through saver (AsyncSaver) when given.
+        Returns the path of the image file.
+        """
         if self._save_path is None:
             return self._path_name
 
-        fpath, fname = os.path.split(self._save_path)
-        try:
-            if not os.path.exists(fpath):
-                os.makedirs(fpath)
+        if saver is not None:
+            saver.Submit(self._save_path, self._write)
+        else:
+            try:
+                self._write(self._save_path)
+            except Exception as e:
+                print(e)
 
-            #cv2.imwrite(self._save_path, self._np_image)
-            self._image.save(self._save_path, "JPEG", quality=98)
-        except Exception as e:
-            print(e)
+        return self._save_path
 
-        return self._save_path
\ No newline at end of file
+    def FullResolutionPixels(self) -> np.ndarray:
+        """Pixels at the resolution of the file, a reduced image is decoded again without changing it."""
+        if self._full_size is None:
+            return self.npimage
+
+        with Image.open(self._path_name) as image:
+            return _rgb_array(image)
+
+    # private methods
+    def _write(self, path):
+        # runs on the saver thread, the image may be shown and cached meanwhile
+        pixels = np.ascontiguousarray(self.FullResolutionPixels())
+        pixels_hash = hashlib.md5(pixels.data).hexdigest()
+        with _written_hashes_lock:
+            unchanged = _written_hashes.get(path) == pixels_hash
+
+        if unchanged and os.path.exists(path):
+            return
+
+        image = Image.fromarray(pixels, 'RGB')
+        atomicWrite(path, lambda tmp_path: image.save(tmp_path, "JPEG", quality=JPEG_SAVE_QUALITY))
+        with _written_hashes_lock:
+            _written_hashes[path] = pixels_hash
@@ -6,30 +6,31 @@ import datetime
 
 from PIL import Image
 
-sys.path.append("c:/venv/models/research")
+from libs.detectorBackend import *
+
+addObjectDetectionPath()
 
 from object_detection.utils import ops as utils_ops
+from object_detection.utils import label_map_util
 
-from libs.detectedShape import *
-from libs.programState import *
-from libs.labelMap import *
 
-class ObjectDetector:
-    def __init__(self, graphPath):
-        self._path_to_frozen_graph = graphPath
-        self._path_to_labels = None
-        dirname = os.path.dirname(graphPath)
-        for map_file in glob.glob(dirname + '/*.pbtxt'):
-            self._path_to_labels = map_file
+def _read_label_map(path):
+    return label_map_util.create_category_index_from_labelmap(path, use_display_name=True)
 
-        if self._path_to_labels is None:
-            self._path_to_labels = ProgramState.getInstance().labelMapPath
 
-        self._label_map = LabelMap(self._path_to_labels)
+class ObjectDetector(DetectorBackend):
+    """Detector running a TensorFlow frozen graph of the object detection API."""
+
+    def __init__(self, graphPath):
+        super(ObjectDetector, self).__init__(findLabelMap(graphPath), _read_label_map)
+        self._path_to_frozen_graph = graphPath
         self._session = None
         self._detection_masks = None
         self._detection_boxes = None
         self._detection_masks_reframed = None
+        self._detection_graph = None
+
+    def load(self):
         self._detection_graph = tf.Graph()
         with self._detection_graph.as_default():
             od_graph_def = tf.GraphDef()
@@ -92,9 +93,6 @@ class ObjectDetector:
 
         return output_dict
 
-    def getLabelMap(self):
-        return self._label_map
-
     def detect(self, namedimage: object) -> object:
 
         image_np = namedimage.npimage
@@ -103,18 +101,40 @@ class ObjectDetector:
         with self._detection_graph.as_default():
             output_dict = self._run_inference_for_single_image(image_np_expanded)
 
-            i = 0
-            dshapes = []
-            while output_dict["detection_scores"][i] > 0.1:
-                d_class = output_dict["detection_classes"][i]
-                d_label = self._label_map.getLabel(d_class)
-                d_score = output_dict["detection_scores"][i]
-
-                (ymin, xmin, ymax, xmax) = output_dict["detection_boxes"][i]
-                d_extent = (int(xmin * width) , int(ymin * height), int(xmax * width), int(ymax * height))
-                dshapes.append(DetectedShape(d_label, d_class, d_score, d_extent))
-                i += 1
-
-            return dshapes
-
+            return self._detected_shapes(output_dict['detection_boxes'], output_dict['detection_classes'],
+                                         output_dict['detection_scores'], output_dict['num_detections'],
+                                         width, height)
+
+    def detectBatch(self, namedimages: list) -> list:
+        """
+        Detect objects on several images in one session run, returns the shapes of every image.
+        Images of different sizes are padded at the bottom and the right to the largest one.
+        """
+        if len(namedimages) == 1 or self._detection_masks is not None:
+            # masks are reframed for a single image only
+            return [self.detect(namedimage) for namedimage in namedimages]
+
+        pixels = [namedimage.npimage for namedimage in namedimages]
+        batch_height = max(image_np.shape[0] for image_np in pixels)
+        batch_width = max(image_np.shape[1] for image_np in pixels)
+        batch = np.zeros((len(pixels), batch_height, batch_width, 3), dtype=np.uint8)
+        for i, image_np in enumerate(pixels):
+            batch[i, :image_np.shape[0], :image_np.shape[1]] = image_np
 
+        with self._detection_graph.as_default():
+            image_tensor = tf.get_default_graph().get_tensor_by_name('image_tensor:0')
+            output_dict = self._session.run(self._tensor_dict, feed_dict={image_tensor: batch})
+
+        res = []
+        for i, namedimage in enumerate(namedimages):
+            width, height = namedimage.size
+            pixel_height, pixel_width = pixels[i].shape[:2]
+            # boxes are relative to the padded image
+            boxes = output_dict['detection_boxes'][i] * \
+                    np.array([batch_height / pixel_height, batch_width / pixel_width,
+                              batch_height / pixel_height, batch_width / pixel_width])
+            res.append(self._detected_shapes(boxes, output_dict['detection_classes'][i].astype(np.int64),
+                                             output_dict['detection_scores'][i],
+                                             int(output_dict['num_detections'][i]), width, height))
+
+        return res
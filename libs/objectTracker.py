@@ -0,0 +1,171 @@
+import itertools
+import threading
+
+import numpy as np
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+
+# detections of two frames overlapping less than this are different objects
+DEFAULT_MIN_IOU = 0.3
+# a track continues over this many sampled frames without its object detected
+DEFAULT_MAX_GAP = 2
+
+
+def iouMatrix(boxes_a, boxes_b) -> np.ndarray:
+    """Intersection over union of every box of boxes_a with every box of boxes_b, boxes are (xmin, ymin, xmax, ymax)."""
+    a = np.asarray(boxes_a, dtype=np.float64).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float64).reshape(-1, 4)
+
+    widths = np.minimum(a[:, None, 2], b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0])
+    heights = np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1])
+    intersection = np.clip(widths, 0, None) * np.clip(heights, 0, None)
+
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+
+def assignPairs(scores, min_score) -> list:
+    """
+    Pairs (i, j) of rows and columns of the score matrix with the largest total score
+    (Hungarian method when scipy is installed, greedily by decreasing score otherwise),
+    each row and column used once; pairs scoring below min_score are dropped.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    if scores.size == 0:
+        return []
+
+    if linear_sum_assignment is not None:
+        rows, cols = linear_sum_assignment(-scores)
+    else:
+        # candidate pairs by decreasing score, each row takes its best free column
+        candidates = np.flatnonzero(scores >= min_score)
+        candidates = candidates[np.argsort(-scores.ravel()[candidates], kind='stable')]
+        rows, cols = np.unravel_index(candidates, scores.shape)
+        used_rows = np.zeros(scores.shape[0], dtype=bool)
+        used_cols = np.zeros(scores.shape[1], dtype=bool)
+        keep = np.zeros(len(candidates), dtype=bool)
+        for k, (i, j) in enumerate(zip(rows, cols)):
+            if not used_rows[i] and not used_cols[j]:
+                used_rows[i] = used_cols[j] = keep[k] = True
+        rows, cols = rows[keep], cols[keep]
+
+    return [(int(i), int(j)) for i, j in zip(rows, cols) if scores[i, j] >= min_score]
+
+
+def sameLabels(labels_a, labels_b) -> np.ndarray:
+    return np.asarray(labels_a, dtype=object)[:, None] == np.asarray(labels_b, dtype=object)[None, :]
+
+
+def matchBoxes(boxes_a, labels_a, boxes_b, labels_b, min_iou=DEFAULT_MIN_IOU) -> list:
+    """Pairs (i, j) of boxes_a[i] and boxes_b[j] of the same label overlapping the most."""
+    if len(boxes_a) == 0 or len(boxes_b) == 0:
+        return []
+
+    iou = iouMatrix(boxes_a, boxes_b)
+    iou[~sameLabels(labels_a, labels_b)] = 0
+    return assignPairs(iou, min_iou)
+
+
+class ObjectTracker:
+    """
+    Links the detections of sampled frames into tracks, each DetectedShape gets the
+    track_id of the object it shows.
+
+    Frames may be detected in any order (the upcoming ones are detected ahead), a frame
+    is matched with the nearest detected frames before and after it; when it links two
+    tracks they are merged and TrackId() resolves the old id to the merged one.
+    """
+
+    def __init__(self, min_iou=DEFAULT_MIN_IOU, max_gap=DEFAULT_MAX_GAP):
+        self._min_iou = min_iou
+        self._max_gap = max_gap
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        # position -> (name, boxes, labels, track ids)
+        self._frames = {}
+        # track id -> the track it was merged into
+        self._merged = {}
+        # track id -> positions of its detections, for the tracks not merged into others
+        self._positions = {}
+
+    def Reset(self):
+        with self._lock:
+            self._frames = {}
+            self._merged = {}
+            self._positions = {}
+
+    def Update(self, position: int, name: str, dshapes: list):
+        """Assign track ids to the detections of the frame at position of the images list."""
+        boxes = np.array([dshape.extent for dshape in dshapes], dtype=np.float64).reshape(-1, 4)
+        labels = [dshape.label for dshape in dshapes]
+        with self._lock:
+            known = self._frames.get(position)
+            if known is not None and known[0] == name and known[2] == labels and np.array_equal(known[1], boxes):
+                # the same results again, e.g. from the detection cache
+                ids = known[3]
+            else:
+                if known is not None:
+                    for track_id in known[3]:
+                        self._positions.get(self._resolve(track_id), set()).discard(position)
+
+                ids = [None] * len(dshapes)
+                previous = self._nearest(range(position - 1, position - self._max_gap - 2, -1))
+                if previous is not None:
+                    for i, j in matchBoxes(previous[1], previous[2], boxes, labels, self._min_iou):
+                        ids[j] = self._resolve(previous[3][i])
+
+                ids = [track_id if track_id is not None else next(self._ids) for track_id in ids]
+                for track_id in ids:
+                    self._positions.setdefault(track_id, set()).add(position)
+
+                following = self._nearest(range(position + 1, position + self._max_gap + 2))
+                if following is not None:
+                    for i, j in matchBoxes(following[1], following[2], boxes, labels, self._min_iou):
+                        later_id = self._resolve(following[3][i])
+                        later_positions = self._positions.get(later_id, set())
+                        # an object is seen once per frame, tracks sharing a frame are different objects
+                        if later_id != ids[j] and not later_positions & self._positions[ids[j]]:
+                            self._merged[later_id] = ids[j]
+                            self._positions[ids[j]] |= self._positions.pop(later_id, set())
+
+                self._frames[position] = (name, boxes, labels, ids)
+
+        for dshape, track_id in zip(dshapes, ids):
+            dshape.track_id = track_id
+
+    def TrackId(self, track_id):
+        with self._lock:
+            return self._resolve(track_id)
+
+    def Track(self, track_id) -> list:
+        """(position, name, label, extent) of the detections of the track ordered by position."""
+        with self._lock:
+            track_id = self._resolve(track_id)
+            track = []
+            for position in sorted(self._frames.keys()):
+                name, boxes, labels, ids = self._frames[position]
+                for box, label, box_id in zip(boxes, labels, ids):
+                    if self._resolve(box_id) == track_id:
+                        track.append((position, name, label, tuple(int(v) for v in box)))
+
+            return track
+
+    # private methods
+    def _nearest(self, positions):
+        for p in positions:
+            frame = self._frames.get(p)
+            if frame is not None:
+                return frame
+
+        return None
+
+    def _resolve(self, track_id):
+        while track_id in self._merged:
+            track_id = self._merged[track_id]
+
+        return track_id
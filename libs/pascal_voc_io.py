@@ -132,6 +132,7 @@ class PascalVocReader:
         self.shapes = []
         self.filepath = filepath
         self.verified = False
+        self.databaseSrc = None
         try:
             self.parseXML()
         except:
@@ -160,6 +161,10 @@ class PascalVocReader:
         except KeyError:
             self.verified = False
 
+        database = xmltree.find('source/database')
+        if database is not None:
+            self.databaseSrc = database.text
+
         for object_iter in xmltree.findall('object'):
             bndbox = object_iter.find("bndbox")
             label = object_iter.find('name').text
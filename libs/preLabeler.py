@@ -0,0 +1,153 @@
+import os
+import time
+
+import cv2
+
+from libs.frameExtractor import *
+from libs.namedImage import *
+from libs.labelFile import LabelFile
+from libs.pascal_voc_io import PascalVocReader, XML_EXT
+from libs.asyncSaver import atomicWrite
+from libs.objectTracker import iouMatrix
+
+# database source of the annotations written by the pre-labelling, they may be replaced by a new run
+PRELABEL_DATABASE_SRC = 'LabelVideoPreLabel'
+DEFAULT_PRELABEL_THRESHOLD = 0.5
+# frames per detection run, see DEFAULT_DETECTION_BATCH_SIZE
+DEFAULT_PRELABEL_BATCH_SIZE = 1
+# an added box overlapping a box of the same label at least this much is already annotated
+DUPLICATE_BOX_IOU = 0.9
+
+
+def annotationPath(save_dir: str, image_path: str) -> str:
+    """Pascal VOC file of an image in the save folder, the one MainWindow loads and saves."""
+    basename = os.path.basename(os.path.splitext(image_path)[0])
+    return os.path.join(save_dir, basename + XML_EXT)
+
+
+def addAnnotations(xml_path: str, image_path: str, image_shape: list, shapes: list, database_src=None) -> int:
+    """
+    Add shapes (dicts of label, points and difficult as LabelFile takes them) to the
+    Pascal VOC file of an image keeping its shapes, verified flag and source, shapes
+    already there are not added twice. New files get database_src as their source.
+    Returns the number of added shapes.
+    """
+    labelFile = LabelFile()
+    existing = []
+    if os.path.exists(xml_path):
+        reader = PascalVocReader(xml_path)
+        labelFile.verified = reader.verified
+        database_src = reader.databaseSrc
+        existing = [dict(label=label, points=points, difficult=difficult)
+                    for label, points, line_color, fill_color, difficult in reader.getShapes()]
+
+    added = []
+    for shape in shapes:
+        same_label = [s for s in existing + added if s['label'] == shape['label']]
+        if same_label and iouMatrix([LabelFile.convertPoints2BndBox(shape['points'])],
+                                    [LabelFile.convertPoints2BndBox(s['points']) for s in same_label]).max() \
+                >= DUPLICATE_BOX_IOU:
+            continue
+
+        added.append(shape)
+
+    if added:
+        atomicWrite(xml_path, lambda path: labelFile.savePascalVocFormat(path, existing + added, image_path,
+                                                                         databaseSrc=database_src,
+                                                                         imageShape=image_shape))
+
+    return len(added)
+
+
+class PreLabeler:
+    """
+    Writes the frame JPEG and a Pascal VOC annotation of the detected objects for
+    every sampled frame of a video. Frames are decoded in one sequential pass and
+    detected in batches.
+
+    Frames having an annotation already are skipped, so an interrupted run continues
+    where it stopped. Annotations saved by the user are never replaced, the ones
+    written by an earlier pre-labelling only when overwrite_prelabels is set.
+    """
+
+    def __init__(self, video_path: str, frame_names: list, frame_sizes: tuple, detector, save_dir: str,
+                 class_thresholds=None, default_threshold=DEFAULT_PRELABEL_THRESHOLD,
+                 batch_size=DEFAULT_PRELABEL_BATCH_SIZE, overwrite_prelabels=False):
+        self._video_path = video_path
+        self._frame_names = list(frame_names)
+        self._frame_sizes = tuple(frame_sizes)
+        self._detector = detector
+        self._save_dir = save_dir
+        self._class_thresholds = dict(class_thresholds or {})
+        self._default_threshold = default_threshold
+        self._batch_size = max(1, batch_size)
+        self._overwrite_prelabels = overwrite_prelabels
+
+    def Run(self, progress_callback=None, is_cancelled=None) -> tuple:
+        """Returns the numbers of labelled and skipped frames and the labelling speed in frames/s."""
+        pending = [name for name in self._frame_names if self._needs_labels(name)]
+        skipped = len(self._frame_names) - len(pending)
+        if not pending:
+            return 0, skipped, 0.0
+
+        total = len(self._frame_names)
+        labelled = 0
+        start = time.time()
+        batch = []
+        for name, frame in decodeSegment(self._video_path, pending):
+            if is_cancelled and is_cancelled():
+                batch = []
+                break
+
+            image = NamedImage(name)
+            image.FromArray(cv2.resize(frame, self._frame_sizes), frameImageName(self._video_path, name),
+                            frameSavePath(self._video_path, name))
+            batch.append(image)
+            if len(batch) < self._batch_size:
+                continue
+
+            labelled += self._label_batch(batch)
+            batch = []
+            if progress_callback:
+                progress_callback.emit(int(100 * (skipped + labelled) / total),
+                                       str.format('Pre-labelling {0:.1f} frames/s', labelled / (time.time() - start)))
+
+        if batch:
+            labelled += self._label_batch(batch)
+
+        return labelled, skipped, labelled / max(time.time() - start, 1e-6)
+
+    # private methods
+    def _needs_labels(self, name) -> bool:
+        xml_path = annotationPath(self._save_dir, frameSavePath(self._video_path, name))
+        if not os.path.exists(xml_path):
+            return True
+
+        if not self._overwrite_prelabels:
+            return False
+
+        reader = PascalVocReader(xml_path)
+        return not reader.verified and reader.databaseSrc == PRELABEL_DATABASE_SRC
+
+    def _label_batch(self, images) -> int:
+        labelled = 0
+        for image, dshapes in zip(images, self._detector.detectBatch(images)):
+            # the user may have saved the frame meanwhile
+            if not self._needs_labels(image.name):
+                continue
+
+            shapes = [dict(label=dshape.label, points=[(x1, y1), (x2, y1), (x2, y2), (x1, y2)], difficult=False)
+                      for dshape in dshapes
+                      for x1, y1, x2, y2 in [dshape.extent]
+                      if dshape.label and
+                      dshape.score >= self._class_thresholds.get(dshape.label, self._default_threshold)]
+
+            imagepath = image.Save()
+            width, height = image.size
+            write = lambda path: LabelFile().savePascalVocFormat(path, shapes, imagepath,
+                                                                 databaseSrc=PRELABEL_DATABASE_SRC,
+                                                                 imageShape=[height, width, 3])
+            atomicWrite(annotationPath(self._save_dir, imagepath), write)
+            labelled += 1
+
+        return labelled
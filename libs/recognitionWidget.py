@@ -6,10 +6,14 @@ import time
 import pickle
 
 from libs.threading import *
-from libs.objectDetector import *
+from libs.detectorBackend import *
 from libs.trainingData import *
 from libs.trainingSettings import *
+from libs.classThresholds import *
 from libs.namedImage import *
+from libs.detectionCache import *
+from libs.detectionScheduler import *
+from libs.preLabeler import *
 
 ADD_MODEL_COMMAND = '<< Add Model >>'
 RUN_DETECTION = 'RunDetection'
@@ -18,6 +22,16 @@ CURRENT_MODEL_NAME = 'CurrentModelName'
 SOURCE_MODEL_FOLDER = 'SourceModelFolder'
 TRAIN_MODEL_FOLDER = 'TrainModelFolder'
 INFERENCE_GRAPH_FOLDER = 'InferenceGraphFolder'
+DETECTION_BATCH_SIZE = 'DetectionBatchSize'
+DETECTION_BATCH_WAIT = 'DetectionBatchWait'
+PRELABEL_THRESHOLD = 'PreLabelThreshold'
+# label -> minimal score of the pre-labelled objects of that class
+PRELABEL_CLASS_THRESHOLDS = 'PreLabelClassThresholds'
+
+# batching has no measured gain on CPU yet (benchmarks/bench_detection_batch.py), raise it when it has
+DEFAULT_DETECTION_BATCH_SIZE = 1
+# msec a partial batch waits for more images, 0 runs whatever is queued at once
+DEFAULT_DETECTION_BATCH_WAIT = 0
 
 
 class Recognition(QDockWidget):
@@ -35,8 +49,26 @@ class Recognition(QDockWidget):
         self._objectDetectors = {}
         self._currentObjectDetector = None
 
-        self._detectionQueue = []
+        # results of the current model on the images of the current video/folder
+        self._storageName = None
+        self._detectionCache = None
+        self._detectionCacheModel = None
+        # writes the detection cache in background
+        self._saver = None
+
+        self._scheduler = DetectionScheduler()
         self._detectionInProgress = False
+        self._batchSize = settings.get(DETECTION_BATCH_SIZE, DEFAULT_DETECTION_BATCH_SIZE)
+        self._batchWait = settings.get(DETECTION_BATCH_WAIT, DEFAULT_DETECTION_BATCH_WAIT)
+        self._batchTimer = QTimer(self)
+        self._batchTimer.setSingleShot(True)
+        self._batchTimer.timeout.connect(self._process_detection_queue)
+
+        self._imagesSource = None
+        self._prelabelingInProgress = False
+        self._cancelPrelabeling = False
+        self._prelabelThreshold = settings.get(PRELABEL_THRESHOLD, DEFAULT_PRELABEL_THRESHOLD)
+        self._prelabelClassThresholds = settings.get(PRELABEL_CLASS_THRESHOLDS, {})
 
         self._runDetection = settings.get(RUN_DETECTION, False)
         self._modelList = settings.get(MODEL_LIST, [])
@@ -74,6 +106,39 @@ class Recognition(QDockWidget):
 
         self._detectionModelsCombobox.setVisible(self._runDetection)
 
+        self._batchSizeSpinbox = QSpinBox(self)
+        self._batchSizeSpinbox.setRange(1, 64)
+        self._batchSizeSpinbox.setPrefix('Batch: ')
+        self._batchSizeSpinbox.setValue(self._batchSize)
+        self._batchSizeSpinbox.valueChanged.connect(self._batch_size_changed)
+
+        self._batchWaitSpinbox = QSpinBox(self)
+        self._batchWaitSpinbox.setRange(0, 5000)
+        self._batchWaitSpinbox.setPrefix('Wait: ')
+        self._batchWaitSpinbox.setSuffix(' ms')
+        self._batchWaitSpinbox.setValue(self._batchWait)
+        self._batchWaitSpinbox.valueChanged.connect(self._batch_wait_changed)
+
+        self._queueLabel = QLabel(self)
+
+        self._prelabelThresholdSpinbox = QDoubleSpinBox(self)
+        self._prelabelThresholdSpinbox.setRange(0.0, 1.0)
+        self._prelabelThresholdSpinbox.setSingleStep(0.05)
+        self._prelabelThresholdSpinbox.setPrefix('Min score: ')
+        self._prelabelThresholdSpinbox.setValue(self._prelabelThreshold)
+        self._prelabelThresholdSpinbox.setToolTip('Score of the objects written by pre-labelling, '
+                                                  'unless a class has its own threshold')
+        self._prelabelThresholdSpinbox.valueChanged.connect(self._prelabel_threshold_changed)
+
+        self._classThresholdsButton = QPushButton("Class thresholds")
+        self._classThresholdsButton.setToolTip('Min score of the objects of each class written by pre-labelling')
+        self._classThresholdsButton.clicked.connect(self._set_class_thresholds)
+
+        self._prelabelButton = QPushButton("Pre-label video")
+        self._prelabelButton.setToolTip('Write annotations of the detected objects for all frames of the video')
+        self._prelabelButton.setEnabled(False)
+        self._prelabelButton.clicked.connect(self._prelabel_video)
+
         self._trainingPropertiesButton = QPushButton("Set training properties")
         self._trainingPropertiesButton.clicked.connect(self._set_training_properties)
 
@@ -93,7 +158,13 @@ class Recognition(QDockWidget):
         detectionLayout = QHBoxLayout()
         detectionLayout.addWidget(self._runDetectionCheckbox)
         detectionLayout.addWidget(self._detectionModelsCombobox)
+        detectionLayout.addWidget(self._batchSizeSpinbox)
+        detectionLayout.addWidget(self._batchWaitSpinbox)
+        detectionLayout.addWidget(self._queueLabel)
         detectionLayout.addStretch()
+        detectionLayout.addWidget(self._prelabelThresholdSpinbox)
+        detectionLayout.addWidget(self._classThresholdsButton)
+        detectionLayout.addWidget(self._prelabelButton)
         detectionLayout.addWidget(self._trainingPropertiesButton)
         detectionLayout.addWidget(self._exportTrainingDataButton)
         detectionLayout.addWidget(self._runTrainingButton)
@@ -112,16 +183,78 @@ class Recognition(QDockWidget):
                     CURRENT_MODEL_NAME: self._currentModelName,
                     SOURCE_MODEL_FOLDER: self._source_model_folder,
                     TRAIN_MODEL_FOLDER: self._train_model_folder,
-                    INFERENCE_GRAPH_FOLDER: self._inference_graph_folder}
+                    INFERENCE_GRAPH_FOLDER: self._inference_graph_folder,
+                    DETECTION_BATCH_SIZE: self._batchSize,
+                    DETECTION_BATCH_WAIT: self._batchWait,
+                    PRELABEL_THRESHOLD: self._prelabelThreshold,
+                    PRELABEL_CLASS_THRESHOLDS: self._prelabelClassThresholds}
 
         return pickle.dumps(settings)
 
-    def ProcessImage(self, image):
-        self._detectionQueue.append(image)
+    def SetStorage(self, storage_name):
+        """Name of the video or folder the images come from, selects the detection cache."""
+        self._storageName = storage_name
+        self._update_detection_cache()
+
+    def SetImagesSource(self, images_source):
+        """Source of the images shown, the video of a video source can be pre-labelled."""
+        self._imagesSource = images_source
+        if not self._prelabelingInProgress:
+            self._prelabelButton.setEnabled(hasattr(images_source, 'CreatePreLabeler'))
+
+    def SetSaver(self, saver):
+        self._saver = saver
+
+    def SaveCache(self):
+        if self._detectionCache is not None:
+            self._detectionCache.Save()
+
+    def ProcessImage(self, image, background=False, priority=0):
+        """
+        Detect objects on the image. The latest interactive image supersedes the previous one
+        if it did not start yet; background images run when no interactive one waits.
+        """
+        if self._detectionCache is not None and self._currentObjectDetector is not None:
+            dshapes = self._detectionCache.Get(image)
+            if dshapes is not None:
+                # background results are emitted as well, they link the tracks of the upcoming frames
+                self.objects_detected.emit((image.path, dshapes))
+                return
+
+        if background:
+            self._scheduler.SubmitBackground(image, priority)
+        else:
+            self._scheduler.SubmitInteractive(image)
+
         self._process_detection_queue()
 
+    def ProcessUpcoming(self, images_source, names):
+        """
+        Detect the images following the current one in background, nearer ones first,
+        so that their results are cached when the user gets there.
+        """
+        self._scheduler.ClearBackground()
+        if self._runDetection and self._currentObjectDetector is not None and images_source is not None:
+            for distance, name in enumerate(names):
+                self.ProcessImage(SourceImage(images_source, name), background=True, priority=distance + 1)
+
+        self._update_queue_label()
+
+    def LookaheadDepth(self) -> int:
+        """Number of upcoming images to detect, adapts to the detection latency."""
+        return self._scheduler.LookaheadDepth()
+
+    def CancelBackground(self):
+        self._scheduler.ClearBackground()
+        self._update_queue_label()
+
+    def Metrics(self) -> dict:
+        """Queue depth, dispatched/dropped counts and wait times (seconds) of the detection requests."""
+        return self._scheduler.Metrics()
+
     # signals
     objects_detected = pyqtSignal(tuple)
+    status_changed = pyqtSignal(str)
 
     # private methods
     def _set_training_properties(self):
@@ -187,6 +320,58 @@ class Recognition(QDockWidget):
         self._exporting_data_in_progress = False
         self._cancel_exporting = False
 
+    def _prelabel_video(self):
+        if self._prelabelingInProgress:
+            self._cancelPrelabeling = True
+            return
+
+        save_dir = ProgramState.getInstance().defaultSaveDir
+        if self._currentObjectDetector is None or not save_dir or \
+                not hasattr(self._imagesSource, 'CreatePreLabeler'):
+            self.status_changed.emit('Pre-labelling needs a video, a detection model and a save folder')
+            return
+
+        prelabeler = self._imagesSource.CreatePreLabeler(self._currentObjectDetector, ustr(save_dir),
+                                                         class_thresholds=self._prelabelClassThresholds,
+                                                         default_threshold=self._prelabelThreshold,
+                                                         batch_size=self._batchSize)
+        self._prelabelingInProgress = True
+        self._cancelPrelabeling = False
+        worker = ProgressingWorker(prelabeler.Run, is_cancelled=lambda: self._cancelPrelabeling)
+        worker.signals.result.connect(self._on_prelabeling_result)
+        worker.signals.progress.connect(self._on_prelabeling_progress)
+        worker.signals.finished.connect(self._on_prelabeling_finished)
+
+        self._threadPool.start(worker)
+        self._prelabelButton.setText("Cancel pre-labelling")
+
+    def _on_prelabeling_result(self, result):
+        labelled, skipped, frames_per_second = result
+        self.status_changed.emit(str.format('Pre-labelled {0} frames ({1:.1f} frames/s), {2} already labelled',
+                                            labelled, frames_per_second, skipped))
+
+    def _on_prelabeling_progress(self, step: int, status: str):
+        self.status_changed.emit(str.format('{0} {1}%', status, step))
+
+    def _on_prelabeling_finished(self):
+        self._prelabelButton.setText("Pre-label video")
+        self._prelabelingInProgress = False
+        self._cancelPrelabeling = False
+        self._prelabelButton.setEnabled(hasattr(self._imagesSource, 'CreatePreLabeler'))
+
+    def _prelabel_threshold_changed(self, value):
+        self._prelabelThreshold = value
+
+    def _set_class_thresholds(self):
+        if self._currentObjectDetector is not None:
+            labels = self._currentObjectDetector.getLabelMap().getLabels()
+        else:
+            labels = LabelMap(ProgramState.getInstance().labelMapPath).getLabels()
+
+        dialog = ClassThresholds(self, labels, self._prelabelClassThresholds, self._prelabelThreshold)
+        if dialog.exec_():
+            self._prelabelClassThresholds = dialog.getResult()
+
     def _run_training(self):
         pass
 
@@ -197,13 +382,25 @@ class Recognition(QDockWidget):
         if self._detectionInProgress or self._currentObjectDetector is None:
             return
 
-        if len(self._detectionQueue) != 0:
+        depth = self._scheduler.depth
+        self._update_queue_label()
+        if depth != 0:
+            if not self._scheduler.hasInteractive and depth < self._batchSize:
+                # let a partial batch wait for more images, but not longer than the batch wait
+                waited = 1000 * self._scheduler.OldestWait()
+                if waited < self._batchWait:
+                    self._batchTimer.start(int(self._batchWait - waited) + 1)
+                    return
+
+            self._batchTimer.stop()
+            images = self._scheduler.NextBatch(self._batchSize)
+            if not images:
+                return
+
             self._detectionInProgress = True
-            image = self._detectionQueue[0]
-            self._detectionQueue = self._detectionQueue[1:]
 
             #  run detection in separate thread
-            worker = Worker(self._detect_objects_func, image)  # Any other args, kwargs are passed to the run function
+            worker = Worker(self._detect_objects_func, images, self._detectionCache)  # Any other args, kwargs are passed to the run function
             worker.signals.result.connect(self._on_detection_result)
             worker.signals.error.connect(self._on_detection_error)
             worker.signals.finished.connect(self._on_detection_finished)
@@ -211,13 +408,61 @@ class Recognition(QDockWidget):
             # Execute
             self._threadPool.start(worker)
 
-    def _detect_objects_func(self, image):
+    def _detect_objects_func(self, images, detection_cache):
         self._detectionModelsCombobox.setEnabled(False)
         self._runDetectionCheckbox.setEnabled(False)
-        return image.path, self._currentObjectDetector.detect(image)
+        loaded = []
+        for pos, image in enumerate(images):
+            if isinstance(image, SourceImage):
+                if self._scheduler.hasInteractive:
+                    # the user moved on, give way to the interactive request
+                    for distance, rest in enumerate(images[pos:]):
+                        self._scheduler.SubmitBackground(rest, priority=distance + 1)
+                    break
+
+                image = image.Load()
+
+            if image is not None:
+                loaded.append(image)
+
+        if not loaded:
+            return detection_cache, []
+
+        start = time.time()
+        detections = self._currentObjectDetector.detectBatch(loaded)
+        self._scheduler.RecordLatency((time.time() - start) / len(loaded))
+        return detection_cache, list(zip(loaded, detections))
+
+    def _on_detection_result(self, detection_results):
+        detection_cache, detections = detection_results
+        for image, dshapes in detections:
+            if detection_cache is not None:
+                detection_cache.Put(image, dshapes)
+
+            self.objects_detected.emit((image.path, dshapes))
+
+    def _update_queue_label(self):
+        metrics = self._scheduler.Metrics()
+        self._queueLabel.setText(str.format('Queue: {0}, wait: {1:.0f} ms', metrics['depth'],
+                                            1000 * metrics['average_wait']))
+        self._queueLabel.setToolTip(str.format('Detected: {0}, dropped: {1}, last wait: {2:.0f} ms, max wait: {3:.0f} ms',
+                                               metrics['dispatched'], metrics['dropped'],
+                                               1000 * metrics['last_wait'], 1000 * metrics['max_wait']))
+
+    def _update_detection_cache(self):
+        modelName = self._currentModelName if self._currentModelName in self._objectDetectors else None
+        if self._detectionCache is not None:
+            if self._detectionCache.storageName == self._storageName and \
+                    self._detectionCacheModel == modelName:
+                return
+
+            self._detectionCache.Save()
 
-    def _on_detection_result(self, detection_result):
-        self.objects_detected.emit(detection_result)
+        self._detectionCache = None
+        self._detectionCacheModel = modelName
+        if self._storageName and modelName and os.path.exists(self._storageName) and os.path.isfile(modelName):
+            self._detectionCache = DetectionCache(self._storageName, modelName, DETECTION_SCORE_THRESHOLD,
+                                                  saver=self._saver)
 
     def _on_detection_error(self, restuple):
         str = restuple[2]
@@ -228,18 +473,29 @@ class Recognition(QDockWidget):
         self._detectionInProgress = False
         self._process_detection_queue()
 
+    def _batch_size_changed(self, value):
+        self._batchSize = value
+        self._process_detection_queue()
+
+    def _batch_wait_changed(self, value):
+        self._batchWait = value
+        self._process_detection_queue()
+
     def _run_detection_changed(self, item=None):
         self._runDetection = self._runDetectionCheckbox.isChecked()
         self._detectionModelsCombobox.setVisible(self._runDetection)
 
     def _load_model_func(self, modelName):
-        od = ObjectDetector(modelName)
+        od = createDetector(modelName)
+        # the first run allocates, it is not left to the first image the user waits for
+        od.warmUp()
         return od
 
     def _on_loading_result(self, objectDetector):
         if objectDetector != None:
             self._objectDetectors[self._currentModelName] = objectDetector
             self._currentObjectDetector = objectDetector
+            self._update_detection_cache()
             # check if label maps are equivalent
             path_to_labels = ProgramState.getInstance().labelMapPath
             detector_label_map = objectDetector.getLabelMap()
@@ -271,7 +527,7 @@ class Recognition(QDockWidget):
         if idx == self._detectionModelsCombobox.count() - 1:
             # add new model
             filename = QFileDialog.getOpenFileName(None, caption='Open model', directory='.',
-                                                   filter='TensorFlow model file (*.pb)')[0]
+                                                   filter='Detection model file (*.pb *.onnx *.caffemodel *.t7 *.net)')[0]
             if filename:
                 selectedModel = -1
                 models = []
@@ -301,6 +557,7 @@ class Recognition(QDockWidget):
             self._currentModelName = newModelName
             if self._currentModelName in self._objectDetectors:
                 self._currentObjectDetector = self._objectDetectors[self._currentModelName]
+                self._update_detection_cache()
                 return
 
             self._detectionModelsCombobox.setEnabled(False)
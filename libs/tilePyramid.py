@@ -0,0 +1,90 @@
+import math
+from collections import OrderedDict
+
+from PyQt5.QtGui import *
+from PyQt5.QtCore import *
+
+TILE_SIZE = 512
+# images with more pixels are painted from a tile pyramid instead of one pixmap
+TILED_IMAGE_MIN_PIXELS = 32 * 1024 * 1024
+MAX_CACHED_TILES = 128
+
+
+class TilePyramid:
+    """
+    Levels of an image, each half the size of the previous one, painted in tiles:
+    only the tiles intersecting the exposed area are drawn, from the level
+    whose resolution matches the zoom.
+
+    Build() runs on a worker thread (QImage only), the tile pixmaps are created
+    on the GUI thread when painted and kept in a bounded LRU cache.
+    """
+
+    def __init__(self, qimage: QImage, pixels=None, tile_size=TILE_SIZE):
+        """pixels is the buffer a QImage wrapping an array does not own, kept as long as the pyramid."""
+        self._pixels = pixels
+        self._levels = [qimage]
+        self._tile_size = tile_size
+        self._tiles = OrderedDict()
+
+    @property
+    def levelCount(self) -> int:
+        return len(self._levels)
+
+    def Build(self, is_cancelled=None, reduced: QImage = None) -> bool:
+        """reduced is the image decoded at a smaller scale (JPEG draft), taken as the level of its size."""
+        image = self._levels[0]
+        while max(image.width(), image.height()) > self._tile_size:
+            if is_cancelled and is_cancelled():
+                return False
+
+            width, height = (image.width() + 1) // 2, (image.height() + 1) // 2
+            if reduced is not None and reduced.size() == QSize(width, height):
+                # the coarser levels are scaled from the small image instead of the full one
+                image = reduced.copy()
+            else:
+                image = image.scaled(width, height, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+            self._levels.append(image)
+
+        return True
+
+    def Paint(self, painter: QPainter, image_rect: QRectF, image_size: QSize, device_scale: float):
+        """
+        Draw the part image_rect (in image coordinates) of the image; device_scale is
+        the number of device pixels per image pixel.
+        """
+        # the coarsest level still having at least one pixel per device pixel
+        level = int(math.floor(-math.log2(device_scale))) if 0 < device_scale < 1 else 0
+        level = min(level, len(self._levels) - 1)
+
+        image = self._levels[level]
+        fx = image_size.width() / image.width()
+        fy = image_size.height() / image.height()
+        size = self._tile_size
+
+        first_x = max(0, int(image_rect.left() / fx) // size)
+        first_y = max(0, int(image_rect.top() / fy) // size)
+        last_x = min((image.width() - 1) // size, int(image_rect.right() / fx) // size)
+        last_y = min((image.height() - 1) // size, int(image_rect.bottom() / fy) // size)
+        for ty in range(first_y, last_y + 1):
+            for tx in range(first_x, last_x + 1):
+                tile = self._tile(level, tx, ty)
+                target = QRectF(tx * size * fx, ty * size * fy, tile.width() * fx, tile.height() * fy)
+                painter.drawPixmap(target, tile, QRectF(tile.rect()))
+
+    # private methods
+    def _tile(self, level, tx, ty) -> QPixmap:
+        key = (level, tx, ty)
+        tile = self._tiles.get(key)
+        if tile is None:
+            size = self._tile_size
+            image = self._levels[level]
+            rect = QRect(tx * size, ty * size, size, size).intersected(image.rect())
+            tile = QPixmap.fromImage(image.copy(rect))
+            self._tiles[key] = tile
+            while len(self._tiles) > MAX_CACHED_TILES:
+                self._tiles.popitem(last=False)
+        else:
+            self._tiles.move_to_end(key)
+
+        return tile
@@ -19,7 +19,9 @@ import tensorflow as tf
 from PyQt5.QtWidgets import QMessageBox
 from google.protobuf import text_format
 
-sys.path.append("c:/venv/models/research")
+from libs.detectorBackend import addObjectDetectionPath
+
+addObjectDetectionPath()
 
 from google.protobuf import text_format
 from object_detection.protos import pipeline_pb2
@@ -1,7 +1,6 @@
-from math import sqrt
 from libs.ustr import ustr
+from libs.coreUtils import *
 import hashlib
-import re
 import sys
 
 try:
@@ -68,10 +67,6 @@ class struct(object):
         self.__dict__.update(kwargs)
 
 
-def distance(p):
-    return sqrt(p.x() * p.x() + p.y() * p.y())
-
-
 def fmtShortcut(text):
     mod, key = text.split('+', 1)
     return '<b>%s</b>+<b>%s</b>' % (mod, key)
@@ -91,13 +86,3 @@ def have_qstring():
 
 def util_qt_strlistclass():
     return QStringList if have_qstring() else list
-
-def natural_sort(list, key=lambda s:s):
-    """
-    Sort the list into natural alphanumeric order.
-    """
-    def get_alphanum_key_func(key):
-        convert = lambda text: int(text) if text.isdigit() else text
-        return lambda s: [convert(c) for c in re.split('([0-9]+)', key(s))]
-    sort_key = get_alphanum_key_func(key)
-    list.sort(key=sort_key)
@@ -1,6 +1,6 @@
 from PyQt5.QtCore import *
 
-import cv2
+from libs.videoService import *
 
 import traceback, sys
 
@@ -12,8 +12,7 @@ class VideoFile:
     def __init__(self, file_path=None):
         self._signals = VideoFileSignals()
 
-        self._new_frame_width = 800
-        self._video = None
+        self._new_frame_width = PROCESSING_FRAME_WIDTH
         self._frame_sizes = (0, 0)
         self._frame_rate = 0.0
         self._frame_count = 0
@@ -21,6 +20,10 @@ class VideoFile:
 
         self.filePath = file_path
 
+    @property
+    def signals(self) -> VideoFileSignals:
+        return self._signals
+
     @property
     def filePath(self) -> str:
         return self._file_path
@@ -28,24 +31,24 @@ class VideoFile:
     @filePath.setter
     def filePath(self, val):
         self._file_path = val
-        self._video = cv2.VideoCapture(self._file_path)
-        if not self._video.isOpened():
-            self._video = None
+        # probed once by the service, shared with the images source of the same video
+        info = VideoService.getInstance().Info(self._file_path)
+        if info is None:
             self._frame_sizes = (0, 0)
             self._frame_rate = 0.0
             self._frame_count = 0
             return
 
-        fame_width = int(cv2.VideoCapture.get(self._video, cv2.CAP_PROP_FRAME_WIDTH))
-        frame_height = int(cv2.VideoCapture.get(self._video, cv2.CAP_PROP_FRAME_HEIGHT))
-        self._frame_count = int(cv2.VideoCapture.get(self._video, cv2.CAP_PROP_FRAME_COUNT))
-
-        self._frame_rate = int(cv2.VideoCapture.get(self._video, cv2.CAP_PROP_FPS))
+        self._frame_count = info.frameCount
+        self._frame_rate = info.frameRate
         self._processing_rate = self._frame_rate
 
-        self._frame_sizes = (self._new_frame_width, int(frame_height / (fame_width / self._new_frame_width)))
+        self._frame_sizes = info.processingSizes(self._new_frame_width)
         self.signals.fileLoaded.emit(self._file_path)
 
+    def OpenDecoder(self) -> VideoDecoder:
+        return VideoService.getInstance().OpenDecoder(self._file_path)
+
     @property
     def frameSizes(self) -> list:
         return self._frame_sizes
@@ -13,68 +13,194 @@ from libs.threading import *
 from libs.ustr import ustr
 from libs.utils import *
 from libs.namedImage import *
-
-FRAME_NUM_DELIMITER = ' ## '
+from libs.videoIndex import *
+from libs.videoService import *
+from libs.frameCache import *
+from libs.frameSampler import *
+from libs.frameExtractor import *
+from libs.frameStore import *
+from libs.frameNames import *
+from libs.preLabeler import *
 
 class VideoImagesSource():
 
-    def __init__(self, videoname):
+    def __init__(self, videoname, forward_grab_window=DEFAULT_FORWARD_GRAB_WINDOW, frame_sampler=None,
+                 use_frame_store=False):
         self._video_name = videoname
-        self._video = None
-        self._names_list = []
-
-        self._processing_frame_rate = 30
-        self._processing_frame_width = 800
-        self._frame_width = 0
-        self._frame_height = 0
-        self._frame_rate = 0
+        self._decoder = None
+        self._index = None
+        self._names_list = FrameNames()
+
+        self._forward_grab_window = forward_grab_window
+        self._cancel_preparation = False
+
+        # when set, frames are picked by content change instead of every _processing_frame_rate-th one
+        self._frame_sampler = frame_sampler
+        self._motion_signal = None
+
+        # when set, sampled frames are served from the on-disk store instead of the decoder
+        self._use_frame_store = use_frame_store
+        self._frame_store = None
+
+        self._processing_frame_rate = PROCESSING_FRAME_STEP
+        self._processing_frame_width = PROCESSING_FRAME_WIDTH
         self._frame_count = 0
         self._processing_frame_sizes = None
 
 
+    @property
+    def forwardGrabWindow(self) -> int:
+        return self._forward_grab_window
+
+    @forwardGrabWindow.setter
+    def forwardGrabWindow(self, val):
+        self._forward_grab_window = max(0, int(val))
+        if self._decoder is not None:
+            self._decoder.forwardGrabWindow = self._forward_grab_window
+
     def GetStorageName(self):
         return self._video_name
 
     def GetNames(self):
-        self._names_list = []
-        if os.path.exists(self._video_name) and os.path.isfile(self._video_name):
-            self._video = cv2.VideoCapture(self._video_name)
-            if self._video.isOpened():
-                self._frame_count = int(cv2.VideoCapture.get(self._video, cv2.CAP_PROP_FRAME_COUNT))
-                self._frame_width = int(cv2.VideoCapture.get(self._video, cv2.CAP_PROP_FRAME_WIDTH))
-                self._frame_height = int(cv2.VideoCapture.get(self._video, cv2.CAP_PROP_FRAME_HEIGHT))
-                self._frame_rate = int(cv2.VideoCapture.get(self._video, cv2.CAP_PROP_FPS))
-                self._processing_frame_sizes = (self._processing_frame_width, int(self._frame_height / (self._frame_width / self._processing_frame_width)))
-
-                for framenum in range(0, self._frame_count, self._processing_frame_rate):
-                    self._names_list.append('%08d' % framenum)
+        self._names_list = FrameNames()
+        info = VideoService.getInstance().Info(self._video_name)
+        if info is not None:
+            self._frame_count = info.frameCount
+            self._processing_frame_sizes = info.processingSizes(self._processing_frame_width)
+
+            if self._index is None:
+                self._index = VideoIndex.Load(self._video_name)
+
+            if self._index is not None:
+                # the container frame count is an estimate, the index knows the real one
+                self._frame_count = self._index.frameCount
+
+            if self._decoder is None:
+                self._decoder = VideoService.getInstance().OpenDecoder(self._video_name, self._index,
+                                                                       self._forward_grab_window)
+            else:
+                self._decoder.index = self._index
+
+            if self._frame_sampler is not None and self._motion_signal is None:
+                self._motion_signal = FrameSampler.LoadSignal(self._video_name)
+
+            self._names_list = FrameNames(self._sampled_frames(self._frame_count))
+
+            if self._use_frame_store and self._frame_store is None:
+                self._frame_store = FrameStore.Open(self._video_name, self._processing_frame_sizes)
 
         return self._names_list
 
+    def HasNewNames(self) -> bool:
+        return False
+
+    def SetChangedCallback(self, callback):
+        pass
+
+    def NeedsPreparation(self) -> bool:
+        if self._decoder is None or not self._decoder.isOpened():
+            return False
+
+        return self._index is None or (self._frame_sampler is not None and self._motion_signal is None) or \
+               (self._use_frame_store and not self._frame_store_covers_names())
+
+    def Prepare(self, progress_callback=None) -> bool:
+        """
+        Build the seek index of the video and, for adaptive sampling, the content change signal.
+        Runs on a worker thread, returns True when the names returned by GetNames have to be
+        requested again.
+        """
+        self._cancel_preparation = False
+        is_cancelled = lambda: self._cancel_preparation
+        names_changed = False
+
+        if self._index is None:
+            index = VideoIndex.Build(self._video_name, progress_callback, is_cancelled)
+            if index is None:
+                return False
+
+            index.Save(self._video_name)
+            self._index = index
+            names_changed = index.frameCount != self._frame_count
+
+        if self._frame_sampler is not None and self._motion_signal is None:
+            frame_count = self._index.frameCount
+            self._motion_signal = FrameSampler.BuildSignal(self._video_name, frame_count,
+                                                           progress_callback=progress_callback,
+                                                           is_cancelled=is_cancelled)
+            names_changed = names_changed or self._motion_signal is not None
+
+        if self._use_frame_store and (names_changed or not self._frame_store_covers_names()):
+            # store the frames GetNames is going to return
+            frame_names = FrameNames(self._sampled_frames(self._index.frameCount))
+            old_store, self._frame_store = self._frame_store, None
+            self._frame_store = FrameStore.Build(self._video_name, list(frame_names),
+                                                 self._processing_frame_sizes, progress_callback=progress_callback,
+                                                 is_cancelled=is_cancelled, replacing=old_store)
+
+        return names_changed
+
+    def CancelPreparation(self):
+        self._cancel_preparation = True
+
+    def GetImagePath(self, filename):
+        return frameImageName(self._video_name, filename)
+
+    def GetSavePath(self, filename):
+        """Image file of the frame, written when the frame is saved."""
+        return frameSavePath(self._video_name, filename)
+
     def GetImage(self, filename):
         framenum = int(filename)
-        if self._video and self._video.isOpened():
-            cv2.VideoCapture.set(self._video, cv2.CAP_PROP_POS_FRAMES, framenum)
-            res, image_np = self._video.read()
+        frame_store = self._frame_store
+        if frame_store is not None and framenum in frame_store:
+            img = NamedImage(filename)
+            res = img.FromArray(frame_store.Get(framenum), self.GetImagePath(filename),
+                                frameSavePath(self._video_name, filename), is_bgr=False)
+            return res, img
+
+        cache_key = (self._video_name, filename)
+        img = FrameCache.getInstance().Get(cache_key)
+        if img is not None:
+            return True, img
+
+        if self._decoder is not None:
+            res, image_np = self._decoder.Read(framenum)
             if res:
                 img = NamedImage(filename)
-                fpath, fname = os.path.split(self._video_name)
-                fname, fext = os.path.splitext(fname)
-                imgname = str.format('{0}/{1}__{2}{3}{4}', fpath, fname, fext[1:], FRAME_NUM_DELIMITER, filename)
-                savepath = str.format('{0}/{1}__{2}/{1}__{3}.jpg', fpath, fname, fext[1:], filename)
+                imgname = self.GetImagePath(filename)
+                savepath = frameSavePath(self._video_name, filename)
                 res = img.FromArray(cv2.resize(image_np, self._processing_frame_sizes), imgname, savepath)
+                if res:
+                    FrameCache.getInstance().Put(cache_key, img)
+
                 return res, img
 
         return False, None
 
+    def CreateFrameExtractor(self, names=None) -> FrameExtractor:
+        return FrameExtractor(self._video_name, self._names_list if names is None else names,
+                              self._processing_frame_sizes)
+
+    def CreatePreLabeler(self, detector, save_dir, **kwargs) -> PreLabeler:
+        return PreLabeler(self._video_name, self._names_list, self._processing_frame_sizes, detector, save_dir,
+                          **kwargs)
+
     def GetIndex(self, filename):
         basename = filename
         pos = filename.rfind(FRAME_NUM_DELIMITER)
         if pos >= 0:
             basename = filename[pos + len(FRAME_NUM_DELIMITER):]
 
-        res = 0
-        if basename in self._names_list:
-            res = self._names_list.index(basename)
+        return max(0, self._names_list.position(basename))
+
+    # private methods
+    def _sampled_frames(self, frame_count):
+        if self._frame_sampler is not None and self._motion_signal is not None:
+            return self._frame_sampler.SelectFrames(self._motion_signal[:frame_count])
+
+        return range(0, frame_count, self._processing_frame_rate)
 
-        return res
+    def _frame_store_covers_names(self) -> bool:
+        frame_store = self._frame_store
+        return frame_store is not None and frame_store.Covers(self._names_list.framenums)
@@ -0,0 +1,148 @@
+import numpy as np
+
+import cv2
+
+from libs.cacheStorage import *
+
+VIDEO_INDEX_SUFFIX = '.index.pkl'
+
+# seek anchor spacing (in seconds of video) used when the backend cannot report key frames
+DEFAULT_ANCHOR_INTERVAL = 1.0
+
+
+def seekCapture(video, index, framenum: int) -> int:
+    """
+    Position the capture so that the last grabbed frame is not after framenum, through the
+    key frames of index (a VideoIndex or None). Returns the number of the last grabbed frame.
+    """
+    if index is not None and index.isUsable() and framenum < index.frameCount:
+        keyframe = index.keyframeBefore(framenum)
+        while keyframe >= 0:
+            cv2.VideoCapture.set(video, cv2.CAP_PROP_POS_MSEC, index.timestamp(keyframe))
+            if not video.grab():
+                break
+
+            landed = index.frameAt(cv2.VideoCapture.get(video, cv2.CAP_PROP_POS_MSEC))
+            if 0 <= landed <= framenum:
+                return landed
+
+            # the container did not land where expected, start from an earlier key frame
+            keyframe = index.keyframeBefore(keyframe - 1)
+
+    cv2.VideoCapture.set(video, cv2.CAP_PROP_POS_FRAMES, framenum)
+    return framenum - 1
+
+
+class VideoIndex:
+    """
+    Presentation timestamps of all frames of a video plus the key frames a seek can start from.
+
+    The index makes seeking frame-accurate: the decoder is positioned at the timestamp
+    of the nearest preceding key frame, the frame it actually landed on is looked up
+    by its timestamp and the remaining frames are decoded forward.
+    """
+
+    def __init__(self, timestamps, keyframes):
+        self._timestamps = np.asarray(timestamps, dtype=np.float64)
+        self._keyframes = np.unique(np.asarray(keyframes, dtype=np.int64))
+        if len(self._keyframes) == 0 or self._keyframes[0] != 0:
+            self._keyframes = np.insert(self._keyframes, 0, 0)
+
+        steps = np.diff(self._timestamps)
+        self._monotonic = len(self._timestamps) > 0 and bool(np.all(steps > 0))
+        self._tolerance = float(np.median(steps)) / 2 if len(steps) else 0.0
+
+    @property
+    def frameCount(self) -> int:
+        return len(self._timestamps)
+
+    @property
+    def keyframes(self):
+        return self._keyframes
+
+    def isUsable(self) -> bool:
+        return self._monotonic
+
+    def timestamp(self, framenum: int) -> float:
+        return float(self._timestamps[framenum])
+
+    def keyframeBefore(self, framenum: int) -> int:
+        """Number of the last key frame not after framenum, -1 if there is none."""
+        if framenum < 0:
+            return -1
+
+        pos = int(np.searchsorted(self._keyframes, framenum, side='right')) - 1
+        return int(self._keyframes[pos]) if pos >= 0 else -1
+
+    def frameAt(self, timestamp: float) -> int:
+        """Number of the frame presented at timestamp (msec), -1 if there is no such frame."""
+        pos = int(np.searchsorted(self._timestamps, timestamp))
+        for candidate in (pos - 1, pos):
+            if 0 <= candidate < len(self._timestamps) and \
+                    abs(self._timestamps[candidate] - timestamp) <= self._tolerance:
+                return candidate
+
+        return -1
+
+    @staticmethod
+    def Load(video_path: str):
+        data = loadCached(video_path, VIDEO_INDEX_SUFFIX, fileFingerprint(video_path))
+        if data is None:
+            return None
+
+        return VideoIndex(data['timestamps'], data['keyframes'])
+
+    def Save(self, video_path: str) -> bool:
+        data = {'timestamps': self._timestamps, 'keyframes': self._keyframes}
+        return saveCached(video_path, VIDEO_INDEX_SUFFIX, data, fileFingerprint(video_path))
+
+    @staticmethod
+    def Build(video_path: str, progress_callback=None, is_cancelled=None):
+        """
+        Read the whole video once and collect the frame timestamps and key frames.
+
+        Where the FFmpeg backend supports raw packet reading the pass does not decode
+        anything and key frames come from the packet flags. Otherwise every frame is
+        decoded and regularly spaced frames are used as seek anchors.
+        """
+        video = cv2.VideoCapture(video_path)
+        if not video.isOpened():
+            return None
+
+        frame_count = int(cv2.VideoCapture.get(video, cv2.CAP_PROP_FRAME_COUNT))
+        frame_rate = cv2.VideoCapture.get(video, cv2.CAP_PROP_FPS)
+
+        raw_mode = hasattr(cv2, 'CAP_PROP_LRF_HAS_KEY_FRAME') and \
+                   cv2.VideoCapture.set(video, cv2.CAP_PROP_FORMAT, -1)
+
+        timestamps = []
+        keyflags = []
+        while video.grab():
+            timestamps.append(cv2.VideoCapture.get(video, cv2.CAP_PROP_POS_MSEC))
+            if raw_mode:
+                keyflags.append(cv2.VideoCapture.get(video, cv2.CAP_PROP_LRF_HAS_KEY_FRAME) != 0)
+
+            num = len(timestamps)
+            if progress_callback and num % 1000 == 0:
+                progress_callback.emit(int(100 * num / max(frame_count, num)), 'Indexing video')
+
+            if is_cancelled and is_cancelled():
+                video.release()
+                return None
+
+        video.release()
+
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        if raw_mode:
+            # packets come in decoding order, sort them into presentation order
+            order = np.argsort(timestamps, kind='stable')
+            timestamps = timestamps[order]
+            keyframes = np.nonzero(np.asarray(keyflags, dtype=bool)[order])[0]
+        else:
+            stride = max(1, int(round(frame_rate * DEFAULT_ANCHOR_INTERVAL)))
+            keyframes = np.arange(0, len(timestamps), stride)
+
+        if progress_callback:
+            progress_callback.emit(100, 'Indexing video')
+
+        return VideoIndex(timestamps, keyframes)
@@ -0,0 +1,243 @@
+import os
+import threading
+import weakref
+
+import cv2
+
+from libs.cacheStorage import *
+from libs.videoIndex import seekCapture
+
+VIDEO_INFO_SUFFIX = '.info.pkl'
+PROCESSING_FRAME_WIDTH = 800
+# every PROCESSING_FRAME_STEP-th frame is sampled unless frames are picked by content change
+PROCESSING_FRAME_STEP = 30
+
+# target frames ahead of the decoder by no more than this are reached by
+# grabbing sequentially instead of seeking
+DEFAULT_FORWARD_GRAB_WINDOW = 90
+
+
+class VideoInfo:
+    """Properties of a video as reported by the container."""
+
+    def __init__(self, path: str, width: int, height: int, frame_rate: int, frame_count: int):
+        self._path = path
+        self._width = width
+        self._height = height
+        self._frame_rate = frame_rate
+        self._frame_count = frame_count
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def width(self) -> int:
+        return self._width
+
+    @property
+    def height(self) -> int:
+        return self._height
+
+    @property
+    def frameRate(self) -> int:
+        return self._frame_rate
+
+    @property
+    def frameCount(self) -> int:
+        return self._frame_count
+
+    def processingSizes(self, width=PROCESSING_FRAME_WIDTH) -> tuple:
+        """Frame sizes with the given width and the aspect ratio of the video."""
+        return width, int(self._height / (self._width / width))
+
+
+class VideoDecoder:
+    """
+    Decoder handle of one video. Frames ahead of the last decoded one are reached by
+    grabbing forward, other frames by seeking with the video index when one is set.
+
+    Read() may be called from several threads, the calls are serialized.
+    """
+
+    def __init__(self, path: str, capture=None, index=None, forward_grab_window=DEFAULT_FORWARD_GRAB_WINDOW):
+        self._path = path
+        self._video = capture if capture is not None else cv2.VideoCapture(path)
+        self._index = index
+        self._forward_grab_window = forward_grab_window
+        self._lock = threading.Lock()
+
+        # number of the last grabbed frame, None when unknown
+        self._grabbed_pos = -1 if self._video.isOpened() else None
+
+    @property
+    def index(self):
+        return self._index
+
+    @index.setter
+    def index(self, val):
+        with self._lock:
+            self._index = val
+
+    @property
+    def forwardGrabWindow(self) -> int:
+        return self._forward_grab_window
+
+    @forwardGrabWindow.setter
+    def forwardGrabWindow(self, val):
+        self._forward_grab_window = max(0, int(val))
+
+    def isOpened(self) -> bool:
+        return self._video is not None and self._video.isOpened()
+
+    def Read(self, framenum: int):
+        """Return (res, BGR frame) of the frame."""
+        with self._lock:
+            if not self.isOpened():
+                return False, None
+
+            return self._read_frame(framenum)
+
+    def Release(self):
+        with self._lock:
+            if self._video is not None:
+                self._video.release()
+                self._video = None
+                self._grabbed_pos = None
+
+    # private methods
+    def _read_frame(self, framenum):
+        if self._grabbed_pos is None or not 0 <= framenum - self._grabbed_pos <= self._forward_grab_window:
+            self._seek(framenum)
+
+        # skip the frames in between without retrieving and converting them
+        while self._grabbed_pos < framenum:
+            if not self._video.grab():
+                self._grabbed_pos = None
+                return False, None
+
+            self._grabbed_pos += 1
+
+        return self._video.retrieve()
+
+    def _seek(self, framenum):
+        self._grabbed_pos = seekCapture(self._video, self._index, framenum)
+
+
+class VideoService:
+    """
+    The single place a video is probed. The properties of a video are kept in memory
+    and in the cache folder, so a video is opened only when its frames are decoded.
+    The capture opened for probing is handed to the first decoder of the video.
+    """
+    __instance = None
+
+    @staticmethod
+    def getInstance():
+        """ Static access method. """
+        if VideoService.__instance == None:
+            VideoService()
+
+        return VideoService.__instance
+
+    def __init__(self):
+        """ Virtually private constructor. """
+        if VideoService.__instance != None:
+            raise Exception("This class is a singleton!")
+        else:
+            VideoService.__instance = self
+
+        # abspath -> ((size, mtime), VideoInfo)
+        self._infos = {}
+        # abspath -> capture left open by probing
+        self._idle_captures = {}
+        # the GUI opens a decoder right after probing, headless tools decode with their own captures
+        self._keep_probe_captures = True
+        # abspath -> decoders opened for the video
+        self._decoders = {}
+        self._lock = threading.Lock()
+
+    @property
+    def keepProbeCaptures(self) -> bool:
+        return self._keep_probe_captures
+
+    @keepProbeCaptures.setter
+    def keepProbeCaptures(self, val):
+        self._keep_probe_captures = bool(val)
+
+    def Info(self, path: str):
+        """VideoInfo of the video or None if it cannot be opened."""
+        if not path or not os.path.isfile(path):
+            return None
+
+        key = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            entry = self._infos.get(key)
+            if entry is not None and entry[0] == (stat.st_size, stat.st_mtime):
+                return entry[1]
+
+            info = self._load_info(path)
+            if info is None:
+                info = self._probe(path, key)
+
+            if info is not None:
+                self._infos[key] = ((stat.st_size, stat.st_mtime), info)
+
+            return info
+
+    def OpenDecoder(self, path: str, index=None, forward_grab_window=DEFAULT_FORWARD_GRAB_WINDOW) -> VideoDecoder:
+        key = os.path.abspath(path)
+        with self._lock:
+            capture = self._idle_captures.pop(key, None)
+            decoder = VideoDecoder(path, capture, index, forward_grab_window)
+            self._decoders.setdefault(key, weakref.WeakSet()).add(decoder)
+
+        return decoder
+
+    def Release(self, path: str):
+        """Close the decoders and the idle capture of the video, e.g. when another video is opened."""
+        key = os.path.abspath(path)
+        with self._lock:
+            capture = self._idle_captures.pop(key, None)
+            decoders = list(self._decoders.pop(key, ()))
+
+        if capture is not None:
+            capture.release()
+
+        for decoder in decoders:
+            decoder.Release()
+
+    # private methods
+    def _load_info(self, path):
+        data = loadCached(path, VIDEO_INFO_SUFFIX, fileFingerprint(path))
+        if data is None:
+            return None
+
+        return VideoInfo(path, data['width'], data['height'], data['frame_rate'], data['frame_count'])
+
+    def _probe(self, path, key):
+        video = cv2.VideoCapture(path)
+        if not video.isOpened():
+            return None
+
+        width = int(cv2.VideoCapture.get(video, cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cv2.VideoCapture.get(video, cv2.CAP_PROP_FRAME_HEIGHT))
+        frame_rate = int(cv2.VideoCapture.get(video, cv2.CAP_PROP_FPS))
+        frame_count = int(cv2.VideoCapture.get(video, cv2.CAP_PROP_FRAME_COUNT))
+        if width <= 0 or height <= 0:
+            video.release()
+            return None
+
+        previous = self._idle_captures.pop(key, None)
+        if previous is not None:
+            previous.release()
+
+        if self._keep_probe_captures:
+            self._idle_captures[key] = video
+        else:
+            video.release()
+
+        data = {'width': width, 'height': height, 'frame_rate': frame_rate, 'frame_count': frame_count}
+        saveCached(path, VIDEO_INFO_SUFFIX, data, fileFingerprint(path))
+        return VideoInfo(path, width, height, frame_rate, frame_count)
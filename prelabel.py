@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Pre-label videos without the GUI: every sampled frame of each video is written as
+a JPEG with a Pascal VOC annotation of the detected objects, the files LabelVideo
+opens for the frame. Videos are processed in parallel by a pool of processes, each
+with its own detector.
+
+Frames having an annotation already are skipped, an interrupted run continues where
+it stopped when started again.
+
+Usage: python prelabel.py --graph frozen_inference_graph.pb --labels label_map.pbtxt VIDEO_OR_FOLDER [...]
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import sys
+import time
+
+from libs.programState import ProgramState
+from libs.detectorBackend import *
+from libs.videoService import *
+from libs.videoIndex import VideoIndex
+from libs.frameSampler import FrameSampler
+from libs.frameNames import FrameNames
+from libs.frameExtractor import frameSavePath
+from libs.preLabeler import *
+
+VIDEO_EXTENSIONS = ('.mov', '.avi', '.mp4')
+# every process loads its own model, a few of them are enough to keep the CPU busy
+DEFAULT_PROCESSES = 2
+
+# detector of the worker process
+_detector = None
+
+
+def find_videos(inputs) -> list:
+    """Videos given directly and the ones found in the given folders and their subfolders."""
+    videos = []
+    for path in inputs:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                videos.extend(os.path.join(root, name) for name in sorted(files)
+                              if os.path.splitext(name)[1].lower() in VIDEO_EXTENSIONS)
+        elif os.path.isfile(path):
+            videos.append(path)
+        else:
+            logging.warning('%s does not exist', path)
+
+    return videos
+
+
+def sampled_frames(video_path: str, adaptive: bool):
+    """Frame numbers LabelVideo shows for the video, None when it cannot be read."""
+    info = VideoService.getInstance().Info(video_path)
+    if info is None:
+        return None, None
+
+    index = VideoIndex.Load(video_path)
+    frame_count = index.frameCount if index is not None else info.frameCount
+    if adaptive:
+        signal = FrameSampler.LoadSignal(video_path)
+        if signal is None:
+            signal = FrameSampler.BuildSignal(video_path, frame_count, threads=1)
+
+        if signal is not None:
+            return FrameSampler().SelectFrames(signal[:frame_count]), info
+
+    return range(0, frame_count, PROCESSING_FRAME_STEP), info
+
+
+def _init_worker(graph_path, label_map_path, backend):
+    global _detector
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(processName)s %(message)s')
+    # the detector takes the label map of the program state when the graph folder has none
+    ProgramState.getInstance().labelMapPath = label_map_path
+    # the pre-labeler decodes with its own capture, a probing one would stay open until the process ends
+    VideoService.getInstance().keepProbeCaptures = False
+    _detector = createDetector(graph_path, backend)
+
+
+def _prelabel_video(args):
+    video_path, options = args
+    try:
+        frames, info = sampled_frames(video_path, options['adaptive'])
+        if frames is None:
+            return video_path, None
+
+        save_dir = options['save_dir'] or os.path.dirname(frameSavePath(video_path, ''))
+        prelabeler = PreLabeler(video_path, FrameNames(frames), info.processingSizes(), _detector, save_dir,
+                                class_thresholds=options['class_thresholds'],
+                                default_threshold=options['threshold'],
+                                batch_size=options['batch_size'],
+                                overwrite_prelabels=options['overwrite_prelabels'])
+
+        start = time.time()
+        labelled, skipped, frames_per_second = prelabeler.Run()
+        return video_path, (labelled, skipped, frames_per_second, time.time() - start)
+    except Exception:
+        logging.exception('%s failed', video_path)
+        return video_path, None
+    finally:
+        VideoService.getInstance().Release(video_path)
+
+
+def _class_threshold(text):
+    label, sep, score = text.rpartition('=')
+    if not sep or not label:
+        raise argparse.ArgumentTypeError('expected LABEL=SCORE, got %s' % text)
+
+    return label, float(score)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='Write Pascal VOC annotations of the detected objects '
+                                                 'for the sampled frames of videos.')
+    parser.add_argument('inputs', nargs='+', help='video files or folders with videos')
+    parser.add_argument('--graph', required=True,
+                        help='model: frozen inference graph (.pb), ONNX/Caffe model for OpenCV or "fake"')
+    parser.add_argument('--backend', choices=(BACKEND_TENSORFLOW, BACKEND_OPENCV, BACKEND_FAKE),
+                        help='detector backend, chosen by the model file by default')
+    parser.add_argument('--labels', required=True, help='label map (.pbtxt)')
+    parser.add_argument('--save-dir', help='folder of the annotations, by default the frame folder of each video')
+    parser.add_argument('--processes', type=int, default=DEFAULT_PROCESSES, help='videos processed in parallel')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_PRELABEL_BATCH_SIZE,
+                        help='frames per detection run')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_PRELABEL_THRESHOLD,
+                        help='minimal score of the written objects')
+    parser.add_argument('--class-threshold', type=_class_threshold, action='append', default=[],
+                        metavar='LABEL=SCORE', help='minimal score of the objects of one class')
+    parser.add_argument('--adaptive', action='store_true', help='sample frames by content change')
+    parser.add_argument('--overwrite-prelabels', action='store_true',
+                        help='replace annotations written by an earlier pre-labelling, '
+                             'the ones saved or verified by the user are always kept')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(processName)s %(message)s')
+
+    videos = find_videos(args.inputs)
+    if not videos:
+        logging.error('no videos found')
+        return 1
+
+    options = {'save_dir': args.save_dir,
+               'threshold': args.threshold,
+               'class_thresholds': dict(args.class_threshold),
+               'batch_size': args.batch_size,
+               'adaptive': args.adaptive,
+               'overwrite_prelabels': args.overwrite_prelabels}
+
+    failed = 0
+    total_labelled = 0
+    start = time.time()
+    pool = multiprocessing.get_context('spawn').Pool(max(1, min(args.processes, len(videos))), _init_worker,
+                                                     (args.graph, args.labels, args.backend))
+    try:
+        for video_path, result in pool.imap_unordered(_prelabel_video, [(video, options) for video in videos]):
+            if result is None:
+                failed += 1
+                logging.error('%s: cannot be pre-labelled', video_path)
+                continue
+
+            labelled, skipped, frames_per_second, seconds = result
+            total_labelled += labelled
+            logging.info('%s: %d frames labelled, %d already labelled, %.1f frames/s, %.0f s',
+                         video_path, labelled, skipped, frames_per_second, seconds)
+
+        pool.close()
+    except KeyboardInterrupt:
+        logging.warning('interrupted, run again to continue')
+        pool.terminate()
+        failed = len(videos)
+    finally:
+        pool.join()
+
+    seconds = time.time() - start
+    logging.info('%d videos, %d frames labelled in %.0f s (%.1f frames/s)', len(videos), total_labelled, seconds,
+                 total_labelled / max(seconds, 1e-6))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,59 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np
+from libs.boxInterpolator import interpolateBoxes, matchKeyframeShapes, CubicSpline
+
+
+class TestInterpolateBoxes(unittest.TestCase):
+
+    def test_linear(self):
+        boxes = interpolateBoxes([0, 10], [[(0, 0, 10, 10)], [(20, 10, 40, 30)]], [0, 5, 10])
+        self.assertEqual(boxes.shape, (3, 1, 4))
+        np.testing.assert_allclose(boxes[:, 0], [(0, 0, 10, 10), (10, 5, 25, 20), (20, 10, 40, 30)])
+
+    def test_piecewise(self):
+        key_boxes = [[(0, 0, 10, 10)], [(10, 0, 20, 10)], [(10, 10, 20, 20)]]
+        boxes = interpolateBoxes([0, 10, 20], key_boxes, [5, 15])
+        np.testing.assert_allclose(boxes[:, 0], [(5, 0, 15, 10), (10, 5, 20, 15)])
+
+    @unittest.skipIf(CubicSpline is None, 'scipy is not installed')
+    def test_spline_passes_through_keyframes(self):
+        key_boxes = [[(0, 0, 10, 10)], [(10, 0, 20, 10)], [(10, 10, 20, 20)]]
+        boxes = interpolateBoxes([0, 10, 20], key_boxes, [0, 10, 20], spline=True)
+        np.testing.assert_allclose(boxes, key_boxes, atol=1e-9)
+
+
+class TestMatchKeyframeShapes(unittest.TestCase):
+
+    def test_nearest_of_the_same_label(self):
+        shapes_a = [('car', (0, 0, 10, 10)), ('car', (100, 0, 110, 10))]
+        shapes_b = [('car', (98, 0, 108, 10)), ('car', (3, 0, 13, 10))]
+        self.assertEqual(sorted(matchKeyframeShapes(shapes_a, shapes_b)), [(0, 1), (1, 0)])
+
+    def test_different_labels(self):
+        self.assertEqual(matchKeyframeShapes([('car', (0, 0, 10, 10))], [('person', (0, 0, 10, 10))]), [])
+
+    def test_single_object_is_matched_at_any_distance(self):
+        self.assertEqual(matchKeyframeShapes([('car', (0, 0, 100, 60))], [('car', (300, 0, 400, 60))], 300),
+                         [(0, 0)])
+
+    def test_far_boxes_of_a_repeated_label(self):
+        shapes_a = [('car', (0, 0, 10, 10)), ('car', (0, 50, 10, 60))]
+        shapes_b = [('car', (100, 0, 110, 10)), ('car', (10, 50, 20, 60))]
+        self.assertEqual(matchKeyframeShapes(shapes_a, shapes_b, 30), [(1, 1)])
+        # a longer gap allows a longer move
+        self.assertEqual(sorted(matchKeyframeShapes(shapes_a, shapes_b, 300)), [(0, 0), (1, 1)])
+
+    def test_unmatched_objects(self):
+        shapes_a = [('car', (0, 0, 10, 10))]
+        shapes_b = [('car', (200, 0, 210, 10)), ('car', (1, 0, 11, 10))]
+        self.assertEqual(matchKeyframeShapes(shapes_a, shapes_b, 30), [(0, 1)])
+        self.assertEqual(matchKeyframeShapes(shapes_a, []), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
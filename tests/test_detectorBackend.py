@@ -0,0 +1,94 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np
+
+from libs.labelMap import parseLabelMap, LabelMap
+from libs.namedImage import NamedImage
+from libs.detectorBackend import FakeDetector
+
+LABEL_MAP = """
+item {
+  id: 1
+  name: 'vehicle'
+  display_name: "car"
+}
+item {
+    name: "person"
+    id: 2
+}
+item { id: 3 name: 'dog' }
+"""
+
+
+def write_label_map(folder):
+    path = os.path.join(folder, 'label_map.pbtxt')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(LABEL_MAP)
+
+    return path
+
+
+class TestParseLabelMap(unittest.TestCase):
+
+    def test_items(self):
+        with tempfile.TemporaryDirectory() as folder:
+            category_index = parseLabelMap(write_label_map(folder))
+
+        self.assertEqual(category_index, {1: {'id': 1, 'name': 'car'},
+                                          2: {'id': 2, 'name': 'person'},
+                                          3: {'id': 3, 'name': 'dog'}})
+
+    def test_label_map(self):
+        with tempfile.TemporaryDirectory() as folder:
+            label_map = LabelMap(write_label_map(folder))
+
+        self.assertEqual(label_map.getClasses(), [1, 2, 3])
+        self.assertEqual(label_map.getLabel(2), 'person')
+        self.assertEqual(label_map.getClass('dog'), 3)
+
+    def test_missing_file(self):
+        self.assertEqual(LabelMap(None).getLabels(), [])
+
+
+class TestFakeDetector(unittest.TestCase):
+
+    def setUp(self):
+        self._folder = tempfile.TemporaryDirectory()
+        self._detector = FakeDetector(objects_per_image=4, label_map_path=write_label_map(self._folder.name))
+
+    def tearDown(self):
+        self._folder.cleanup()
+
+    def _image(self, path, width=800, height=450):
+        image = NamedImage(path)
+        image.FromArray(np.zeros((height, width, 3), dtype=np.uint8), path, None, is_bgr=False)
+        return image
+
+    def _boxes(self, dshapes):
+        return [(dshape.label, tuple(dshape.extent), float(dshape.score)) for dshape in dshapes]
+
+    def test_deterministic(self):
+        first = self._boxes(self._detector.detect(self._image('video.mp4 ## 00000030')))
+        again = self._boxes(self._detector.detectBatch([self._image('other'),
+                                                        self._image('video.mp4 ## 00000030')])[1])
+        self.assertEqual(first, again)
+        self.assertEqual(len(first), 4)
+        self.assertNotEqual(first, self._boxes(self._detector.detect(self._image('video.mp4 ## 00000060'))))
+
+    def test_boxes_inside_the_image(self):
+        for label, (xmin, ymin, xmax, ymax), score in self._boxes(self._detector.detect(self._image('a', 640, 480))):
+            self.assertIn(label, ('car', 'person', 'dog'))
+            self.assertTrue(0 <= xmin < xmax <= 640 and 0 <= ymin < ymax <= 480)
+
+    def test_best_first(self):
+        scores = [score for label, extent, score in self._boxes(self._detector.detect(self._image('a')))]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
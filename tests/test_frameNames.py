@@ -0,0 +1,38 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from libs.frameNames import FrameNames
+
+
+class TestFrameNames(unittest.TestCase):
+
+    def test_range(self):
+        names = FrameNames(range(0, 100, 30))
+        self.assertEqual(len(names), 4)
+        self.assertEqual(list(names), ['00000000', '00000030', '00000060', '00000090'])
+        self.assertEqual(names[-1], '00000090')
+        self.assertEqual(names[1:3], ['00000030', '00000060'])
+
+    def test_position(self):
+        for framenums in (range(0, 100, 30), [0, 30, 60, 90]):
+            names = FrameNames(framenums)
+            self.assertEqual(names.position('00000060'), 2)
+            self.assertEqual(names.index('00000090'), 3)
+            self.assertIn('00000030', names)
+            self.assertNotIn('00000031', names)
+            self.assertEqual(names.position('not a frame'), -1)
+            self.assertEqual(names.position(None), -1)
+            with self.assertRaises(ValueError):
+                names.index('00000045')
+
+    def test_empty(self):
+        names = FrameNames()
+        self.assertEqual(len(names), 0)
+        self.assertEqual(list(names), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
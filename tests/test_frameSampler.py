@@ -0,0 +1,32 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np
+from libs.frameSampler import FrameSampler
+
+
+class TestSelectFrames(unittest.TestCase):
+
+    def test_static_video(self):
+        sampler = FrameSampler(threshold=0.1, min_stride=10, max_stride=300)
+        self.assertEqual(sampler.SelectFrames(np.zeros(1000)), [0, 300, 600, 900])
+
+    def test_changing_video(self):
+        sampler = FrameSampler(threshold=0.1, min_stride=10, max_stride=300)
+        self.assertEqual(sampler.SelectFrames(np.ones(50)), [0, 10, 20, 30, 40])
+
+    def test_cut(self):
+        signal = np.zeros(200)
+        signal[75] = 0.5
+        sampler = FrameSampler(threshold=0.1, min_stride=10, max_stride=300)
+        self.assertEqual(sampler.SelectFrames(signal), [0, 75])
+
+    def test_empty(self):
+        self.assertEqual(FrameSampler().SelectFrames(np.zeros(0)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
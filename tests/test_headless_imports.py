@@ -0,0 +1,20 @@
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+class TestHeadlessImports(unittest.TestCase):
+
+    def test_prelabel_does_not_import_widgets(self):
+        # a fresh interpreter, the other tests may have imported the widgets already
+        code = 'import sys, prelabel; sys.exit("prelabel imports PyQt5.QtWidgets" if "PyQt5.QtWidgets" in sys.modules else 0)'
+        result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE, universal_newlines=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+
+if __name__ == '__main__':
+    unittest.main()
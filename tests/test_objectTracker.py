@@ -0,0 +1,119 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np
+import libs.objectTracker as objectTracker
+from libs.objectTracker import iouMatrix, assignPairs, ObjectTracker
+
+
+class Detection:
+    """The fields of a DetectedShape the tracker reads and sets."""
+
+    def __init__(self, label, extent):
+        self.label = label
+        self.extent = extent
+        self.track_id = None
+
+
+class TestIouMatrix(unittest.TestCase):
+
+    def test_values(self):
+        iou = iouMatrix([(0, 0, 10, 10)], [(0, 0, 10, 10), (5, 0, 15, 10), (20, 20, 30, 30)])
+        np.testing.assert_allclose(iou, [[1.0, 50 / 150, 0.0]])
+
+    def test_empty(self):
+        self.assertEqual(iouMatrix([], [(0, 0, 1, 1)]).shape, (0, 1))
+
+    def test_degenerate_boxes(self):
+        np.testing.assert_allclose(iouMatrix([(0, 0, 0, 0)], [(0, 0, 0, 0)]), [[0.0]])
+
+
+class TestAssignPairs(unittest.TestCase):
+
+    def _check(self, scores, min_score):
+        pairs = assignPairs(scores, min_score)
+        rows = [i for i, j in pairs]
+        cols = [j for i, j in pairs]
+        self.assertEqual(len(set(rows)), len(rows))
+        self.assertEqual(len(set(cols)), len(cols))
+        for i, j in pairs:
+            self.assertGreaterEqual(scores[i][j], min_score)
+
+        return sorted(pairs)
+
+    def test_optimal_and_greedy(self):
+        scores = [[0.9, 0.0], [0.0, 0.8], [0.1, 0.1]]
+        self.assertEqual(self._check(scores, 0.5), [(0, 0), (1, 1)])
+
+        saved = objectTracker.linear_sum_assignment
+        objectTracker.linear_sum_assignment = None
+        try:
+            self.assertEqual(self._check(scores, 0.5), [(0, 0), (1, 1)])
+        finally:
+            objectTracker.linear_sum_assignment = saved
+
+    def test_min_score(self):
+        self.assertEqual(self._check([[0.2]], 0.5), [])
+
+    def test_empty(self):
+        self.assertEqual(assignPairs(np.zeros((0, 3)), 0.5), [])
+
+
+class TestObjectTracker(unittest.TestCase):
+
+    def test_same_object_keeps_its_track(self):
+        tracker = ObjectTracker()
+        frames = [[Detection('car', (i, 0, i + 10, 10))] for i in range(3)]
+        for position, dshapes in enumerate(frames):
+            tracker.Update(position, str(position), dshapes)
+
+        self.assertEqual(len({dshapes[0].track_id for dshapes in frames}), 1)
+        self.assertEqual([position for position, name, label, extent in tracker.Track(frames[0][0].track_id)],
+                         [0, 1, 2])
+
+    def test_labels_are_not_mixed(self):
+        tracker = ObjectTracker()
+        a, b = Detection('car', (0, 0, 10, 10)), Detection('person', (0, 0, 10, 10))
+        tracker.Update(0, '0', [a])
+        tracker.Update(1, '1', [b])
+        self.assertNotEqual(a.track_id, b.track_id)
+
+    def test_frame_in_between_merges_tracks(self):
+        tracker = ObjectTracker(max_gap=0)
+        first, last, middle = Detection('car', (0, 0, 10, 10)), Detection('car', (2, 0, 12, 10)), \
+                              Detection('car', (1, 0, 11, 10))
+        tracker.Update(0, '0', [first])
+        tracker.Update(2, '2', [last])
+        self.assertNotEqual(first.track_id, last.track_id)
+
+        tracker.Update(1, '1', [middle])
+        self.assertEqual(tracker.TrackId(last.track_id), first.track_id)
+        self.assertEqual(len(tracker.Track(first.track_id)), 3)
+
+    def test_tracks_sharing_a_frame_are_not_merged(self):
+        tracker = ObjectTracker(min_iou=0.2, max_gap=1)
+        a, b = Detection('car', (0, 0, 10, 10)), Detection('car', (14, 0, 24, 10))
+        tracker.Update(1, '1', [a, b])
+        c = Detection('car', (12, 0, 22, 10))
+        tracker.Update(3, '3', [c])
+        self.assertEqual(c.track_id, b.track_id)
+
+        # overlaps a on the frame before and c on the frame after
+        e = Detection('car', (6, 0, 16, 10))
+        tracker.Update(2, '2', [e])
+        self.assertEqual(e.track_id, a.track_id)
+        self.assertNotEqual(tracker.TrackId(c.track_id), tracker.TrackId(a.track_id))
+
+    def test_reset(self):
+        tracker = ObjectTracker()
+        a = Detection('car', (0, 0, 10, 10))
+        tracker.Update(0, '0', [a])
+        tracker.Reset()
+        self.assertEqual(tracker.Track(a.track_id), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from libs.videoIndex import VideoIndex
+
+
+class TestVideoIndex(unittest.TestCase):
+
+    def setUp(self):
+        # 25 fps, a key frame every 10 frames
+        self.index = VideoIndex([40.0 * i for i in range(100)], [0, 10, 20, 30])
+
+    def test_frame_count(self):
+        self.assertEqual(self.index.frameCount, 100)
+        self.assertTrue(self.index.isUsable())
+
+    def test_keyframe_before(self):
+        self.assertEqual(self.index.keyframeBefore(0), 0)
+        self.assertEqual(self.index.keyframeBefore(9), 0)
+        self.assertEqual(self.index.keyframeBefore(10), 10)
+        self.assertEqual(self.index.keyframeBefore(95), 30)
+        self.assertEqual(self.index.keyframeBefore(-1), -1)
+
+    def test_first_frame_is_a_keyframe(self):
+        self.assertEqual(list(VideoIndex([0.0, 40.0, 80.0], [2]).keyframes), [0, 2])
+
+    def test_frame_at(self):
+        self.assertEqual(self.index.frameAt(400.0), 10)
+        # timestamps reported by the container are not exact
+        self.assertEqual(self.index.frameAt(415.0), 10)
+        self.assertEqual(self.index.frameAt(425.0), 11)
+        self.assertEqual(self.index.frameAt(10000.0), -1)
+
+    def test_not_monotonic(self):
+        self.assertFalse(VideoIndex([0.0, 80.0, 40.0], [0]).isUsable())
+
+
+if __name__ == '__main__':
+    unittest.main()